@@ -33,7 +33,12 @@ class CritiqueAgent:
                     confidence = 0.2
                     force_hitl = True
                 if payload.get("query_cost_risk") == "high":
-                    issues.append("Query cost risk HIGH — recommend human review.")
+                    est = payload.get("cost_estimate") or {}
+                    detail = (
+                        f" (~{int(est.get('work_rows', 0)):,} rows read/joined, ~{int(est.get('result_rows', 0)):,} result rows)"
+                        if est else ""
+                    )
+                    issues.append(f"Query cost risk HIGH{detail} — recommend human review.")
                     force_hitl = True
                     confidence = min(confidence, 0.5)
 
@@ -1,6 +1,7 @@
 from __future__ import annotations
 
 from typing import Any, Dict, List, Optional
+import duckdb
 import pandas as pd
 
 
@@ -33,3 +34,49 @@ class DataQualityAgent:
             "duplicate_rows": dup_rows,
             "null_rate": null_rates,
         }
+
+    def run_snapshot(self, snapshot: Any, expected_columns: Optional[List[str]] = None) -> Dict[str, Any]:
+        """
+        Same report as run(), computed from a SnapshotHandle without loading it:
+        null rates batch by batch, duplicates with DuckDB over the Parquet file.
+        """
+        if snapshot is None:
+            return {"ok": False, "reason": "Snapshot is None."}
+        rows = snapshot.num_rows
+        if rows == 0:
+            return {"ok": False, "reason": "Empty result set.", "rows": 0}
+
+        cols = snapshot.columns
+        if expected_columns:
+            missing = [c for c in expected_columns if c not in cols]
+            if missing:
+                return {"ok": False, "reason": "Missing expected columns.", "missing": missing, "columns": cols}
+
+        null_counts = {c: 0 for c in cols}
+        for batch in snapshot.iter_batches():
+            for c, arr in zip(batch.schema.names, batch.columns):
+                null_counts[c] += arr.null_count
+        null_rates = {c: float(n) / rows for c, n in null_counts.items()}
+
+        dup_rows = self._duplicate_rows(snapshot.path, rows) if cols else 0
+
+        return {
+            "ok": True,
+            "rows": int(rows),
+            "columns": cols,
+            "duplicate_rows": dup_rows,
+            "null_rate": null_rates,
+        }
+
+    def _duplicate_rows(self, parquet_path: Any, rows: int) -> Optional[int]:
+        con = duckdb.connect()
+        try:
+            distinct = con.execute(
+                "SELECT COUNT(*) FROM (SELECT DISTINCT * FROM read_parquet(?))",
+                [str(parquet_path)],
+            ).fetchone()[0]
+            return int(rows - distinct)
+        except Exception:
+            return None
+        finally:
+            con.close()
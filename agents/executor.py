@@ -9,8 +9,8 @@ import hashlib
 import pandas as pd
 
 from config import Settings
-from db import run_sql_query  # ✅ correct function
-from cache.snapshot_cache import SnapshotCache
+from db import run_sql_query, iter_sql_record_batches, QueryControl  # ✅ correct functions
+from cache.snapshot_cache import SnapshotCache, SnapshotHandle
 from cache.duckdb_store import DuckDBStore
 
 
@@ -19,7 +19,7 @@ class Executor:
     settings: Settings
 
     # ✅ accept these so core/run_pipeline.py won't crash
-    engine: Optional[Any] = None     # not required because db.get_engine caches globally
+    engine: Optional[Any] = None     # managed pool from db.engine; falls back to the interactive pool
     governor: Optional[Any] = None   # optional future use (rate limit, etc.)
 
     def __post_init__(self) -> None:
@@ -33,6 +33,79 @@ class Executor:
         return hashlib.sha256(payload).hexdigest()
 
     def run(self, *, sql: str, params: Dict[str, Any]) -> Tuple[pd.DataFrame, Dict[str, Any]]:
+        if bool(getattr(self.settings, "SQL_STREAM_TO_SNAPSHOT", True)):
+            handle, meta = self.run_to_snapshot(sql=sql, params=params)
+            return handle.to_pandas(), meta
+        return self._run_materialized(sql=sql, params=params)
+
+    def run_to_snapshot(self, *, sql: str, params: Dict[str, Any]) -> Tuple[SnapshotHandle, Dict[str, Any]]:
+        """
+        Streaming execution: fetched batches are written to the Parquet snapshot
+        as row groups (never holding the full result in memory) and a lazy
+        SnapshotHandle is returned instead of a DataFrame.
+        """
+        start = time.time()
+        cache_key = self._cache_key(sql, params or {})
+
+        # 1) cache
+        handle = self.cache.handle(cache_key)
+        if handle is not None:
+            self.duckdb.register_parquet(cache_key, handle.path)
+            return handle, {
+                "cache_key": cache_key,
+                "cache_hit": True,
+                "rows": handle.num_rows,
+                "seconds": round(time.time() - start, 4),
+                "mode": "cache",
+                "snapshot_path": handle.path.as_posix(),
+            }
+
+        # 2) offline guard
+        self._check_offline()
+
+        # 3) stream DB query → Parquet (temp file, renamed on completion)
+        timeout_seconds, max_rows = self._limits()
+        control = QueryControl(sql=sql, timeout_seconds=timeout_seconds, label="executor")
+        batches = iter_sql_record_batches(
+            sql=sql,
+            params=params or {},
+            timeout_seconds=timeout_seconds,
+            max_rows=max_rows,
+            settings=self.settings,
+            engine=self.engine,
+            control=control,
+        )
+        # batch schemas are unified/cast inside put_batches (all-NULL first blocks included)
+        try:
+            handle = self.cache.put_batches(cache_key, batches)
+        except Exception:
+            batches.close()  # release the cursor / connection now, not at garbage collection
+            raise
+
+        self.duckdb.register_parquet(cache_key, handle.path)
+        return handle, {
+            "cache_key": cache_key,
+            "cache_hit": False,
+            "rows": handle.num_rows,
+            "seconds": round(time.time() - start, 4),
+            "mode": "db_stream",
+            "snapshot_path": handle.path.as_posix(),
+            **control.meta(),
+        }
+
+    def _limits(self) -> Tuple[int, int]:
+        timeout_seconds = int(getattr(self.settings, "STATEMENT_TIMEOUT_SECONDS", 3600))
+        max_rows = int(getattr(self.settings, "MAX_RETURNED_ROWS", 200000))
+        return timeout_seconds, max_rows
+
+    def _check_offline(self) -> None:
+        if bool(getattr(self.settings, "OFFLINE_ONLY", False)):
+            raise RuntimeError(
+                "OFFLINE_ONLY is enabled and no cache snapshot exists for this query. "
+                "Run once with OFFLINE_ONLY=false to populate cache."
+            )
+
+    def _run_materialized(self, *, sql: str, params: Dict[str, Any]) -> Tuple[pd.DataFrame, Dict[str, Any]]:
         start = time.time()
         cache_key = self._cache_key(sql, params or {})
 
@@ -53,15 +126,11 @@ class Executor:
             }
 
         # 2) offline guard
-        if bool(getattr(self.settings, "OFFLINE_ONLY", False)):
-            raise RuntimeError(
-                "OFFLINE_ONLY is enabled and no cache snapshot exists for this query. "
-                "Run once with OFFLINE_ONLY=false to populate cache."
-            )
+        self._check_offline()
 
         # 3) run DB query (your db/__init__.py enforces SELECT-only + streaming)
-        timeout_seconds = int(getattr(self.settings, "STATEMENT_TIMEOUT_SECONDS", 3600))
-        max_rows = int(getattr(self.settings, "MAX_RETURNED_ROWS", 200000))
+        timeout_seconds, max_rows = self._limits()
+        control = QueryControl(sql=sql, timeout_seconds=timeout_seconds, label="executor")
 
         df = run_sql_query(
             sql=sql,
@@ -69,6 +138,8 @@ class Executor:
             timeout_seconds=timeout_seconds,
             max_rows=max_rows,
             settings=self.settings,
+            engine=self.engine,
+            control=control,
         )
 
         # 4) cache snapshot
@@ -83,4 +154,5 @@ class Executor:
             "rows": int(len(df)),
             "seconds": round(time.time() - start, 4),
             "mode": "db",
-        }
\ No newline at end of file
+            **control.meta(),
+        }
@@ -1,13 +1,14 @@
 from __future__ import annotations
 
 from typing import Any, Dict, List, Tuple
-from pathlib import Path
 import re
-import json
 
 from config import Settings
 from knowledge_graph.store import KnowledgeGraphStore
 from knowledge_graph.schema_registry import SchemaRegistry
+from knowledge_graph.retrieval_index import get_retrieval_index
+from knowledge_graph.join_graph import get_join_graph
+from knowledge_graph.statistics import CardinalityEstimator
 from core.orchestrator import build_orchestrator
 
 
@@ -37,6 +38,7 @@ class PlannerAgent:
     - schema_reasoning() uses BOTH:
       (1) schema registry (table + column names)
       (2) content_index.json (sample rows + top values + content keywords)
+      through a prebuilt inverted index (knowledge_graph/retrieval_index.py)
     """
 
     def __init__(self, settings: Settings, kg: KnowledgeGraphStore, registry: SchemaRegistry):
@@ -101,113 +103,9 @@ class PlannerAgent:
         )
         q_words = set(_keywordize(q_text))
 
-        # load content index
-        content_path = Path(self.settings.KNOWLEDGE_GRAPH_DIR) / "content_index.json"
-        content_obj: Dict[str, Any] = {}
-        try:
-            if content_path.exists():
-                content_obj = json.loads(content_path.read_text(encoding="utf-8"))
-        except Exception:
-            content_obj = {}
-
-        content_tables: Dict[str, Any] = {}
-        if isinstance(content_obj, dict) and isinstance(content_obj.get("tables"), dict):
-            content_tables = content_obj["tables"]
-
-        scored: List[Tuple[float, str]] = []
-        breakdown: Dict[str, Any] = {}
-
-        for t in tables:
-            tmeta = reg.get("tables", {}).get(t, {}) if isinstance(reg, dict) else {}
-            cols = [
-                (c.get("name", "") or "").lower()
-                for c in (tmeta.get("columns", []) or [])
-                if isinstance(c, dict)
-            ]
-            tname = (t or "").lower()
-
-            # schema score
-            schema_score = 0.0
-            matched_schema: List[str] = []
-            for w in q_words:
-                if w in tname:
-                    schema_score += 3.0
-                    matched_schema.append(f"table:{w}")
-                if any(w in c for c in cols):
-                    schema_score += 1.0
-                    matched_schema.append(f"col:{w}")
-
-            # content score
-            content_score = 0.0
-            matched_content: List[str] = []
-
-            ct = content_tables.get(t, {}) if isinstance(content_tables.get(t, {}), dict) else {}
-
-            # 1) keyword blob
-            blob = ct.get("table_text", "")
-            if isinstance(blob, str) and blob:
-                blob_l = blob.lower()
-                for w in q_words:
-                    if w in blob_l:
-                        content_score += 1.5
-                        matched_content.append(f"blob:{w}")
-
-            # 2) top values
-            top_vals = ct.get("top_values", {})
-            if isinstance(top_vals, dict):
-                for col, rows in top_vals.items():
-                    if not isinstance(rows, list):
-                        continue
-                    for r in rows[:20]:
-                        if not isinstance(r, dict):
-                            continue
-                        v = _safe_str(r.get("value", "")).lower()
-                        if not v:
-                            continue
-                        for w in q_words:
-                            if w in v:
-                                content_score += 2.5
-                                matched_content.append(f"top:{col}:{w}")
-                                break
-
-            # 3) sample rows
-            samples = ct.get("sample_rows", [])
-            if isinstance(samples, list) and samples:
-                parts: List[str] = []
-                for row in samples[:10]:
-                    if isinstance(row, dict):
-                        for _, v in row.items():
-                            vs = _safe_str(v).lower()
-                            if vs and len(vs) <= 80:
-                                parts.append(vs)
-                sample_text = " ".join(parts)
-                for w in q_words:
-                    if w in sample_text:
-                        content_score += 1.0
-                        matched_content.append(f"sample:{w}")
-
-            # joinability bonus
-            join_bonus = 0.0
-            hints = tmeta.get("pk_fk_hints", {})
-            if isinstance(hints, dict) and (hints.get("primary_keys") or hints.get("foreign_keys")):
-                join_bonus = 0.5
-
-            total = schema_score + content_score + join_bonus
-
-            breakdown[t] = {
-                "total_score": round(total, 3),
-                "schema_score": round(schema_score, 3),
-                "content_score": round(content_score, 3),
-                "join_bonus": round(join_bonus, 3),
-                "matched_schema": matched_schema[:30],
-                "matched_content": matched_content[:40],
-                "row_count": int(tmeta.get("row_count", 0) or 0),
-                "has_content_index": bool(ct),
-            }
-
-            scored.append((total, t))
-
-        scored.sort(key=lambda x: x[0], reverse=True)
+        # prebuilt inverted index (rebuilt only when the content index or registry changes)
+        index, used_content_index = get_retrieval_index(self.settings.KNOWLEDGE_GRAPH_DIR, self.registry)
+        scored, breakdown = index.score(q_words, tables)
 
         top = [t for s, t in scored if s > 0][:12]
         if not top:
@@ -217,7 +115,7 @@ class PlannerAgent:
             "candidate_tables": top,
             "scoring_top": [(round(s, 3), t) for s, t in scored[:30]],
             "score_breakdown": {t: breakdown[t] for t in top if t in breakdown},
-            "used_content_index": bool(content_tables),
+            "used_content_index": used_content_index,
             "query_keywords": sorted(list(q_words))[:80],
         }
 
@@ -269,9 +167,15 @@ class PlannerAgent:
         if not plan_tables:
             plan_tables = candidates[:2]
 
+        # joins: keep proposed ones that fit the join graph, fill gaps with shortest paths
+        completed = get_join_graph(self.registry).complete_joins(
+            plan_tables, plan.get("joins") if isinstance(plan.get("joins"), list) else [], allowed=allowed_tables or None
+        )
+        plan_tables = completed["tables"]
         plan["tables"] = plan_tables
+        plan["joins"] = completed["joins"]
+        plan["join_resolution"] = {k: completed[k] for k in ("added", "dropped", "unreachable")}
 
-        plan.setdefault("joins", [])
         plan.setdefault("metrics", [])
         plan.setdefault("dimensions", [])
         plan.setdefault("filters", [])
@@ -279,9 +183,9 @@ class PlannerAgent:
         plan.setdefault("order_by", [])
         plan.setdefault("time_field", None)
         plan.setdefault("time_grain", intent.get("granularity"))
-        plan.setdefault("query_cost_risk", self._estimate_cost_risk(plan_tables))
         plan.setdefault("notes", "")
         plan.setdefault("expected_columns", [])
+        self._apply_cost_estimate(plan)
         return plan
 
     # -----------------------------
@@ -330,22 +234,33 @@ class PlannerAgent:
         if new_allowed:
             plan_tables = [t for t in plan_tables if t in new_allowed]
         plan["tables"] = plan_tables
+        if "query_cost_risk" not in (review["plan"] if isinstance(review.get("plan"), dict) else {}):
+            plan.pop("query_cost_risk", None)  # re-estimate for the edited plan
+        self._apply_cost_estimate(plan)
 
         return {"ok": True, "allowed_tables": new_allowed, "plan": plan}
 
     # -----------------------------
-    # cost heuristic
+    # cost estimate (column statistics catalog)
     # -----------------------------
-    def _estimate_cost_risk(self, tables: List[str]) -> str:
-        reg = self.registry.load().get("tables", {})
-        rows = [int(reg.get(t, {}).get("row_count", 0) or 0) for t in tables]
-        if not rows:
-            return "low"
-        total = 1
-        for r in rows[:3]:
-            total *= max(r, 1)
-        if total > 10**18:
+    def _apply_cost_estimate(self, plan: Dict[str, Any]) -> None:
+        """
+        Sets plan["cost_estimate"] and plan["query_cost_risk"]. The risk is the
+        higher of the estimate's and any risk the LLM put in the plan.
+        """
+        estimate = CardinalityEstimator.for_tables(self.kg, self.registry, plan.get("tables", [])).estimate(plan)
+        risk = self._estimate_cost_risk(estimate)
+        order = {"low": 0, "medium": 1, "high": 2}
+        stated = str(plan.get("query_cost_risk") or "").lower()
+        if order.get(stated, -1) > order[risk]:
+            risk = stated
+        plan["cost_estimate"] = {**estimate, "risk": risk}
+        plan["query_cost_risk"] = risk
+
+    def _estimate_cost_risk(self, estimate: Dict[str, Any]) -> str:
+        work = int(estimate.get("work_rows", 0) or 0)
+        if work > int(getattr(self.settings, "QUERY_COST_HIGH_ROWS", 200_000_000)):
             return "high"
-        if total > 10**14:
+        if work > int(getattr(self.settings, "QUERY_COST_MEDIUM_ROWS", 5_000_000)):
             return "medium"
-        return "low"
\ No newline at end of file
+        return "low"
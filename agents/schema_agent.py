@@ -1,23 +1,166 @@
 from __future__ import annotations
 
-from typing import Any, Dict, List, Optional
+from collections import Counter
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, List, Optional, Tuple
 from pathlib import Path
+import functools
+import math
 import re
 import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
 
 from config import Settings
-from db.engine import build_engine
+from db.engine import ENGINE_MANAGER, get_pooled_engine
 from db.introspect import (
     fetch_tables,
-    fetch_columns,
-    fetch_row_count,
+    fetch_catalog,
+    catalog_pk_fk_hints,
     sample_table,
-    pk_fk_hints,
+)
+from db import QueryCancelledError, QueryControl, iter_sql_record_batches
+from db.profile_queries import (
+    aggregate_profile_sql,
+    chunked,
+    is_minmax_type,
+    parse_aggregate_profile,
+    parse_top_values,
+    sample_scan_sql,
+    top_values_sql,
 )
 from db.query import run_sql_query  # <-- ensure you have this (or import your existing db runner)
 from knowledge_graph.store import KnowledgeGraphStore
 from knowledge_graph.schema_registry import SchemaRegistry
 from knowledge_graph.content_index import ContentIndexStore
+from knowledge_graph.retrieval_index import get_retrieval_index, warm_retrieval_index
+from knowledge_graph.refresh_checkpoint import RefreshCheckpoint
+from knowledge_graph.sketches import HyperLogLog, ReservoirSample, SpaceSaving
+from knowledge_graph.statistics import build_column_stats, column_kind, equi_depth_bounds
+from knowledge_graph.column_resolver import derive_column_synonyms
+
+
+def _is_id_like(c: str) -> bool:
+    # Heuristic: columns ending with id are usually huge cardinality
+    c2 = c.lower()
+    return c2 == "id" or c2.endswith("_id") or c2.endswith("id")
+
+
+def _table_signature(table: Dict[str, Any], row_count: Any) -> Dict[str, Any]:
+    """
+    Change-detection signature: modify_date moves on DDL, row_count on data volume.
+    """
+    modified = table.get("modify_date")
+    if hasattr(modified, "isoformat"):
+        modified = modified.isoformat()
+    return {"modify_date": None if modified is None else str(modified), "row_count": int(row_count or 0)}
+
+
+class _ApproxColumn:
+    """
+    Per-column sketch state for approximate profiling (fed Arrow arrays batch by batch).
+    """
+
+    def __init__(self, capacity: int, reservoir_size: int = 4096):
+        self.hll = HyperLogLog()
+        self.heavy = SpaceSaving(capacity)
+        self.reservoir = ReservoirSample(reservoir_size)  # numeric / temporal values, for histograms
+        self.nulls = 0
+        self.non_null = 0
+        self.min: Any = None
+        self.max: Any = None
+
+    def add(self, arr: pa.Array) -> None:
+        self.nulls += arr.null_count
+        values = arr.drop_null()
+        if len(values) == 0:
+            return
+        self.non_null += len(values)
+        try:
+            mm = pc.min_max(values)
+            lo, hi = mm["min"].as_py(), mm["max"].as_py()
+            self.min = lo if self.min is None else min(self.min, lo)
+            self.max = hi if self.max is None else max(self.max, hi)
+        except (pa.ArrowNotImplementedError, pa.ArrowInvalid, TypeError):
+            pass
+        _sample_numbers(self.reservoir, values)
+        try:
+            as_text = values.cast(pa.string()).to_pylist()
+        except (pa.ArrowNotImplementedError, pa.ArrowInvalid):
+            as_text = [str(v) for v in values.to_pylist()]
+        # pre-aggregate the batch: sketches take weighted / idempotent updates
+        for v, cnt in Counter(as_text).items():
+            self.hll.add(v)
+            self.heavy.update(v, cnt)
+
+
+class _HistogramColumn:
+    """
+    Reservoir-only state for the exact-mode histogram scan.
+    """
+
+    def __init__(self, reservoir_size: int = 4096):
+        self.reservoir = ReservoirSample(reservoir_size)
+
+    def add(self, arr: pa.Array) -> None:
+        values = arr.drop_null()
+        if len(values):
+            _sample_numbers(self.reservoir, values)
+
+
+def _sample_numbers(reservoir: ReservoirSample, values: pa.Array) -> None:
+    """
+    Histogram axis: float64 for numbers, epoch nanoseconds for dates/timestamps.
+    """
+    t = values.type
+    try:
+        if pa.types.is_integer(t) or pa.types.is_floating(t) or pa.types.is_decimal(t):
+            nums = values.cast(pa.float64())
+        elif pa.types.is_timestamp(t) or pa.types.is_date(t):
+            nums = values.cast(pa.timestamp("ns")).cast(pa.int64())
+        else:
+            return
+    except (pa.ArrowNotImplementedError, pa.ArrowInvalid):
+        return
+    reservoir.add_many(nums.to_numpy(zero_copy_only=False))
+
+
+def _run_tasks(
+    tasks: List[Callable[[], Any]],
+    workers: int,
+    on_result: Callable[[int, Any], None],
+    on_error: Optional[Callable[[int, BaseException], None]] = None,
+) -> None:
+    """
+    Runs tasks with at most `workers` in flight. on_result(index, result) and
+    on_error(index, exc) are always called from the calling thread. Without
+    on_error the first failure cancels pending tasks and is re-raised.
+    """
+    def handle(i: int, call: Callable[[], Any]) -> None:
+        try:
+            result = call()
+        except Exception as e:
+            if on_error is None:
+                raise
+            on_error(i, e)
+            return
+        on_result(i, result)
+
+    if workers <= 1 or len(tasks) <= 1:
+        for i, task in enumerate(tasks):
+            handle(i, task)
+        return
+
+    pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="schema-refresh")
+    try:
+        pending = {pool.submit(task): i for i, task in enumerate(tasks)}
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for fut in done:
+                i = pending.pop(fut)
+                handle(i, fut.result)
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
 
 
 class SchemaAgent:
@@ -34,8 +177,17 @@ class SchemaAgent:
         self.settings = settings
         self.kg = kg
         self.registry = registry
-        self.engine = build_engine(settings)
-        self.content_store = ContentIndexStore(Path(self.settings.KNOWLEDGE_GRAPH_DIR))
+        # catalog queries and table-content profiling use separate bounded pools
+        self.engine = get_pooled_engine(settings, "introspection")
+        self.profiling_engine = get_pooled_engine(settings, "profiling")
+        # each content index commit rebuilds the planner's retrieval index in memory
+        self.content_store = ContentIndexStore(
+            Path(self.settings.KNOWLEDGE_GRAPH_DIR),
+            on_commit=lambda obj: warm_retrieval_index(
+                self.settings.KNOWLEDGE_GRAPH_DIR, self.registry, obj.get("tables", {})
+            ),
+        )
+        self.checkpoint = RefreshCheckpoint(Path(self.settings.KNOWLEDGE_GRAPH_DIR))
 
     def refresh(
         self,
@@ -45,6 +197,10 @@ class SchemaAgent:
         content_top_values: int = 2000,
         content_profile_cols_max: int = 250,
         skip_top_values_for_id_cols: bool = True,
+        max_workers: int | None = None,
+        progress_callback: Optional[Callable[[int, int, str], None]] = None,
+        incremental: bool = False,
+        resume: bool = False,
     ) -> Dict[str, Any]:
         """
         Refresh schema + registry + optional content index.
@@ -52,158 +208,605 @@ class SchemaAgent:
         build_content_index:
           - True: reads real table content via aggregated DB queries
           - False: only schema + sample rows
+
+        max_workers:
+          - per-table sampling and per-column profiling queries run on a thread
+            pool, capped by the profiling pool capacity and SCHEMA_REFRESH_MAX_WORKERS
+            (the DB load budget); 1 = serial. Output is identical either way.
+
+        progress_callback(done_tables, total_tables, table_key) is called from the
+        calling thread each time a table's queries have all finished.
+
+        incremental:
+          - True: only tables whose signature (sys.tables.modify_date + partition
+            row count) changed since the last refresh are re-introspected and
+            re-profiled; unchanged entries are kept as-is and vanished tables
+            are dropped from schema, registry and content index.
+
+        resume:
+          - every finished table is checkpointed (see RefreshCheckpoint). True
+            continues the last interrupted/incomplete refresh with its original
+            options: completed tables are taken from the checkpoint, failed and
+            pending ones are run. A table whose queries fail is recorded as
+            failed and the refresh carries on with the others.
         """
+        options: Dict[str, Any] = {
+            "sample_rows": sample_rows,
+            "top_tables": top_tables,
+            "build_content_index": build_content_index,
+            "content_top_values": content_top_values,
+            "content_profile_cols_max": content_profile_cols_max,
+            "skip_top_values_for_id_cols": skip_top_values_for_id_cols,
+            "incremental": incremental,
+        }
+
+        state = self.checkpoint.load_state() if resume else None
+        if state and state.get("status") != "done":
+            options.update(state.get("options") or {})
+        sample_rows = int(options["sample_rows"])
+        top_tables = options["top_tables"]
+        build_content_index = bool(options["build_content_index"])
+        content_top_values = int(options["content_top_values"])
+        content_profile_cols_max = int(options["content_profile_cols_max"])
+        skip_top_values_for_id_cols = bool(options["skip_top_values_for_id_cols"])
+        incremental = bool(options["incremental"])
+
         tables = fetch_tables(self.engine)
         if top_tables is not None:
             tables = tables[: int(top_tables)]
+        table_keys = [f"{t['schema_name']}.{t['table_name']}" for t in tables]
 
-        schema: Dict[str, Any] = {"tables": {}}
-        registry: Dict[str, Any] = {"tables": {}}
+        checkpointed: Dict[str, Dict[str, Any]] = {}
+        if resume and self.checkpoint.resume(table_keys) is not None:
+            checkpointed = self.checkpoint.completed()
+        else:
+            self.checkpoint.start(options, table_keys)
 
-        indexed_tables = 0
+        # whole-database columns / row counts / PK / FK in one round trip per catalog view
+        catalog = fetch_catalog(self.engine)
+
+        # registry as of the previous refresh (change detection and reuse)
+        reg_tables = self.registry.load().get("tables", {})
+
+        prev_schema: Dict[str, Any] = self.kg.load_schema().get("tables", {})
+        prev_content: Dict[str, Any] = self.content_store.load().get("tables", {}) if build_content_index else {}
+
+        # -------------------------
+        # Plan: one sample task per table + one profiling task per column
+        # -------------------------
+        entries: List[Dict[str, Any]] = []
+        tasks: List[Callable[[], Any]] = []
+        task_table: List[int] = []
 
         for t in tables:
             schema_name = t["schema_name"]
             table_name = t["table_name"]
             key = f"{schema_name}.{table_name}"
+            signature = _table_signature(t, catalog["row_counts"].get(key, 0))
 
-            cols = fetch_columns(self.engine, schema=schema_name, table=table_name)
-            row_count = fetch_row_count(self.engine, schema=schema_name, table=table_name)
-            hints = pk_fk_hints(self.engine, schema=schema_name, table=table_name)
-
-            col_names = [c["column_name"] for c in cols]
+            if key in checkpointed:
+                entries.append({"key": key, "result": checkpointed[key]})
+                continue
 
-            # --- sample rows (explicit columns) ---
-            df_sample = pd.DataFrame()
-            if col_names:
-                df_sample = sample_table(
-                    self.engine,
-                    schema=schema_name,
-                    table=table_name,
-                    columns=col_names[: min(30, len(col_names))],
-                    top_n=sample_rows,
-                )
+            if incremental and self._is_unchanged(
+                key, signature, reg_tables, prev_schema, prev_content if build_content_index else None
+            ):
+                entries.append({"key": key, "reused": True})
+                continue
 
-            schema["tables"][key] = {
+            cols = catalog["columns"].get(key, [])
+            col_names = [c["column_name"] for c in cols]
+            entry: Dict[str, Any] = {
                 "schema": schema_name,
                 "name": table_name,
-                "row_count": int(row_count),
-                "columns": cols,
-                "pk_fk_hints": hints,
-                "sample": df_sample.head(sample_rows).to_dict(orient="records"),
+                "key": key,
+                "cols": cols,
+                "row_count": int(catalog["row_counts"].get(key, 0)),
+                "hints": catalog_pk_fk_hints(catalog, schema_name, table_name),
+                "signature": signature,
+                "profile_cols": col_names[: min(content_profile_cols_max, len(col_names))],
+                "sample": None,
+                "column_results": {},
             }
+            ti = len(entries)
+            entries.append(entry)
 
-            registry["tables"][key] = {
-                "schema": schema_name,
-                "name": table_name,
-                "row_count": int(row_count),
-                "columns": [
-                    {"name": c["column_name"], "type": c["data_type"], "nullable": bool(c["is_nullable"])}
-                    for c in cols
-                ],
-                "pk_fk_hints": hints,
-            }
+            if col_names:
+                tasks.append(
+                    functools.partial(
+                        sample_table,
+                        self.profiling_engine,
+                        schema=schema_name,
+                        table=table_name,
+                        columns=col_names[: min(30, len(col_names))],
+                        top_n=sample_rows,
+                    )
+                )
+                task_table.append(ti)
 
-            # --- NEW: Content Index ---
             if build_content_index:
-                content_payload = self._build_table_content_profile(
-                    schema=schema_name,
-                    table=table_name,
-                    table_key=key,
-                    columns=col_names[: min(content_profile_cols_max, len(col_names))],
-                    sample_df=df_sample,
-                    row_count=int(row_count),
-                    top_values=content_top_values,
-                    skip_top_values_for_id_cols=skip_top_values_for_id_cols,
-                )
-                self.content_store.upsert_table(key, content_payload)
-                indexed_tables += 1
+                # catalog types drive min/max profiling (new tables/columns included)
+                col_types = {c["column_name"]: c["data_type"] for c in cols}
+                typed_cols = [
+                    (c, str(col_types.get(c) or "").lower())
+                    for c in entry["profile_cols"]
+                    if not (skip_top_values_for_id_cols and _is_id_like(c))
+                ]
+                for task in self._profile_tasks(
+                    schema_name, table_name, typed_cols, content_top_values, row_count=entry["row_count"]
+                ):
+                    tasks.append(task)
+                    task_table.append(ti)
+
+        # -------------------------
+        # Execute (bounded concurrency), checkpoint + report per-table progress
+        # -------------------------
+        remaining = [0] * len(entries)
+        for ti in task_table:
+            remaining[ti] += 1
+        done_tables = 0
+        total_tables = len(entries)
+
+        def table_done(ti: int) -> None:
+            nonlocal done_tables
+            e = entries[ti]
+            if "cols" in e and "error" not in e:
+                e["result"] = self._assemble_table(e, sample_rows, build_content_index, content_top_values)
+                # free the raw query results as soon as the table is assembled
+                e["sample"], e["column_results"] = None, {}
+                self.checkpoint.record_done(e["key"], e["result"])
+            done_tables += 1
+            if progress_callback is not None:
+                progress_callback(done_tables, total_tables, e["key"])
+
+        for ti, n in enumerate(remaining):
+            if n == 0:
+                table_done(ti)
+
+        def on_result(i: int, result: Any) -> None:
+            ti = task_table[i]
+            task = tasks[i]
+            if "error" in entries[ti]:
+                return
+            if task.func is sample_table:
+                entries[ti]["sample"] = result
+            else:
+                for c, res in result.items():
+                    entries[ti]["column_results"].setdefault(c, {}).update(res)
+            remaining[ti] -= 1
+            if remaining[ti] == 0:
+                table_done(ti)
+
+        def on_error(i: int, exc: BaseException) -> None:
+            ti = task_table[i]
+            if "error" in entries[ti]:
+                return
+            entries[ti]["error"] = f"{type(exc).__name__}: {exc}"
+            self.checkpoint.record_failed(entries[ti]["key"], entries[ti]["error"])
+            table_done(ti)
+
+        _run_tasks(tasks, self._refresh_workers(max_workers), on_result, on_error)
+
+        # -------------------------
+        # Assemble in table order (same output as a serial run)
+        # -------------------------
+        schema: Dict[str, Any] = {"tables": {}}
+        registry: Dict[str, Any] = {"tables": {}}
+
+        indexed_tables = 0
+        reused_tables = 0
+        failed: Dict[str, str] = {}
+
+        # content index: staged in memory, written once (atomically) for the whole refresh
+        with self.content_store.batch():
+            for e in entries:
+                key = e["key"]
+                if e.get("reused"):
+                    schema["tables"][key] = prev_schema[key]
+                    registry["tables"][key] = reg_tables[key]
+                    reused_tables += 1
+                    continue
+
+                if "error" in e:
+                    # keep the previous refresh's entry (if any) rather than losing the table
+                    failed[key] = e["error"]
+                    if key in prev_schema and key in reg_tables:
+                        schema["tables"][key] = prev_schema[key]
+                        registry["tables"][key] = reg_tables[key]
+                    continue
+
+                result = e["result"]
+                schema["tables"][key] = result["schema"]
+                registry["tables"][key] = result["registry"]
 
-        self.kg.save_schema(schema)
-        self.registry.save(registry)
+                # --- Content Index ---
+                if build_content_index and result.get("content") is not None:
+                    self.content_store.upsert_table(key, result["content"])
+                    indexed_tables += 1
+
+            dropped: List[str] = []
+            if incremental:
+                dropped = sorted(set(reg_tables) - set(registry["tables"]))
+                if build_content_index:
+                    self.content_store.delete_tables(set(prev_content) - set(registry["tables"]))
+
+            # saved before the content commit, so the retrieval index it warms sees the new registry
+            self.kg.save_schema(schema)
+            self.kg.prune_samples(schema["tables"].keys())
+            self.registry.save(registry)
+
+        # no content commit (content index off / unchanged): build it here, not on the first question
+        get_retrieval_index(self.settings.KNOWLEDGE_GRAPH_DIR, self.registry)
+        self.checkpoint.finish(failed=bool(failed))
+
+        note = "Schema refreshed from DB. Content index updated." if build_content_index else "Schema refreshed from DB."
+        if failed:
+            note += f" {len(failed)} table(s) failed; run refresh(resume=True) to retry them."
 
         return {
-            "ok": True,
+            "ok": not failed,
             "tables": len(schema["tables"]),
             "content_indexed_tables": indexed_tables,
-            "note": "Schema refreshed from DB. Content index updated." if build_content_index else "Schema refreshed from DB.",
+            "refreshed_tables": len(entries) - reused_tables - len(failed),
+            "unchanged_tables": reused_tables,
+            "dropped_tables": dropped,
+            "resumed_tables": len(checkpointed),
+            "failed_tables": failed,
+            "note": note,
+        }
+
+    def refresh_status(self) -> Dict[str, Any]:
+        """
+        Progress of the current/last refresh: total, completed, failed, pending
+        (plus failed_tables with their errors).
+        """
+        return self.checkpoint.status()
+
+    def _assemble_table(
+        self,
+        e: Dict[str, Any],
+        sample_rows: int,
+        build_content_index: bool,
+        content_top_values: int,
+    ) -> Dict[str, Any]:
+        key = e["key"]
+        cols = e["cols"]
+        row_count = e["row_count"]
+        hints = e["hints"]
+        df_sample = e["sample"] if e["sample"] is not None else pd.DataFrame()
+
+        schema_entry = {
+            "schema": e["schema"],
+            "name": e["name"],
+            "row_count": int(row_count),
+            "columns": cols,
+            "pk_fk_hints": hints,
+            "sample_ref": self.kg.save_sample(key, df_sample.head(sample_rows)),
+            # cost-estimation statistics (see knowledge_graph.statistics), from the sample + profile results
+            "column_stats": build_column_stats(
+                df_sample,
+                [(c["column_name"], c["data_type"]) for c in cols],
+                int(row_count),
+                column_results=e["column_results"],
+                primary_key=(hints or {}).get("primary_key") or [],
+                top_values_limit=content_top_values if build_content_index else None,
+                buckets=int(getattr(self.settings, "STATS_HISTOGRAM_BUCKETS", 32)),
+                mcv_count=int(getattr(self.settings, "STATS_MCV_COUNT", 20)),
+            ),
         }
 
+        registry_entry = {
+            "schema": e["schema"],
+            "name": e["name"],
+            "row_count": int(row_count),
+            "columns": [
+                {"name": c["column_name"], "type": c["data_type"], "nullable": bool(c["is_nullable"])}
+                for c in cols
+            ],
+            "pk_fk_hints": hints,
+            "signature": e["signature"],
+        }
+
+        content_payload = None
+        if build_content_index:
+            content_payload = self._assemble_content_profile(
+                table_key=key,
+                columns=e["profile_cols"],
+                column_results=e["column_results"],
+                sample_df=df_sample,
+                row_count=int(row_count),
+                top_values=content_top_values,
+            )
+            # aliases for the fuzzy column resolver (all columns, not only the profiled ones)
+            content_payload["column_synonyms"] = derive_column_synonyms(e["name"], [c["column_name"] for c in cols])
+
+        return {"schema": schema_entry, "registry": registry_entry, "content": content_payload}
+
+    def _is_unchanged(
+        self,
+        key: str,
+        signature: Dict[str, Any],
+        reg_tables: Dict[str, Any],
+        prev_schema: Dict[str, Any],
+        prev_content: Optional[Dict[str, Any]],
+    ) -> bool:
+        """
+        A table can be reused when its signature matches the registry and every
+        persisted artifact for it is present.
+        """
+        prev = reg_tables.get(key)
+        if not prev or prev.get("signature") != signature:
+            return False
+        if key not in prev_schema:
+            return False
+        ref = prev_schema[key].get("sample_ref")
+        if "sample" in prev_schema[key] or (ref and not (self.kg.base / ref["path"]).exists()):
+            return False  # inline sample from an older layout, or a lost Parquet file
+        if "column_stats" not in prev_schema[key]:
+            return False  # refreshed before column statistics were collected
+        if prev_content is None:
+            return True
+        return key in prev_content and "column_synonyms" in prev_content[key]
+
+    def _refresh_workers(self, max_workers: Optional[int]) -> int:
+        """
+        Worker count = min(requested or SCHEMA_REFRESH_MAX_WORKERS, profiling pool capacity).
+        More threads than pooled connections would only queue on pool checkout.
+        """
+        budget = int(max_workers if max_workers is not None else getattr(self.settings, "SCHEMA_REFRESH_MAX_WORKERS", 4))
+        opts = ENGINE_MANAGER.pool_options(self.settings, "profiling")
+        capacity = int(opts["pool_size"]) + int(opts["max_overflow"])
+        return max(1, min(budget, capacity))
+
     # ---------------------------------------------------------------------
     # Content profiling (reads REAL table content via aggregates + samples)
     # ---------------------------------------------------------------------
 
-    def _build_table_content_profile(
+    def _profile_tasks(
+        self,
+        schema: str,
+        table: str,
+        columns: List[Tuple[str, str]],
+        top_values: int,
+        row_count: int = 0,
+    ) -> List[Callable[[], Dict[str, Dict[str, Any]]]]:
+        """
+        Profiling work for one table as independent query tasks (safe to run
+        concurrently), each returning {column: partial result}.
+
+        Exact mode:
+        - one aggregate scan: MIN/MAX (numeric/date-ish) + NULL count for every column
+        - one top-values scan per PROFILE_TOP_VALUES_BATCH_COLUMNS columns
+        - one bounded sample scan of the numeric/date columns for histograms
+        A 60-column table costs 2 + ceil(60 / batch) scans instead of up to 120.
+
+        Approximate mode (PROFILE_MODE="approx", or "auto" above
+        PROFILE_APPROX_MIN_ROWS rows): a single bounded sample scan feeding sketches.
+        """
+        if not columns:
+            return []
+        if self._use_approx(row_count):
+            return [
+                functools.partial(
+                    self._profile_approx,
+                    schema=schema,
+                    table=table,
+                    columns=columns,
+                    top_values=top_values,
+                    row_count=row_count,
+                )
+            ]
+        agg_batch = int(getattr(self.settings, "PROFILE_AGGREGATE_BATCH_COLUMNS", 200))
+        top_batch = int(getattr(self.settings, "PROFILE_TOP_VALUES_BATCH_COLUMNS", 8))
+        tasks: List[Callable[[], Dict[str, Dict[str, Any]]]] = []
+        for batch in chunked(columns, agg_batch):
+            tasks.append(functools.partial(self._profile_aggregates, schema=schema, table=table, columns=batch))
+        for batch in chunked([c for c, _ in columns], top_batch):
+            tasks.append(
+                functools.partial(
+                    self._profile_top_values, schema=schema, table=table, columns=batch, top_values=top_values
+                )
+            )
+        ranged = [(c, ctype) for c, ctype in columns if column_kind(ctype)]
+        if ranged:
+            tasks.append(
+                functools.partial(
+                    self._profile_histograms, schema=schema, table=table, columns=ranged, row_count=row_count
+                )
+            )
+        return tasks
+
+    def _use_approx(self, row_count: int) -> bool:
+        mode = str(getattr(self.settings, "PROFILE_MODE", "auto")).lower()
+        if mode == "approx":
+            return True
+        if mode == "auto":
+            return int(row_count or 0) > int(getattr(self.settings, "PROFILE_APPROX_MIN_ROWS", 1_000_000))
+        return False
+
+    def _profile_approx(
         self,
         *,
         schema: str,
         table: str,
+        columns: List[Tuple[str, str]],
+        top_values: int,
+        row_count: int,
+    ) -> Dict[str, Dict[str, Any]]:
+        """
+        Sketch-based profile from one bounded sample scan (cost capped per table
+        by PROFILE_SAMPLE_ROWS and PROFILE_TABLE_TIMEOUT_SECONDS; a scan cut off
+        by the timeout keeps the rows it read, flagged truncated in "approx"):
+        - distinct counts: HyperLogLog over the sample
+        - top values: SpaceSaving heavy hitters, counts scaled to row_count with
+          an error bound (sketch error + ~95% sampling interval)
+        - min/max and NULL counts from the sample (NULLs scaled)
+        Columns whose sample is (nearly) all-distinct are flagged high_cardinality
+        and get no top values.
+        """
+        budget = int(getattr(self.settings, "PROFILE_SAMPLE_ROWS", 100_000))
+        names = [c for c, _ in columns]
+        sql, sampling = sample_scan_sql(self._fmt_table(schema, table), names, int(row_count or 0), budget)
+        reservoir = int(getattr(self.settings, "STATS_RESERVOIR_ROWS", 4096))
+        states = {c: _ApproxColumn(capacity=max(2 * int(top_values), 100), reservoir_size=reservoir) for c in names}
+
+        n, truncated = self._scan_sample(sql, names, states, budget)
+        if n == 0 and sampling["sampling"] == "tablesample" and row_count:
+            # page sampling can come back empty (stale row_count, tiny heap) → bounded TOP read
+            sql, sampling = sample_scan_sql(self._fmt_table(schema, table), names, 0, budget)
+            n, truncated = self._scan_sample(sql, names, states, budget)
+
+        scale = (float(row_count) / n) if n and row_count else 1.0
+        ratio = float(getattr(self.settings, "PROFILE_HIGH_CARDINALITY_RATIO", 0.9))
+        meta = {"mode": "approx", **sampling, "sample_rows": n, "scale": round(scale, 4), "truncated": truncated}
+
+        out: Dict[str, Dict[str, Any]] = {}
+        for c, ctype in columns:
+            st = states[c]
+            distinct = st.hll.estimate()
+            high_card = st.non_null >= 100 and distinct >= ratio * st.non_null
+            res: Dict[str, Any] = {
+                "null_count": int(round(st.nulls * scale)),
+                "distinct_estimate": {
+                    "sample_distinct": int(round(distinct)),
+                    "relative_error": round(st.hll.relative_error, 4),
+                    "high_cardinality": bool(high_card),
+                },
+                "approx": meta,
+            }
+            if is_minmax_type(ctype):
+                res["minmax"] = {"min": self._json_safe(st.min), "max": self._json_safe(st.max)}
+            kind = column_kind(ctype)
+            if kind and not truncated and len(st.reservoir.values) >= 2:
+                # equi-depth over a uniform reservoir of the TABLESAMPLE rows (not a clustered prefix;
+                # a truncated scan only covered the first part of the table)
+                res["histogram"] = {
+                    "kind": kind,
+                    "bounds": equi_depth_bounds(
+                        st.reservoir.values, kind, int(getattr(self.settings, "STATS_HISTOGRAM_BUCKETS", 32))
+                    ),
+                }
+            if not high_card:
+                res["top_values"] = [
+                    {
+                        "value": r["value"],
+                        "cnt": int(round(r["count"] * scale)),
+                        "error": int(round((r["error"] + 2.0 * math.sqrt(r["count"])) * scale)) if scale > 1.0
+                        else int(r["error"]),
+                    }
+                    for r in st.heavy.top(top_values)
+                ]
+            out[c] = res
+        return out
+
+    def _profile_histograms(
+        self,
+        *,
+        schema: str,
+        table: str,
+        columns: List[Tuple[str, str]],
+        row_count: int,
+    ) -> Dict[str, Dict[str, Any]]:
+        """
+        Exact mode: equi-depth histograms for numeric/date columns from one
+        bounded sample scan (the whole table up to PROFILE_SAMPLE_ROWS rows,
+        TABLESAMPLE above) feeding a uniform reservoir per column. A scan cut
+        off by the timeout, or a TOP read that filled the budget (row_count was
+        stale), covered only a prefix of the table and yields no histograms.
+        """
+        budget = int(getattr(self.settings, "PROFILE_SAMPLE_ROWS", 100_000))
+        names = [c for c, _ in columns]
+        reservoir = int(getattr(self.settings, "STATS_RESERVOIR_ROWS", 4096))
+        states = {c: _HistogramColumn(reservoir) for c in names}
+        try:
+            sql, sampling = sample_scan_sql(self._fmt_table(schema, table), names, int(row_count or 0), budget)
+            n, truncated = self._scan_sample(sql, names, states, budget)
+            if n == 0 and sampling["sampling"] == "tablesample" and row_count:
+                sql, sampling = sample_scan_sql(self._fmt_table(schema, table), names, 0, budget)
+                n, truncated = self._scan_sample(sql, names, states, budget)
+        except QueryCancelledError:
+            return {}  # histograms are optional; the aggregate/top-values scans still profile the table
+        if truncated or (sampling["sampling"] == "top" and n >= budget):
+            return {}
+
+        buckets = int(getattr(self.settings, "STATS_HISTOGRAM_BUCKETS", 32))
+        out: Dict[str, Dict[str, Any]] = {}
+        for c, ctype in columns:
+            values = states[c].reservoir.values
+            if len(values) >= 2:
+                kind = column_kind(ctype)
+                out[c] = {"histogram": {"kind": kind, "bounds": equi_depth_bounds(values, kind, buckets)}}
+        return out
+
+    def _scan_sample(self, sql: str, names: List[str], states: Dict[str, Any], budget: int) -> Tuple[int, bool]:
+        """
+        Streams the sample scan into the column sketches → (rows read, truncated).
+        When PROFILE_TABLE_TIMEOUT_SECONDS cancels the statement the rows already
+        read are kept; a scan cancelled before its first row still fails the table.
+        """
+        n = 0
+        try:
+            for batch in iter_sql_record_batches(
+                sql=sql,
+                params={},
+                timeout_seconds=int(getattr(self.settings, "PROFILE_TABLE_TIMEOUT_SECONDS", 120)),
+                max_rows=budget,
+                settings=self.settings,
+                engine=self.profiling_engine,
+            ):
+                n += batch.num_rows
+                for c, arr in zip(names, batch.columns):
+                    states[c].add(arr)
+        except QueryCancelledError:
+            if n == 0:
+                raise
+            return n, True
+        return n, False
+
+    def _profile_aggregates(self, *, schema: str, table: str, columns: List[Tuple[str, str]]) -> Dict[str, Dict[str, Any]]:
+        df = self._safe_sql(aggregate_profile_sql(self._fmt_table(schema, table), columns))
+        return parse_aggregate_profile(df, columns, self._json_safe)
+
+    def _profile_top_values(
+        self, *, schema: str, table: str, columns: List[str], top_values: int
+    ) -> Dict[str, Dict[str, Any]]:
+        sql = top_values_sql(self._fmt_table(schema, table), columns, top_values)
+        df = self._safe_sql(sql, max_rows=max(50000, int(top_values) * len(columns)))
+        return {c: {"top_values": rows} for c, rows in parse_top_values(df, columns).items()}
+
+    def _assemble_content_profile(
+        self,
+        *,
         table_key: str,
         columns: List[str],
+        column_results: Dict[str, Any],
         sample_df: pd.DataFrame,
         row_count: int,
         top_values: int,
-        skip_top_values_for_id_cols: bool,
     ) -> Dict[str, Any]:
-        """
-        Builds content signals for table suggestion:
-        - sample rows already obtained
-        - top values counts per column (categorical)
-        - min/max for numeric/datetime columns (lightweight)
-        - keywords blob for planner matching
-        """
-        tbl = self._fmt_table(schema, table)
-
-        # Pick candidate columns for top-values profiling
         topvals: Dict[str, Any] = {}
         minmax: Dict[str, Any] = {}
-
-        # Heuristic: columns ending with id are usually huge cardinality
-        def is_id_like(c: str) -> bool:
-            c2 = c.lower()
-            return c2 == "id" or c2.endswith("_id") or c2.endswith("id")
-
-        # Use schema registry types if available
-        reg = self.registry.load()
-        reg_cols = {c["name"]: c.get("type", "") for c in reg.get("tables", {}).get(table_key, {}).get("columns", [])}
-
+        null_counts: Dict[str, int] = {}
+        distinct: Dict[str, Any] = {}
+        profile: Dict[str, Any] = {"mode": "exact"}
+        # column order, not completion order
         for c in columns:
-            if skip_top_values_for_id_cols and is_id_like(c):
+            res = column_results.get(c)
+            if not res:
                 continue
-
-            ctype = str(reg_cols.get(c, "")).lower()
-
-            # min/max for numeric or datetime-ish types
-            if any(x in ctype for x in ["int", "decimal", "numeric", "float", "real", "money", "date", "time"]):
-                sql_mm = f"""
-                SELECT
-                  MIN([{c}]) AS [min_val],
-                  MAX([{c}]) AS [max_val]
-                FROM {tbl}
-                WHERE [{c}] IS NOT NULL
-                """
-                df_mm = self._safe_sql(sql_mm)
-                if not df_mm.empty:
-                    minmax[c] = {
-                        "min": self._json_safe(df_mm["min_val"].iloc[0]),
-                        "max": self._json_safe(df_mm["max_val"].iloc[0]),
-                    }
-
-            # top values for categorical-ish columns
-            sql_top = f"""
-            SELECT TOP ({int(top_values)})
-              CAST([{c}] AS NVARCHAR(4000)) AS [value],
-              COUNT(1) AS [cnt]
-            FROM {tbl}
-            WHERE [{c}] IS NOT NULL
-            GROUP BY CAST([{c}] AS NVARCHAR(4000))
-            ORDER BY COUNT(1) DESC
-            """
-            df_top = self._safe_sql(sql_top)
-            if not df_top.empty:
-                topvals[c] = df_top.head(top_values).to_dict(orient="records")
-
-        sample_rows = sample_df.head(50).to_dict(orient="records") if sample_df is not None else []
+            if res.get("approx"):
+                profile = res["approx"]
+            if res.get("distinct_estimate") is not None:
+                distinct[c] = res["distinct_estimate"]
+            if res.get("minmax") is not None:
+                minmax[c] = res["minmax"]
+            if res.get("top_values"):
+                topvals[c] = res["top_values"]
+            if res.get("null_count") is not None:
+                null_counts[c] = res["null_count"]
+
+        # a few rows for keyword matching; the full sample is in the table's Parquet file
+        sample_rows = sample_df.head(10).to_dict(orient="records") if sample_df is not None else []
 
         # Create planner-friendly keyword blob
         text_blob = self._build_table_text_blob(
@@ -220,6 +823,9 @@ class SchemaAgent:
             "sample_rows": sample_rows,
             "top_values": topvals,
             "minmax": minmax,
+            "null_counts": null_counts,
+            "distinct_estimates": distinct,
+            "profile": profile,
             "table_text": text_blob,  # used for retrieval/scoring
         }
 
@@ -263,17 +869,21 @@ class SchemaAgent:
     def _fmt_table(self, schema: str, table: str) -> str:
         return f"[{schema}].[{table}]"
 
-    def _safe_sql(self, sql: str) -> pd.DataFrame:
+    def _safe_sql(self, sql: str, max_rows: int = 50000) -> pd.DataFrame:
         """
-        Executes read-only aggregate queries for profiling.
+        Executes read-only aggregate queries for profiling. Full-table scans:
+        the watchdog cancels them on the server at STATEMENT_TIMEOUT_SECONDS
+        (QueryCancelledError fails the table, see refresh_status), and they
+        are listed / cancellable like any other in-flight query.
         """
-        # NOTE: This assumes your db.query.run_sql_query is SELECT-only guarded already.
+        timeout_seconds = int(self.settings.STATEMENT_TIMEOUT_SECONDS)
         return run_sql_query(
-            engine=self.engine,
+            engine=self.profiling_engine,
             sql=sql,
             params={},
-            timeout_seconds=int(self.settings.STATEMENT_TIMEOUT_SECONDS),
-            max_rows=50000,  # profiling output is small
+            timeout_seconds=timeout_seconds,
+            max_rows=max_rows,  # profiling output is small
+            control=QueryControl(sql=sql, timeout_seconds=timeout_seconds, label="schema_profile"),
         )
 
     def _json_safe(self, v: Any) -> Any:
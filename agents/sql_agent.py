@@ -1,10 +1,32 @@
 from __future__ import annotations
 
-from typing import Any, Dict, List, Optional, Tuple
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import copy
+import hashlib
+import json
 import re
+import threading
+
+import pandas as pd
 
 from config import Settings
 from knowledge_graph.schema_registry import SchemaRegistry
+from knowledge_graph.column_resolver import get_column_resolver
+from knowledge_graph.join_graph import JoinFanoutError, get_join_graph
+from knowledge_graph.statistics import column_kind
+
+# Process-wide memo of generated SQL: fingerprint -> (result, plan updates).
+# The fingerprint includes the registry version, so a schema refresh invalidates it.
+_SQL_MEMO: "OrderedDict[str, Tuple[Dict[str, Any], Dict[str, Any]]]" = OrderedDict()
+_SQL_MEMO_LOCK = threading.Lock()
+
+# plan fields _generate_sql reads: the memo key ignores the rest (expected_columns,
+# which it writes itself, and planner annotations such as join_resolution)
+_SQL_PLAN_INPUTS = (
+    "tables", "joins", "metrics", "aggregation", "group_by", "dimensions",
+    "time_field", "time_grain", "filters", "order_by", "large_mode",
+)
 
 
 class SQLAgent:
@@ -27,9 +49,66 @@ class SQLAgent:
         allowed_tables: List[str],
         *,
         large_mode: Optional[bool] = None,
+    ) -> Dict[str, Any]:
+        """
+        Memoized by (plan inputs, allowlist, large_mode, TOP settings, registry version).
+        A hit returns a copy of the cached result and re-applies the plan
+        updates (tables / expected_columns) the original call made; calling
+        again with the same (now updated) plan dict is a hit as well.
+        """
+        max_entries = int(getattr(self.settings, "SQL_GENERATION_CACHE_SIZE", 256))
+        if max_entries <= 0:
+            return self._generate_sql(plan, allowed_tables, large_mode=large_mode)
+
+        key = self._memo_key(plan, allowed_tables, large_mode)
+        with _SQL_MEMO_LOCK:
+            hit = _SQL_MEMO.get(key)
+            if hit is not None:
+                _SQL_MEMO.move_to_end(key)
+        if hit is not None:
+            result, plan_updates = copy.deepcopy(hit)
+            plan.update(plan_updates)
+            return result
+
+        result = self._generate_sql(plan, allowed_tables, large_mode=large_mode)
+        plan_updates: Dict[str, Any] = {"expected_columns": plan["expected_columns"]}
+        keys = [key]
+        if result.get("recovered_tables"):
+            plan_updates["tables"] = plan["tables"]
+            # a retry passes the plan with the recovered tables written into it
+            keys.append(self._memo_key(plan, allowed_tables, large_mode))
+        entry = copy.deepcopy((result, plan_updates))
+        with _SQL_MEMO_LOCK:
+            for k in keys:
+                _SQL_MEMO[k] = entry
+                _SQL_MEMO.move_to_end(k)
+            while len(_SQL_MEMO) > max_entries:
+                _SQL_MEMO.popitem(last=False)
+        return result
+
+    def _memo_key(self, plan: Dict[str, Any], allowed_tables: List[str], large_mode: Optional[bool]) -> str:
+        payload = {
+            "plan": {k: plan[k] for k in _SQL_PLAN_INPUTS if k in plan},
+            "allowed": sorted(t for t in (allowed_tables or []) if isinstance(t, str)),
+            "large_mode": large_mode,
+            "top": [self.settings.MAX_RETURNED_ROWS, self.settings.DEFAULT_EXPLORATORY_TOP],
+            "registry": [str(self.registry.path), self.registry.version()],
+            "resolver": [repr(get_column_resolver(self.registry).version), self._fuzzy_min_score()],
+            "join_policy": str(getattr(self.settings, "JOIN_FANOUT_POLICY", "reject")).lower(),
+        }
+        raw = json.dumps(payload, sort_keys=True, default=str)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def _generate_sql(
+        self,
+        plan: Dict[str, Any],
+        allowed_tables: List[str],
+        *,
+        large_mode: Optional[bool] = None,
     ) -> Dict[str, Any]:
         reg = self.registry.load()
         reg_tables = list((reg.get("tables") or {}).keys())
+        resolutions: List[Dict[str, Any]] = []  # per call: a shared agent may generate concurrently
 
         if not reg_tables:
             raise ValueError("Schema registry has no tables. Run schema bootstrap/ingestion first.")
@@ -59,28 +138,26 @@ class SQLAgent:
         primary = tables[0]
 
         # ---------- FROM + JOIN ----------
+        # join tree from the join graph: plan joins that fit it, plus shortest
+        # paths (bridge tables stay inside the allowlist) for unconnected tables
         joins = plan.get("joins", []) if isinstance(plan.get("joins", []), list) else []
+        graph = get_join_graph(self.registry)
+        completed = graph.complete_joins(tables, joins, allowed=allow_ok or None)
+        tables = [t for t in completed["tables"] if t not in completed["unreachable"]]
+        join_list: List[Dict[str, Any]] = []
 
         from_clause = f"FROM {self._fmt_table(primary)} AS t0"
         alias_map: Dict[str, str] = {primary: "t0"}
         join_clauses: List[str] = []
         alias_i = 1
 
-        for j in joins:
-            if not isinstance(j, dict):
-                continue
-
-            lt = j.get("left_table")
-            rt = j.get("right_table")
-            lk = j.get("left_key")
-            rk = j.get("right_key")
+        for j in completed["joins"]:
+            lt = j["left_table"]
+            rt = j["right_table"]
             jt = (j.get("join_type") or "LEFT").upper()
+            key_pairs = [(j["left_key"], j["right_key"])] + [tuple(p) for p in j.get("extra_keys", [])]
 
-            if not all(isinstance(x, str) for x in [lt, rt, lk, rk]):
-                continue
-            if lt not in tables or rt not in tables:
-                continue
-            if not self.registry.has_column(lt, lk) or not self.registry.has_column(rt, rk):
+            if not all(self.registry.has_column(lt, lk) and self.registry.has_column(rt, rk) for lk, rk in key_pairs):
                 continue
 
             if lt not in alias_map:
@@ -93,10 +170,13 @@ class SQLAgent:
             if jt not in {"INNER", "LEFT", "RIGHT", "FULL"}:
                 jt = "LEFT"
 
-            join_clauses.append(
-                f"{jt} JOIN {self._fmt_table(rt)} AS {alias_map[rt]} "
-                f"ON {alias_map[lt]}.[{lk}] = {alias_map[rt]}.[{rk}]"
-            )
+            on = " AND ".join(f"{alias_map[lt]}.[{lk}] = {alias_map[rt]}.[{rk}]" for lk, rk in key_pairs)
+            join_clauses.append(f"{jt} JOIN {self._fmt_table(rt)} AS {alias_map[rt]} ON {on}")
+            join_list.append(j)
+
+        # columns can only come from tables that are actually in FROM/JOIN
+        tables = [t for t in tables if t in alias_map]
+        table_by_alias = {a: t for t, a in alias_map.items()}
 
         # ---------- aggregation mode ----------
         metrics = plan.get("metrics", []) if isinstance(plan.get("metrics", []), list) else []
@@ -115,14 +195,21 @@ class SQLAgent:
         group_by_cols: List[str] = []
 
         for d in dims:
-            col_ref = self._resolve_column(d, tables, alias_map)
+            col_ref = self._resolve_column(d, tables, alias_map, log=resolutions)
             if col_ref:
                 dim_select_cols.append(col_ref)
                 group_by_cols.append(col_ref.split(" AS ")[0].strip())
 
         # time bucket
         if time_field:
-            tf = self._resolve_column(time_field, tables, alias_map)
+            # a fuzzy time_field must land on a date/time column (not e.g. an int OrderDateKey)
+            tf = self._resolve_column(
+                time_field,
+                tables,
+                alias_map,
+                log=resolutions,
+                accept=lambda t, c: column_kind(self.registry.column_type(t, c)) == "date",
+            )
             if tf:
                 if time_grain and is_agg:
                     tf_left, tf_alias = self._split_expr_alias(tf)
@@ -136,6 +223,7 @@ class SQLAgent:
         # ---------- SELECT metrics ----------
         metric_select_cols: List[str] = []
         metric_expected_names: List[str] = []
+        additive_metric_tables: List[str] = []
 
         for m in metrics:
             if not isinstance(m, dict):
@@ -150,11 +238,13 @@ class SQLAgent:
             if not agg or not isinstance(field, str):
                 continue
 
-            base_col = self._resolve_column(field, tables, alias_map)
+            base_col = self._resolve_column(field, tables, alias_map, log=resolutions)
             if not base_col:
                 continue
 
             base_left = base_col.split(" AS ")[0].strip()
+            if agg in {"sum", "avg", "mean"}:
+                additive_metric_tables.append(table_by_alias.get(base_left.split(".")[0], primary))
             alias = self._safe_alias(m_name)
             metric_select_cols.append(f"{self._agg_sql(agg, base_left)} AS [{alias}]")
             metric_expected_names.append(alias)
@@ -167,6 +257,12 @@ class SQLAgent:
 
         select_cols = self._dedupe_by_alias(dim_select_cols + metric_select_cols)
 
+        # ---------- fan-out check ----------
+        join_check = graph.fanout_problems(join_list, additive_metric_tables)
+        join_check.update({k: completed[k] for k in ("added", "dropped", "unreachable")})
+        if join_check["problems"] and str(getattr(self.settings, "JOIN_FANOUT_POLICY", "reject")).lower() == "reject":
+            raise JoinFanoutError(join_check["problems"])
+
         # ---------- WHERE ----------
         params: Dict[str, Any] = {}
         where_parts: List[str] = []
@@ -179,7 +275,13 @@ class SQLAgent:
             op = str(f.get("op", "=")).strip()
             value = f.get("value")
 
-            col_ref = self._resolve_column(field, tables, alias_map)
+            col_ref = self._resolve_column(
+                field,
+                tables,
+                alias_map,
+                log=resolutions,
+                accept=lambda t, c, op=op, value=value: self._filter_compatible(t, c, op, value),
+            )
             if not col_ref:
                 continue
 
@@ -223,13 +325,15 @@ class SQLAgent:
                 if ob_dir not in {"ASC", "DESC"}:
                     ob_dir = "ASC"
 
-                col_ref = self._resolve_column(ob_field, tables, alias_map)
+                # exact column, then metric alias, then fuzzy column (so "revenue_total" stays the metric)
+                col_ref = self._resolve_column(ob_field, tables, alias_map, fuzzy=False)
+                safe_alias = self._safe_alias(ob_field)
+                if not col_ref and safe_alias in metric_expected_names:
+                    order_parts.append(f"[{safe_alias}] {ob_dir}")
+                    continue
+                col_ref = col_ref or self._resolve_column(ob_field, tables, alias_map, log=resolutions)
                 if col_ref:
                     order_parts.append(f"{col_ref.split(' AS ')[0].strip()} {ob_dir}")
-                else:
-                    safe_alias = self._safe_alias(ob_field)
-                    if safe_alias in metric_expected_names:
-                        order_parts.append(f"[{safe_alias}] {ob_dir}")
 
             if order_parts:
                 order_by_clause = "ORDER BY " + ", ".join(order_parts)
@@ -268,6 +372,8 @@ class SQLAgent:
             "time_grain": time_grain,
             "final_tables": list(tables),
             "recovered_tables": recovered,
+            "column_resolution": resolutions,
+            "join_check": join_check,
         }
 
     # ---------------- helpers ----------------
@@ -278,7 +384,77 @@ class SQLAgent:
             return f"[{schema}].[{table}]"
         return f"[{table_key}]"
 
-    def _resolve_column(self, hint: str, tables: List[str], alias_map: Dict[str, str]) -> Optional[str]:
+    def _fuzzy_min_score(self) -> float:
+        return float(getattr(self.settings, "COLUMN_FUZZY_MIN_SCORE", 0.5))
+
+    def _filter_compatible(self, table_key: str, column: str, op: str, value: Any) -> bool:
+        """
+        Whether a fuzzily matched column can take this filter: its type must be
+        known and every value must convert to it (a text value never lands on a
+        numeric column, LIKE only on text).
+        """
+        ctype = self.registry.column_type(table_key, column)
+        if not ctype:
+            return False
+        kind = column_kind(ctype)
+        if op.strip().lower() == "like":
+            return kind is None
+        for v in value if isinstance(value, list) else [value]:
+            if v is None:
+                continue
+            if kind == "numeric":
+                if isinstance(v, bool):
+                    return False
+                try:
+                    float(v)
+                except (TypeError, ValueError):
+                    return False
+            elif kind == "date":
+                if isinstance(v, (int, float)) or not self._is_date(v):
+                    return False
+            elif not isinstance(v, str):
+                return False
+        return True
+
+    def _is_date(self, v: Any) -> bool:
+        if hasattr(v, "isoformat"):
+            return True
+        try:
+            pd.Timestamp(str(v))
+        except (TypeError, ValueError):
+            return False
+        return True
+
+    def _record_resolution(
+        self,
+        log: Optional[List[Dict[str, Any]]],
+        hint: str,
+        method: str,
+        table: Optional[str],
+        column: Optional[str],
+        score: Optional[float],
+    ) -> None:
+        if log is not None:
+            log.append({"hint": hint, "method": method, "table": table, "column": column, "score": score})
+
+    def _resolve_column(
+        self,
+        hint: str,
+        tables: List[str],
+        alias_map: Dict[str, str],
+        *,
+        fuzzy: bool = True,
+        log: Optional[List[Dict[str, Any]]] = None,
+        accept: Optional[Callable[[str, str], bool]] = None,
+    ) -> Optional[str]:
+        """
+        hint -> "tN.[Col] AS [Col]" or None. Order: schema.table.col, exact /
+        case-insensitive name in the plan's tables, then the fuzzy (MinHash)
+        resolver above COLUMN_FUZZY_MIN_SCORE. accept(table, column) vets fuzzy
+        matches only (type checks for filters / time_field); a refused match is
+        logged as "fuzzy_rejected_type". Each decision is appended to log
+        (the bundle's column_resolution) when one is given.
+        """
         hint = (hint or "").strip()
         if not hint:
             return None
@@ -291,18 +467,44 @@ class SQLAgent:
             cpart = parts[2]
             if tpart in alias_map and self.registry.has_column(tpart, cpart):
                 a = alias_map[tpart]
+                self._record_resolution(log, hint, "qualified", tpart, cpart, 1.0)
                 return f"{a}.[{cpart}] AS [{cpart}]"
+            if fuzzy and tpart in alias_map:
+                match = get_column_resolver(self.registry).resolve(cpart, [tpart], self._fuzzy_min_score())
+                if match and accept is not None and not accept(tpart, match["column"]):
+                    self._record_resolution(log, hint, "fuzzy_rejected_type", tpart, match["column"], match["score"])
+                    return None
+                if match:
+                    c = match["column"]
+                    self._record_resolution(log, hint, "fuzzy", tpart, c, match["score"])
+                    return f"{alias_map[tpart]}.[{c}] AS [{c}]"
+            self._record_resolution(log, hint, "unresolved", tpart, None, None)
             return None
 
         # reject table.col ambiguity
         if len(parts) == 2:
+            self._record_resolution(log, hint, "rejected_ambiguous", None, None, None)
             return None
 
         for t in tables:
-            for c in self.registry.table_columns(t):
-                if c.lower() == hint.lower():
-                    a = alias_map.get(t, "t0")
-                    return f"{a}.[{c}] AS [{c}]"
+            c = self.registry.resolve_column(t, hint)
+            if c:
+                a = alias_map.get(t, "t0")
+                self._record_resolution(log, hint, "exact" if c == hint else "case_insensitive", t, c, 1.0)
+                return f"{a}.[{c}] AS [{c}]"
+
+        if fuzzy:
+            match = get_column_resolver(self.registry).resolve(hint, tables, self._fuzzy_min_score())
+            if match and accept is not None and not accept(match["table"], match["column"]):
+                self._record_resolution(log, hint, "fuzzy_rejected_type", match["table"], match["column"], match["score"])
+                return None
+            if match:
+                t, c = match["table"], match["column"]
+                a = alias_map.get(t, "t0")
+                self._record_resolution(log, hint, "fuzzy", t, c, match["score"])
+                return f"{a}.[{c}] AS [{c}]"
+
+        self._record_resolution(log, hint, "unresolved", None, None, None)
         return None
 
     def _alias_name(self, col_expr: str) -> str:
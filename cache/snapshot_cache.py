@@ -2,9 +2,54 @@ from __future__ import annotations
 
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Optional
+from typing import Iterable, Iterator, List, Optional
+import os
+import uuid
 
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+
+@dataclass
+class SnapshotHandle:
+    """
+    Lazy reference to a cached Parquet snapshot. Nothing is read until
+    to_pandas()/to_arrow()/iter_batches() is called.
+    """
+
+    cache_key: str
+    path: Path
+
+    @property
+    def num_rows(self) -> int:
+        return int(pq.ParquetFile(self.path).metadata.num_rows)
+
+    @property
+    def columns(self) -> list[str]:
+        return list(pq.ParquetFile(self.path).schema_arrow.names)
+
+    def to_arrow(self) -> pa.Table:
+        return pq.read_table(self.path)
+
+    def to_pandas(self) -> pd.DataFrame:
+        return pd.read_parquet(self.path)
+
+    def iter_batches(self, batch_size: int = 65536) -> Iterator[pa.RecordBatch]:
+        yield from pq.ParquetFile(self.path).iter_batches(batch_size=batch_size)
+
+    def head(self, n: int) -> pd.DataFrame:
+        """First n rows, reading only as many batches as needed."""
+        pf = pq.ParquetFile(self.path)
+        batches: List[pa.RecordBatch] = []
+        got = 0
+        for batch in pf.iter_batches(batch_size=max(1, min(int(n), 65536))):
+            if got >= n:
+                break
+            batches.append(batch)
+            got += batch.num_rows
+        table = pa.Table.from_batches(batches, schema=pf.schema_arrow)
+        return table.slice(0, max(0, int(n))).to_pandas()
 
 
 @dataclass
@@ -38,6 +83,16 @@ class SnapshotCache:
             # corrupt cache file → ignore (safe fallback)
             return None
 
+    def handle(self, cache_key: str) -> Optional[SnapshotHandle]:
+        path = self.path_for_key(cache_key)
+        if not path.exists():
+            return None
+        try:
+            pq.ParquetFile(path)  # footer check; corrupt file → treat as miss
+        except Exception:
+            return None
+        return SnapshotHandle(cache_key=cache_key, path=path)
+
     def put(self, cache_key: str, df: pd.DataFrame) -> Path:
         path = self.path_for_key(cache_key)
         # Ensure directory exists
@@ -47,6 +102,64 @@ class SnapshotCache:
         df.to_parquet(path, index=False)
         return path
 
+    def put_batches(
+        self,
+        cache_key: str,
+        batches: Iterable[pa.RecordBatch],
+        schema_probe_rows: int = 200_000,
+    ) -> SnapshotHandle:
+        """
+        Streams record batches into the snapshot, one Parquet row group per batch.
+
+        Writes go to a temp file that is renamed over <cache_key>.parquet only
+        after the last batch, so an interrupted query never leaves a partial
+        cache entry. Peak memory is one batch, except while a column is still
+        untyped (all NULL so far): batches are held until the unified schema
+        has no null-typed field or schema_probe_rows are buffered (remaining
+        null fields then become strings). Every batch is cast to that schema.
+        """
+        path = self.path_for_key(cache_key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f".{cache_key}.{uuid.uuid4().hex[:8]}.parquet.tmp")
+
+        writer: Optional[pq.ParquetWriter] = None
+        pending: List[pa.Table] = []
+        try:
+            for batch in batches:
+                table = _normalize(pa.Table.from_batches([batch]))
+                if writer is not None:
+                    writer.write_table(_conform(table, writer.schema))
+                    continue
+                pending.append(table)
+                schema = pa.unify_schemas([t.schema for t in pending], promote_options="permissive")
+                untyped = any(pa.types.is_null(f.type) for f in schema)
+                if untyped and sum(t.num_rows for t in pending) < int(schema_probe_rows):
+                    continue
+                schema = pa.schema([pa.field(f.name, pa.string()) if pa.types.is_null(f.type) else f for f in schema])
+                writer = pq.ParquetWriter(tmp, schema)
+                for t in pending:
+                    writer.write_table(_conform(t, schema))
+                pending = []
+
+            if writer is None:
+                if pending:
+                    # the stream ended while buffering: columns that stayed all NULL keep the null type
+                    schema = pa.unify_schemas([t.schema for t in pending], promote_options="permissive")
+                    pq.write_table(pa.concat_tables([_conform(t, schema) for t in pending]), tmp)
+                else:
+                    pq.write_table(pa.table({}), tmp)
+            else:
+                writer.close()
+                writer = None
+            os.replace(tmp, path)
+        finally:
+            if writer is not None:
+                writer.close()
+            if tmp.exists():
+                tmp.unlink()
+
+        return SnapshotHandle(cache_key=cache_key, path=path)
+
     def delete(self, cache_key: str) -> bool:
         path = self.path_for_key(cache_key)
         if path.exists():
@@ -66,4 +179,22 @@ class SnapshotCache:
                 n += 1
             except Exception:
                 pass
-        return n
\ No newline at end of file
+        return n
+
+
+def _conform(table: pa.Table, schema: pa.Schema) -> pa.Table:
+    """
+    Casts a batch to the snapshot schema (e.g. an all-NULL column to the type
+    later batches revealed). Raises ArrowInvalid for values that do not fit.
+    """
+    return table if table.schema == schema else table.cast(schema)
+
+
+def _normalize(table: pa.Table) -> pa.Table:
+    """
+    DECIMAL → float64 so snapshots match the DataFrame path (read_sql's
+    coerce_float) and per-batch precision/scale differences can't split the schema.
+    """
+    fields = [pa.field(f.name, pa.float64()) if pa.types.is_decimal(f.type) else f for f in table.schema]
+    target = pa.schema(fields)
+    return table if target == table.schema else table.cast(target)
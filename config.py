@@ -32,14 +32,56 @@ class Settings(BaseSettings):
     MAX_RETURNED_ROWS: int = 200000
     DEFAULT_EXPLORATORY_TOP: int = 10000
     FETCH_CHUNK_SIZE: int = 50000
-    STATEMENT_TIMEOUT_SECONDS: int = 360000  # keep large if you want
+    SQL_FETCH_MODE: str = "arrow"  # "arrow" (cursor.fetchmany -> Arrow) or "pandas" (read_sql chunks + concat)
+    SQL_STREAM_TO_SNAPSHOT: bool = True  # write fetched batches straight into the Parquet snapshot cache
+    ANALYSIS_MAX_ROWS: int = 50000  # rows of a streamed snapshot loaded for insights/dashboard (validation scans all rows)
+    STATEMENT_TIMEOUT_SECONDS: int = 900  # enforced server-side: the watchdog cancels the statement at the deadline
+    SQL_GENERATION_CACHE_SIZE: int = 256  # memoized SQLAgent.generate_sql results (0 = off), keyed by plan + registry version
+    COLUMN_FUZZY_MIN_SCORE: float = 0.5  # length-scaled trigram similarity (column_resolver.similarity) needed for a fuzzy column match (> 1 disables fuzzy matching)
+    JOIN_FANOUT_POLICY: str = "reject"  # "reject" (raise JoinFanoutError) or "warn" (only report in join_check)
+
+    # Connection pools (one per purpose, see db/engine.py)
+    SQL_POOL_SIZE: int = 5
+    SQL_MAX_OVERFLOW: int = 2
+    SQL_POOL_SIZE_PROFILING: int = 4
+    SQL_MAX_OVERFLOW_PROFILING: int = 0
+    SQL_POOL_SIZE_INTROSPECTION: int = 2
+    SQL_MAX_OVERFLOW_INTROSPECTION: int = 0
+    SQL_POOL_TIMEOUT_SECONDS: int = 30
+    SQL_POOL_RECYCLE_SECONDS: int = 1800
+    SCHEMA_REFRESH_MAX_WORKERS: int = 4  # DB load budget for concurrent schema refresh (also capped by the profiling pool)
+    PROFILE_TOP_VALUES_BATCH_COLUMNS: int = 8  # columns unpivoted into one top-values scan
+    PROFILE_AGGREGATE_BATCH_COLUMNS: int = 200  # columns per MIN/MAX/NULL-count scan
+    PROFILE_MODE: str = "auto"  # "exact", "approx" (sample + sketches) or "auto" (approx above PROFILE_APPROX_MIN_ROWS)
+    PROFILE_APPROX_MIN_ROWS: int = 1_000_000
+    PROFILE_SAMPLE_ROWS: int = 100_000  # per-table row budget for approximate profiling
+    PROFILE_TABLE_TIMEOUT_SECONDS: int = 120  # per-table cap for the sample scan (rows read before it fires are kept)
+    PROFILE_HIGH_CARDINALITY_RATIO: float = 0.9  # distinct/non-null in sample above this → no top values
+    STATS_HISTOGRAM_BUCKETS: int = 32  # equi-depth histogram buckets per numeric/date column (column statistics catalog)
+    STATS_MCV_COUNT: int = 20  # most common values kept per column for equality selectivity
+    STATS_RESERVOIR_ROWS: int = 4096  # per-column uniform sample kept by approximate profiling for histograms
+    QUERY_COST_MEDIUM_ROWS: int = 5_000_000  # estimated rows read + joined above this → query_cost_risk "medium"
+    QUERY_COST_HIGH_ROWS: int = 200_000_000  # ... above this → "high" (critique forces human review)
+
+    # SQL Server session settings (applied once per pooled connection)
+    MSSQL_SET_NOCOUNT: bool = True
+    MSSQL_LOCK_TIMEOUT_MS: int = 30000
+    MSSQL_READ_UNCOMMITTED: bool = True
 
     # Storage
     DATA_DIR: str = "./data"
     KNOWLEDGE_GRAPH_DIR: str = "./knowledge_graph_data"
+    KG_STORAGE_BACKEND: str = "sqlite"  # "sqlite" (per-table rows in metadata.sqlite) or "json" (legacy schema.json / schema_registry.json)
     CACHE_DIR: str = "./cache_data"
     DUCKDB_PATH: str ="./cache_data/catalog.duckdb"
     TRACES_DIR: str = "./traces_data"
+    TRACE_STORE_MODE: str = "append"  # "append" (run_<id>.jsonl segments) or "json" (legacy rewrite)
+    TRACE_FLUSH_INTERVAL_SECONDS: float = 0.0  # 0 = flush only on finalize / error / end of run
+    TRACE_FLUSH_ON_ERROR: bool = True
+    TRACE_BLOB_THRESHOLD_BYTES: int = 16384  # payloads above this go to traces_data/blobs (0 = keep inline)
+    TRACE_COMPRESS_AFTER_DAYS: float = 7
+    TRACE_CRITIQUE_RETENTION_DAYS: float = 30
+    TRACE_MAX_TOTAL_BYTES: int = 0  # 0 = no disk budget
     LOG_DIR: str = "./logs"
 
     OFFLINE_ONLY: bool = False
@@ -69,12 +69,45 @@ def run_agentic_pipeline(
     human_review: Optional[Dict[str, Any]],
     developer_mode: bool,
     large_mode: bool,
+) -> Dict[str, Any]:
+    """
+    Runs A→L inside a TraceStore session: node writes are buffered in memory
+    and flushed on finalize/error (or every TRACE_FLUSH_INTERVAL_SECONDS),
+    so the hot path does no per-node disk I/O.
+    """
+    with trace_store.session(
+        run_id,
+        flush_interval_seconds=float(getattr(settings, "TRACE_FLUSH_INTERVAL_SECONDS", 0.0)),
+        flush_on_error=bool(getattr(settings, "TRACE_FLUSH_ON_ERROR", True)),
+    ):
+        return _run_stages(
+            settings=settings,
+            trace_store=trace_store,
+            run_id=run_id,
+            user_question=user_question,
+            allowed_tables=allowed_tables,
+            human_review=human_review,
+            developer_mode=developer_mode,
+            large_mode=large_mode,
+        )
+
+
+def _run_stages(
+    *,
+    settings,
+    trace_store,
+    run_id: str,
+    user_question: str,
+    allowed_tables: List[str],
+    human_review: Optional[Dict[str, Any]],
+    developer_mode: bool,
+    large_mode: bool,
 ) -> Dict[str, Any]:
     """
     Runs A→L deterministically, persisting node outputs to TraceStore.
 
     CRITICAL FIX:
-    - Build ONE shared SQL engine per run (no new engines inside nodes).
+    - Use the process-wide pooled engine (db.engine.EngineManager); no engine is built per run.
     - Executor must reuse this engine.
     - Run-level connection governor prevents runaway open/close loops.
     """
@@ -84,6 +117,7 @@ def run_agentic_pipeline(
     # -------------------------
     from knowledge_graph.schema_registry import SchemaRegistry
     from knowledge_graph.store import KnowledgeGraphStore
+    from knowledge_graph.join_graph import JoinFanoutError
 
     from agents.planner_agent import PlannerAgent
     from agents.sql_agent import SQLAgent
@@ -96,25 +130,23 @@ def run_agentic_pipeline(
 
     from observability.query_log import QueryLogStore
 
-    # ✅ IMPORTANT: your DB module must expose build_mssql_engine()
-    # If you already have it elsewhere, import from there.
-    from db import build_mssql_engine
+    from db.engine import get_pooled_engine
+    from db.query_control import QueryCancelledError
 
     # -------------------------
     # Governor + shared engine
     # -------------------------
     governor = RunConnectionGovernor(max_connections=getattr(settings, "MAX_CONNECTIONS_PER_RUN", 10))
 
-    # Build ONE engine per run. Pool limits also prevent runaway.
+    # Shared bounded pool (created once per process, reused by every run).
     # This engine must be reused in Executor (and anywhere else you query DB).
-    with governor.acquire("build_engine"):
-        engine = build_mssql_engine(settings)
+    engine = get_pooled_engine(settings, "interactive")
 
     # -------------------------
     # Init shared stores/agents
     # -------------------------
-    kg = KnowledgeGraphStore(settings.KNOWLEDGE_GRAPH_DIR)
-    registry = SchemaRegistry(settings.KNOWLEDGE_GRAPH_DIR)
+    kg = KnowledgeGraphStore(settings.KNOWLEDGE_GRAPH_DIR, backend=settings.KG_STORAGE_BACKEND)
+    registry = SchemaRegistry(settings.KNOWLEDGE_GRAPH_DIR, backend=settings.KG_STORAGE_BACKEND)
 
     planner = PlannerAgent(settings=settings, kg=kg, registry=registry)
     sql_agent = SQLAgent(settings=settings, registry=registry)
@@ -131,6 +163,8 @@ def run_agentic_pipeline(
 
     final: Dict[str, Any] = {"run_id": run_id, "status": "started"}
 
+    trace_store.set_attrs(run_id, model=getattr(settings, "OLLAMA_MODEL", None))
+
     trace_store.add_node(
         run_id,
         "RUN_CONFIG",
@@ -147,10 +181,11 @@ def run_agentic_pipeline(
     # A) Intent extraction
     # -------------------------
     try:
-        intent = planner.extract_intent(user_question=user_question, allowed_tables=allowed_tables)
-        trace_store.add_node(run_id, "A_intent", intent)
-        critique_a = critique.critique_step("A_intent", intent)
-        trace_store.add_node(run_id, "A_intent__critique", critique_a)
+        with trace_store.stage(run_id, "A_intent"):
+            intent = planner.extract_intent(user_question=user_question, allowed_tables=allowed_tables)
+            trace_store.add_node(run_id, "A_intent", intent)
+            critique_a = critique.critique_step("A_intent", intent)
+            trace_store.add_node(run_id, "A_intent__critique", critique_a)
     except Exception as e:
         trace_store.add_error(run_id, "A_intent", str(e), traceback.format_exc())
         return {"run_id": run_id, "status": "failed", "error": f"Intent failed: {e}"}
@@ -159,10 +194,11 @@ def run_agentic_pipeline(
     # B) Schema reasoning
     # -------------------------
     try:
-        schema_reasoning = planner.schema_reasoning(intent=intent, allowed_tables=allowed_tables)
-        trace_store.add_node(run_id, "B_schema_reasoning", schema_reasoning)
-        critique_b = critique.critique_step("B_schema_reasoning", schema_reasoning)
-        trace_store.add_node(run_id, "B_schema_reasoning__critique", critique_b)
+        with trace_store.stage(run_id, "B_schema_reasoning"):
+            schema_reasoning = planner.schema_reasoning(intent=intent, allowed_tables=allowed_tables)
+            trace_store.add_node(run_id, "B_schema_reasoning", schema_reasoning)
+            critique_b = critique.critique_step("B_schema_reasoning", schema_reasoning)
+            trace_store.add_node(run_id, "B_schema_reasoning__critique", critique_b)
     except Exception as e:
         trace_store.add_error(run_id, "B_schema_reasoning", str(e), traceback.format_exc())
         return {"run_id": run_id, "status": "failed", "error": f"Schema reasoning failed: {e}"}
@@ -171,19 +207,20 @@ def run_agentic_pipeline(
     # C) Plan generation
     # -------------------------
     try:
-        plan = planner.build_plan(
-            user_question=user_question,
-            intent=intent,
-            schema_reasoning=schema_reasoning,
-            allowed_tables=allowed_tables,
-        )
-        plan["large_mode"] = bool(large_mode)
+        with trace_store.stage(run_id, "C_plan"):
+            plan = planner.build_plan(
+                user_question=user_question,
+                intent=intent,
+                schema_reasoning=schema_reasoning,
+                allowed_tables=allowed_tables,
+            )
+            plan["large_mode"] = bool(large_mode)
 
-        trace_store.add_node(run_id, "C_plan", plan)
-        trace_store.add_node(run_id, "C_plan__large_mode", {"large_mode": bool(large_mode)})
+            trace_store.add_node(run_id, "C_plan", plan)
+            trace_store.add_node(run_id, "C_plan__large_mode", {"large_mode": bool(large_mode)})
 
-        critique_c = critique.critique_step("C_plan", plan)
-        trace_store.add_node(run_id, "C_plan__critique", critique_c)
+            critique_c = critique.critique_step("C_plan", plan)
+            trace_store.add_node(run_id, "C_plan__critique", critique_c)
     except Exception as e:
         trace_store.add_error(run_id, "C_plan", str(e), traceback.format_exc())
         return {"run_id": run_id, "status": "failed", "error": f"Plan failed: {e}"}
@@ -192,28 +229,31 @@ def run_agentic_pipeline(
     # D) Human review checkpoint
     # -------------------------
     try:
-        review_packet = planner.build_human_review_packet(plan=plan, intent=intent, allowed_tables=allowed_tables)
-        trace_store.add_node(run_id, "D_human_review", review_packet)
-
-        if human_review is not None:
-            applied = planner.apply_human_review(plan=plan, review=human_review, allowed_tables=allowed_tables)
-            plan = applied["plan"]
-            allowed_tables = applied["allowed_tables"]
-
-            if isinstance(human_review, dict) and "large_mode" in human_review:
-                plan["large_mode"] = bool(human_review["large_mode"])
-            else:
-                plan["large_mode"] = bool(large_mode)
-
-            trace_store.add_node(run_id, "D_human_review__applied", applied)
-
-        critique_d = critique.critique_step("D_human_review", {"review_packet": review_packet, "applied": human_review})
-        trace_store.add_node(run_id, "D_human_review__critique", critique_d)
-
-        if critique_d.get("force_hitl") and human_review is None:
-            final.update({"status": "needs_human_review", "human_review_packet": review_packet})
-            trace_store.finalize(run_id, status="needs_human_review")
-            return final
+        with trace_store.stage(run_id, "D_human_review"):
+            review_packet = planner.build_human_review_packet(plan=plan, intent=intent, allowed_tables=allowed_tables)
+            trace_store.add_node(run_id, "D_human_review", review_packet)
+
+            if human_review is not None:
+                applied = planner.apply_human_review(plan=plan, review=human_review, allowed_tables=allowed_tables)
+                plan = applied["plan"]
+                allowed_tables = applied["allowed_tables"]
+
+                if isinstance(human_review, dict) and "large_mode" in human_review:
+                    plan["large_mode"] = bool(human_review["large_mode"])
+                else:
+                    plan["large_mode"] = bool(large_mode)
+
+                trace_store.add_node(run_id, "D_human_review__applied", applied)
+
+            critique_d = critique.critique_step("D_human_review", {"review_packet": review_packet, "applied": human_review})
+            trace_store.add_node(run_id, "D_human_review__critique", critique_d)
+
+            # a HIGH estimated cost at C also stops here until a human approves the plan
+            cost_hitl = critique_c.get("force_hitl") and plan.get("query_cost_risk") == "high"
+            if (critique_d.get("force_hitl") or cost_hitl) and human_review is None:
+                final.update({"status": "needs_human_review", "human_review_packet": review_packet})
+                trace_store.finalize(run_id, status="needs_human_review")
+                return final
     except Exception as e:
         trace_store.add_error(run_id, "D_human_review", str(e), traceback.format_exc())
         return {"run_id": run_id, "status": "failed", "error": f"Human review failed: {e}"}
@@ -222,33 +262,41 @@ def run_agentic_pipeline(
     # E) SQL generation
     # -------------------------
     try:
-        try:
-            sql_bundle = sql_agent.generate_sql(
-                plan=plan,
-                allowed_tables=allowed_tables,
-                large_mode=bool(plan.get("large_mode", large_mode)),
-            )
-        except ValueError as ve:
-            reg = registry.load()
-            reg_tables = list((reg.get("tables") or {}).keys())
-            allow_ok = [t for t in allowed_tables if t in reg_tables] if allowed_tables else []
-            plan["tables"] = (allow_ok[:2] if allow_ok else reg_tables[:2])
-
-            trace_store.add_node(
-                run_id,
-                "E_sql_generation__recovered_tables",
-                {"reason": str(ve), "plan_tables_after_recovery": plan["tables"]},
-            )
+        with trace_store.stage(run_id, "E_sql_generation"):
+            try:
+                sql_bundle = sql_agent.generate_sql(
+                    plan=plan,
+                    allowed_tables=allowed_tables,
+                    large_mode=bool(plan.get("large_mode", large_mode)),
+                )
+            except JoinFanoutError as je:
+                # the joins would multiply rows; table recovery cannot fix that, a human has to
+                trace_store.add_node(run_id, "E_sql_generation__join_fanout", {"problems": je.problems})
+                review_packet = planner.build_human_review_packet(plan=plan, intent=intent, allowed_tables=allowed_tables)
+                final.update({"status": "needs_human_review", "human_review_packet": review_packet, "join_problems": je.problems})
+                trace_store.finalize(run_id, status="needs_human_review")
+                return final
+            except ValueError as ve:
+                reg = registry.load()
+                reg_tables = list((reg.get("tables") or {}).keys())
+                allow_ok = [t for t in allowed_tables if t in reg_tables] if allowed_tables else []
+                plan["tables"] = (allow_ok[:2] if allow_ok else reg_tables[:2])
+
+                trace_store.add_node(
+                    run_id,
+                    "E_sql_generation__recovered_tables",
+                    {"reason": str(ve), "plan_tables_after_recovery": plan["tables"]},
+                )
 
-            sql_bundle = sql_agent.generate_sql(
-                plan=plan,
-                allowed_tables=allowed_tables,
-                large_mode=bool(plan.get("large_mode", large_mode)),
-            )
+                sql_bundle = sql_agent.generate_sql(
+                    plan=plan,
+                    allowed_tables=allowed_tables,
+                    large_mode=bool(plan.get("large_mode", large_mode)),
+                )
 
-        trace_store.add_node(run_id, "E_sql_generation", sql_bundle)
-        critique_e = critique.critique_step("E_sql_generation", sql_bundle)
-        trace_store.add_node(run_id, "E_sql_generation__critique", critique_e)
+            trace_store.add_node(run_id, "E_sql_generation", sql_bundle)
+            critique_e = critique.critique_step("E_sql_generation", sql_bundle)
+            trace_store.add_node(run_id, "E_sql_generation__critique", critique_e)
 
     except MaxConnectionsPerRunError as e:
         trace_store.add_error(run_id, "E_sql_generation", str(e), traceback.format_exc())
@@ -261,14 +309,15 @@ def run_agentic_pipeline(
     # F) SQL safety validation
     # -------------------------
     try:
-        safety = guard.validate(sql_bundle["sql"])
-        trace_store.add_node(run_id, "F_sql_safety", safety)
-        critique_f = critique.critique_step("F_sql_safety", safety)
-        trace_store.add_node(run_id, "F_sql_safety__critique", critique_f)
-        if not safety["ok"]:
-            final.update({"status": "rejected", "rejection": safety})
-            trace_store.finalize(run_id, status="rejected")
-            return final
+        with trace_store.stage(run_id, "F_sql_safety"):
+            safety = guard.validate(sql_bundle["sql"])
+            trace_store.add_node(run_id, "F_sql_safety", safety)
+            critique_f = critique.critique_step("F_sql_safety", safety)
+            trace_store.add_node(run_id, "F_sql_safety__critique", critique_f)
+            if not safety["ok"]:
+                final.update({"status": "rejected", "rejection": safety})
+                trace_store.finalize(run_id, status="rejected")
+                return final
     except Exception as e:
         trace_store.add_error(run_id, "F_sql_safety", str(e), traceback.format_exc())
         return {"run_id": run_id, "status": "failed", "error": f"Safety validation failed: {e}"}
@@ -277,14 +326,30 @@ def run_agentic_pipeline(
     # G) Execute SQL safely (shared engine)
     # -------------------------
     try:
-        df, exec_meta = executor.run(sql=sql_bundle["sql"], params=sql_bundle.get("params") or {})
-        trace_store.add_node(run_id, "G_execute", exec_meta)
-        query_logs.append(exec_meta)
-        critique_g = critique.critique_step("G_execute", exec_meta)
-        trace_store.add_node(run_id, "G_execute__critique", critique_g)
+        with trace_store.stage(run_id, "G_execute"):
+            if bool(getattr(settings, "SQL_STREAM_TO_SNAPSHOT", True)):
+                # results stream straight into the Parquet cache; later stages read the snapshot
+                snapshot, exec_meta = executor.run_to_snapshot(
+                    sql=sql_bundle["sql"], params=sql_bundle.get("params") or {}
+                )
+                df = None
+            else:
+                snapshot = None
+                df, exec_meta = executor.run(sql=sql_bundle["sql"], params=sql_bundle.get("params") or {})
+            trace_store.add_node(run_id, "G_execute", exec_meta)
+            trace_store.set_attrs(run_id, cache_hit=bool(exec_meta.get("cache_hit")))
+            query_logs.append(exec_meta)
+            critique_g = critique.critique_step("G_execute", exec_meta)
+            trace_store.add_node(run_id, "G_execute__critique", critique_g)
     except MaxConnectionsPerRunError as e:
         trace_store.add_error(run_id, "G_execute", str(e), traceback.format_exc())
         return {"run_id": run_id, "status": "failed", "error": f"Run terminated: {e}"}
+    except QueryCancelledError as e:
+        exec_meta = {"query_id": e.query_id, "cancelled": True, "cancel_reason": e.reason}
+        trace_store.add_node(run_id, "G_execute", exec_meta)
+        query_logs.append({"sql": sql_bundle["sql"], **exec_meta})
+        trace_store.add_error(run_id, "G_execute", str(e), traceback.format_exc())
+        return {"run_id": run_id, "status": "failed", "error": f"Query cancelled: {e.reason}", "exec_meta": exec_meta}
     except Exception as e:
         trace_store.add_error(run_id, "G_execute", str(e), traceback.format_exc())
         return {"run_id": run_id, "status": "failed", "error": f"Execution failed: {e}"}
@@ -293,14 +358,18 @@ def run_agentic_pipeline(
     # H) Data validation
     # -------------------------
     try:
-        dq_report = dq.run(df, expected_columns=plan.get("expected_columns"))
-        trace_store.add_node(run_id, "H_data_validation", dq_report)
-        critique_h = critique.critique_step("H_data_validation", dq_report)
-        trace_store.add_node(run_id, "H_data_validation__critique", critique_h)
-        if not dq_report["ok"]:
-            final.update({"status": "failed_data_quality", "data_quality": dq_report})
-            trace_store.finalize(run_id, status="failed_data_quality")
-            return final
+        with trace_store.stage(run_id, "H_data_validation"):
+            if snapshot is not None:
+                dq_report = dq.run_snapshot(snapshot, expected_columns=plan.get("expected_columns"))
+            else:
+                dq_report = dq.run(df, expected_columns=plan.get("expected_columns"))
+            trace_store.add_node(run_id, "H_data_validation", dq_report)
+            critique_h = critique.critique_step("H_data_validation", dq_report)
+            trace_store.add_node(run_id, "H_data_validation__critique", critique_h)
+            if not dq_report["ok"]:
+                final.update({"status": "failed_data_quality", "data_quality": dq_report})
+                trace_store.finalize(run_id, status="failed_data_quality")
+                return final
     except Exception as e:
         trace_store.add_error(run_id, "H_data_validation", str(e), traceback.format_exc())
         return {"run_id": run_id, "status": "failed", "error": f"Data validation failed: {e}"}
@@ -309,10 +378,16 @@ def run_agentic_pipeline(
     # I) Insights
     # -------------------------
     try:
-        insights = insight.generate(df=df, plan=plan)
-        trace_store.add_node(run_id, "I_insights", insights)
-        critique_i = critique.critique_step("I_insights", insights)
-        trace_store.add_node(run_id, "I_insights__critique", critique_i)
+        with trace_store.stage(run_id, "I_insights"):
+            if snapshot is not None:
+                # row-capped frame: memory stays bounded however large the snapshot is
+                df = snapshot.head(int(getattr(settings, "ANALYSIS_MAX_ROWS", 50000)))
+            insights = insight.generate(df=df, plan=plan)
+            if snapshot is not None and len(df) < dq_report["rows"]:
+                insights.setdefault("warnings", []).append(f"analysis_capped_at_{len(df)}_rows")
+            trace_store.add_node(run_id, "I_insights", insights)
+            critique_i = critique.critique_step("I_insights", insights)
+            trace_store.add_node(run_id, "I_insights__critique", critique_i)
     except Exception as e:
         trace_store.add_error(run_id, "I_insights", str(e), traceback.format_exc())
         return {"run_id": run_id, "status": "failed", "error": f"Insights failed: {e}"}
@@ -321,11 +396,12 @@ def run_agentic_pipeline(
     # J) Dashboard generation
     # -------------------------
     try:
-        html_bundle = dashboard.build_dashboard(df=df, plan=plan, insights=insights)
-        trace_store.add_node(run_id, "J_dashboard", {"dashboard_meta": html_bundle["meta"]})
-        trace_store.add_node(run_id, "J_dashboard__html", {"html": html_bundle["html"][:5000], "note": "truncated"})
-        critique_j = critique.critique_step("J_dashboard", html_bundle["meta"])
-        trace_store.add_node(run_id, "J_dashboard__critique", critique_j)
+        with trace_store.stage(run_id, "J_dashboard"):
+            html_bundle = dashboard.build_dashboard(df=df, plan=plan, insights=insights)
+            trace_store.add_node(run_id, "J_dashboard", {"dashboard_meta": html_bundle["meta"]})
+            trace_store.add_node(run_id, "J_dashboard__html", {"html": html_bundle["html"]})
+            critique_j = critique.critique_step("J_dashboard", html_bundle["meta"])
+            trace_store.add_node(run_id, "J_dashboard__critique", critique_j)
     except Exception as e:
         trace_store.add_error(run_id, "J_dashboard", str(e), traceback.format_exc())
         return {"run_id": run_id, "status": "failed", "error": f"Dashboard failed: {e}"}
@@ -333,29 +409,31 @@ def run_agentic_pipeline(
     # -------------------------
     # K) Render
     # -------------------------
-    trace_store.add_node(run_id, "K_render", {"ok": True, "note": "Rendered in Streamlit UI"})
-    critique_k = critique.critique_step("K_render", {"ok": True})
-    trace_store.add_node(run_id, "K_render__critique", critique_k)
+    with trace_store.stage(run_id, "K_render"):
+        trace_store.add_node(run_id, "K_render", {"ok": True, "note": "Rendered in Streamlit UI"})
+        critique_k = critique.critique_step("K_render", {"ok": True})
+        trace_store.add_node(run_id, "K_render__critique", critique_k)
 
     # -------------------------
     # L) Critique rollup
     # -------------------------
-    rollup = critique.rollup(
-        [
-            ("A", trace_store.get_node(run_id, "A_intent__critique")),
-            ("B", trace_store.get_node(run_id, "B_schema_reasoning__critique")),
-            ("C", trace_store.get_node(run_id, "C_plan__critique")),
-            ("D", trace_store.get_node(run_id, "D_human_review__critique")),
-            ("E", trace_store.get_node(run_id, "E_sql_generation__critique")),
-            ("F", trace_store.get_node(run_id, "F_sql_safety__critique")),
-            ("G", trace_store.get_node(run_id, "G_execute__critique")),
-            ("H", trace_store.get_node(run_id, "H_data_validation__critique")),
-            ("I", trace_store.get_node(run_id, "I_insights__critique")),
-            ("J", trace_store.get_node(run_id, "J_dashboard__critique")),
-            ("K", trace_store.get_node(run_id, "K_render__critique")),
-        ]
-    )
-    trace_store.add_node(run_id, "L_critique_rollup", rollup)
+    with trace_store.stage(run_id, "L_critique_rollup"):
+        rollup = critique.rollup(
+            [
+                ("A", trace_store.get_node(run_id, "A_intent__critique")),
+                ("B", trace_store.get_node(run_id, "B_schema_reasoning__critique")),
+                ("C", trace_store.get_node(run_id, "C_plan__critique")),
+                ("D", trace_store.get_node(run_id, "D_human_review__critique")),
+                ("E", trace_store.get_node(run_id, "E_sql_generation__critique")),
+                ("F", trace_store.get_node(run_id, "F_sql_safety__critique")),
+                ("G", trace_store.get_node(run_id, "G_execute__critique")),
+                ("H", trace_store.get_node(run_id, "H_data_validation__critique")),
+                ("I", trace_store.get_node(run_id, "I_insights__critique")),
+                ("J", trace_store.get_node(run_id, "J_dashboard__critique")),
+                ("K", trace_store.get_node(run_id, "K_render__critique")),
+            ]
+        )
+        trace_store.add_node(run_id, "L_critique_rollup", rollup)
 
     final.update(
         {
@@ -370,7 +448,7 @@ def run_agentic_pipeline(
             "dashboard_meta": html_bundle["meta"],
             "df_preview": df.head(50).to_dict(orient="records"),
             "columns": list(df.columns),
-            "rows": int(len(df)),
+            "rows": int(dq_report["rows"]),
         }
     )
     trace_store.finalize(run_id, status="success")
@@ -1,19 +1,24 @@
 from __future__ import annotations
 
-from typing import Any, Dict, Optional
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional, Tuple
 import re
-import time
-from urllib.parse import quote_plus
 
 import pandas as pd
-from sqlalchemy import create_engine, text
+import pyarrow as pa
+from sqlalchemy import text
 from sqlalchemy.engine import Engine
 
-
-# -----------------------------
-# Global engine cache (single pool)
-# -----------------------------
-_ENGINE: Optional[Engine] = None
+from db.engine import get_pooled_engine, pool_telemetry, is_session_managed, session_statements  # noqa: F401
+from db.arrow_fetch import iter_record_batches, batches_to_table
+from db.query_control import (  # noqa: F401
+    QueryCancelledError,
+    QueryControl,
+    cancel_query,
+    install_cancel_hook,
+    list_inflight_queries,
+    watch,
+)
 
 
 # -----------------------------
@@ -49,58 +54,148 @@ def _enforce_select_only(sql: str) -> None:
 
 
 # -----------------------------
-# Engine (STANDARDIZED: DB_* + ODBC_*)
+# Engine (all pools are owned by db.engine.EngineManager)
 # -----------------------------
 def build_mssql_engine(settings) -> Engine:
     """
     SQL Server engine using SQLAlchemy + pyodbc.
-    Uses DB_* + ODBC_* fields from Settings (matches your config.py screenshot).
+    Returns the managed, bounded "interactive" pool instead of creating a
+    new engine (and a fresh ODBC handshake) per call.
     """
-    db_dialect = getattr(settings, "DB_DIALECT", "mssql+pyodbc")
-    driver = getattr(settings, "ODBC_DRIVER", "ODBC Driver 18 for SQL Server")
-
-    host = settings.DB_HOST
-    port = int(getattr(settings, "DB_PORT", 1433))
-    db = settings.DB_NAME
-    user = settings.DB_USERNAME
-    pwd = settings.DB_PASSWORD
-
-    # optional extras from config.py (example: "TrustServerCertificate=yes;Encrypt=no")
-    extra = (getattr(settings, "ODBC_EXTRA_PARAMS", "") or "").strip()
-    if extra and not extra.endswith(";"):
-        extra += ";"
-
-    # Always read-only intent
-    odbc = (
-        f"Driver={{{driver}}};"
-        f"Server={host},{port};"
-        f"Database={db};"
-        f"Uid={user};"
-        f"Pwd={pwd};"
-        f"ApplicationIntent=ReadOnly;"
-        f"{extra}"
-    )
-
-    conn_url = f"{db_dialect}:///?odbc_connect={quote_plus(odbc)}"
-
-    return create_engine(
-        conn_url,
-        pool_pre_ping=True,
-        pool_recycle=int(getattr(settings, "DB_POOL_RECYCLE", 1800)),
-        future=True,
-    )
+    return get_pooled_engine(settings, "interactive")
 
 
 def get_engine(settings) -> Engine:
-    global _ENGINE
-    if _ENGINE is None:
-        _ENGINE = build_mssql_engine(settings)
-    return _ENGINE
+    return get_pooled_engine(settings, "interactive")
 
 
 # -----------------------------
 # Query execution (STREAMING + CHUNKS)
 # -----------------------------
+def _resolve_limits(settings, timeout_seconds: int, max_rows: int) -> Tuple[int, int, int]:
+    timeout_seconds = int(timeout_seconds) if timeout_seconds and timeout_seconds > 0 else int(
+        getattr(settings, "STATEMENT_TIMEOUT_SECONDS", 3600)
+    )
+    max_rows = int(max_rows) if max_rows and max_rows > 0 else int(
+        getattr(settings, "MAX_RETURNED_ROWS", 200000)
+    )
+
+    chunksize = int(getattr(settings, "FETCH_CHUNK_SIZE", getattr(settings, "SQL_CHUNKSIZE", 50000)))
+    chunksize = max(1000, min(chunksize, 200000))
+    return timeout_seconds, max_rows, chunksize
+
+
+def _prepare_connection(conn, engine: Engine, settings) -> None:
+    # Session-level safety: managed pools apply it once per connection;
+    # only foreign engines get the per-query SETs (won’t break if not supported)
+    if not is_session_managed(engine):
+        try:
+            for stmt in session_statements(settings):
+                conn.exec_driver_sql(stmt)
+        except Exception:
+            pass
+
+
+@contextmanager
+def _controlled_connection(engine: Engine, settings, control: QueryControl, timeout_seconds: int):
+    """
+    Checks out a connection whose statements are registered with `control`:
+    the watchdog cancels them server-side at the deadline, and cancel_query()
+    can stop them from another thread (UI). Driver errors caused by a cancel
+    surface as QueryCancelledError.
+    """
+    install_cancel_hook(engine)
+    with watch(control):
+        with engine.connect() as conn:
+            _prepare_connection(conn, engine, settings)
+            try:
+                yield conn.execution_options(timeout=timeout_seconds, query_control=control)
+            except QueryCancelledError:
+                raise
+            except Exception as e:
+                if control.cancelled:
+                    raise QueryCancelledError(control.query_id, control.cancel_reason or "cancelled") from e
+                raise
+            # a cancel that raced with the last fetch still wins
+            control.check()
+
+
+def iter_sql_record_batches(
+    *,
+    sql: str,
+    params: Dict[str, Any],
+    timeout_seconds: int,
+    max_rows: int,
+    settings=None,
+    engine: Optional[Engine] = None,
+    control: Optional[QueryControl] = None,
+) -> Iterator[pa.RecordBatch]:
+    """
+    Arrow-native fetch: yields typed record batches (FETCH_CHUNK_SIZE rows each)
+    straight from cursor.fetchmany. Same guards as run_sql_query; the connection
+    is held until the iterator is exhausted or closed.
+    """
+    if settings is None:
+        from config import Settings  # lazy import
+        settings = Settings()
+
+    _enforce_select_only(sql)
+
+    engine = engine or get_engine(settings)
+    timeout_seconds, max_rows, chunksize = _resolve_limits(settings, timeout_seconds, max_rows)
+    control = control or QueryControl(sql=sql, timeout_seconds=timeout_seconds)
+
+    with _controlled_connection(engine, settings, control, timeout_seconds) as conn:
+        yield from iter_record_batches(
+            conn,
+            sql,
+            params or {},
+            batch_size=chunksize,
+            max_rows=max_rows,
+        )
+
+
+def run_sql_query_arrow(
+    *,
+    sql: str,
+    params: Dict[str, Any],
+    timeout_seconds: int,
+    max_rows: int,
+    settings=None,
+    engine: Optional[Engine] = None,
+    control: Optional[QueryControl] = None,
+) -> pa.Table:
+    """
+    Executes SELECT-only SQL and returns a pyarrow.Table (no pandas involved).
+    """
+    return batches_to_table(
+        iter_sql_record_batches(
+            sql=sql,
+            params=params,
+            timeout_seconds=timeout_seconds,
+            max_rows=max_rows,
+            settings=settings,
+            engine=engine,
+            control=control,
+        )
+    )
+
+
+def arrow_to_pandas(table: pa.Table) -> pd.DataFrame:
+    """
+    Materializes a DataFrame from Arrow. DECIMAL columns become float64
+    (same as pandas.read_sql's coerce_float=True); Arrow buffers are released
+    column by column as they are converted.
+    """
+    fields = []
+    for f in table.schema:
+        fields.append(pa.field(f.name, pa.float64()) if pa.types.is_decimal(f.type) else f)
+    target = pa.schema(fields)
+    if target != table.schema:
+        table = table.cast(target)
+    return table.to_pandas(self_destruct=True, split_blocks=True)
+
+
 def run_sql_query(
     *,
     sql: str,
@@ -108,52 +203,52 @@ def run_sql_query(
     timeout_seconds: int,
     max_rows: int,
     settings=None,
+    engine: Optional[Engine] = None,
+    fetch_mode: Optional[str] = None,
+    control: Optional[QueryControl] = None,
 ) -> pd.DataFrame:
     """
     Executes SELECT-only SQL safely with:
       - SELECT-only enforcement
-      - SQL Server session guards (NOCOUNT, LOCK_TIMEOUT, optional READ UNCOMMITTED)
+      - SQL Server session guards (NOCOUNT, LOCK_TIMEOUT, optional READ UNCOMMITTED),
+        applied once per pooled connection (see db.engine.SessionInitializer)
       - streaming results (chunked) to avoid memory blowups
       - max_rows cutoff
-      - best-effort timeout
+      - server-side cancel at timeout_seconds (watchdog → cursor.cancel());
+        raises QueryCancelledError. Pass `control` to cancel from elsewhere.
+
+    fetch_mode (default SQL_FETCH_MODE):
+      - "arrow":  cursor.fetchmany -> Arrow batches -> one DataFrame at the end
+      - "pandas": legacy pd.read_sql_query(chunksize=...) + pd.concat
     """
     if settings is None:
         from config import Settings  # lazy import
         settings = Settings()
 
-    _enforce_select_only(sql)
-
-    engine = get_engine(settings)
-
-    timeout_seconds = int(timeout_seconds) if timeout_seconds and timeout_seconds > 0 else int(
-        getattr(settings, "STATEMENT_TIMEOUT_SECONDS", 3600)
-    )
-    max_rows = int(max_rows) if max_rows and max_rows > 0 else int(
-        getattr(settings, "MAX_RETURNED_ROWS", 200000)
-    )
+    fetch_mode = (fetch_mode or getattr(settings, "SQL_FETCH_MODE", "arrow") or "arrow").lower()
+    if fetch_mode == "arrow":
+        table = run_sql_query_arrow(
+            sql=sql,
+            params=params,
+            timeout_seconds=timeout_seconds,
+            max_rows=max_rows,
+            settings=settings,
+            engine=engine,
+            control=control,
+        )
+        return arrow_to_pandas(table)
 
-    chunksize = int(getattr(settings, "FETCH_CHUNK_SIZE", getattr(settings, "SQL_CHUNKSIZE", 50000)))
-    chunksize = max(1000, min(chunksize, 200000))
+    _enforce_select_only(sql)
 
-    lock_timeout_ms = int(getattr(settings, "MSSQL_LOCK_TIMEOUT_MS", 30000))
-    read_uncommitted = bool(getattr(settings, "MSSQL_READ_UNCOMMITTED", True))
+    engine = engine or get_engine(settings)
+    timeout_seconds, max_rows, chunksize = _resolve_limits(settings, timeout_seconds, max_rows)
 
-    t0 = time.time()
+    control = control or QueryControl(sql=sql, timeout_seconds=timeout_seconds)
     frames: list[pd.DataFrame] = []
     rows_so_far = 0
 
-    with engine.connect() as conn:
-        # Session-level safety (won’t break if not supported)
-        try:
-            conn.exec_driver_sql("SET NOCOUNT ON;")
-            if lock_timeout_ms and lock_timeout_ms > 0:
-                conn.exec_driver_sql(f"SET LOCK_TIMEOUT {lock_timeout_ms};")
-            if read_uncommitted:
-                conn.exec_driver_sql("SET TRANSACTION ISOLATION LEVEL READ UNCOMMITTED;")
-        except Exception:
-            pass
-
-        conn = conn.execution_options(stream_results=True, timeout=timeout_seconds)
+    with _controlled_connection(engine, settings, control, timeout_seconds) as conn:
+        conn = conn.execution_options(stream_results=True)
 
         it = pd.read_sql_query(
             sql=text(sql),
@@ -175,9 +270,6 @@ def run_sql_query(
             if rows_so_far >= max_rows:
                 break
 
-            if (time.time() - t0) > float(timeout_seconds):
-                break
-
     if not frames:
         return pd.DataFrame()
 
@@ -185,4 +277,4 @@ def run_sql_query(
     if len(df) > max_rows:
         df = df.head(max_rows)
 
-    return df
\ No newline at end of file
+    return df
@@ -0,0 +1,116 @@
+from __future__ import annotations
+
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+import datetime as dt
+import decimal
+import uuid
+
+import pyarrow as pa
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+
+# pyodbc reports the Python type of each column in cursor.description[i][1]
+_PY_TO_ARROW: Dict[Any, pa.DataType] = {
+    int: pa.int64(),
+    float: pa.float64(),
+    bool: pa.bool_(),
+    str: pa.string(),
+    bytes: pa.binary(),
+    bytearray: pa.binary(),
+    dt.datetime: pa.timestamp("us"),
+    dt.date: pa.date32(),
+    dt.time: pa.time64("us"),
+}
+
+
+def arrow_type_for(type_code: Any, precision: Any = None, scale: Any = None) -> Optional[pa.DataType]:
+    """
+    Maps a DBAPI type_code to an Arrow type. None = let Arrow infer.
+    DECIMAL uses the cursor's precision/scale when the driver reports them
+    (so an all-NULL block is still typed), else it is inferred from the values.
+    """
+    if type_code is decimal.Decimal:
+        if isinstance(precision, int) and isinstance(scale, int) and 0 < precision <= 38 and 0 <= scale <= precision:
+            return pa.decimal128(precision, scale)
+        return None
+    if type_code is uuid.UUID:
+        return pa.string()
+    return _PY_TO_ARROW.get(type_code)
+
+
+def _column_array(values: List[Any], arrow_type: Optional[pa.DataType]) -> pa.Array:
+    if arrow_type is not None:
+        try:
+            if pa.types.is_string(arrow_type):
+                values = [v if v is None or isinstance(v, str) else str(v) for v in values]
+            return pa.array(values, type=arrow_type)
+        except (pa.ArrowInvalid, pa.ArrowTypeError, OverflowError):
+            pass
+    try:
+        return pa.array(values)
+    except (pa.ArrowInvalid, pa.ArrowTypeError, OverflowError):
+        # mixed / exotic driver types: keep the data as text rather than failing the query
+        return pa.array([None if v is None else str(v) for v in values], type=pa.string())
+
+
+def rows_to_record_batch(
+    rows: Sequence[Sequence[Any]],
+    names: List[str],
+    types: List[Optional[pa.DataType]],
+) -> pa.RecordBatch:
+    """
+    Transposes a fetchmany() block into typed Arrow columns (one pass over the rows).
+    """
+    columns = list(zip(*rows)) if rows else [() for _ in names]
+    arrays = [_column_array(list(col), t) for col, t in zip(columns, types)]
+    return pa.RecordBatch.from_arrays(arrays, names=names)
+
+
+def iter_record_batches(
+    conn: Connection,
+    sql: str,
+    params: Optional[Dict[str, Any]] = None,
+    *,
+    batch_size: int = 50000,
+    max_rows: int = 200000,
+) -> Iterator[pa.RecordBatch]:
+    """
+    Executes `sql` on an open connection and yields Arrow record batches built
+    straight from the DBAPI cursor (cursor.fetchmany), bypassing pandas and
+    SQLAlchemy Row objects. Stops at max_rows.
+    """
+    result = conn.execute(text(sql), params or {})
+    try:
+        cursor = result.cursor
+        if cursor is None or cursor.description is None:
+            return
+        names = [str(d[0]) for d in cursor.description]
+        types = [arrow_type_for(d[1], d[4], d[5]) for d in cursor.description]
+
+        fetched = 0
+        emitted = False
+        while fetched < max_rows:
+            rows = cursor.fetchmany(min(int(batch_size), max_rows - fetched))
+            if not rows:
+                break
+            fetched += len(rows)
+            emitted = True
+            yield rows_to_record_batch(rows, names, types)
+
+        if not emitted:
+            yield rows_to_record_batch([], names, types)
+    finally:
+        result.close()
+
+
+def batches_to_table(batches: Iterator[pa.RecordBatch]) -> pa.Table:
+    """
+    Concatenates batches; per-batch type differences (e.g. an all-NULL first
+    block, DECIMAL scale changes) are promoted to a common schema.
+    """
+    tables = [pa.Table.from_batches([b]) for b in batches]
+    if not tables:
+        return pa.table({})
+    if len(tables) == 1:
+        return tables[0]
+    return pa.concat_tables(tables, promote_options="permissive")
@@ -1,15 +1,32 @@
 from __future__ import annotations
 
-from sqlalchemy import create_engine
+from dataclasses import dataclass, field
+from sqlalchemy import create_engine, event
 from sqlalchemy.engine import Engine
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import QueuePool
 from urllib.parse import quote_plus
-from typing import Optional
+from typing import Any, Dict, List, Optional, Tuple
+import hashlib
+import logging
+import threading
+import time
+import weakref
 
 from config import Settings
 from observability.redaction import redact_connection_string
 
-# Streamlit-friendly singleton engine
-_ENGINE_SINGLETON: Optional[Engine] = None
+log = logging.getLogger("db.engine")
+
+# One bounded pool per (DSN, purpose, session settings). Purposes keep bulk
+# profiling from starving interactive queries and vice versa.
+POOL_PURPOSES = ("interactive", "profiling", "introspection")
+
+_PURPOSE_DEFAULTS: Dict[str, Dict[str, int]] = {
+    "interactive": {"pool_size": 5, "max_overflow": 2},
+    "profiling": {"pool_size": 4, "max_overflow": 0},
+    "introspection": {"pool_size": 2, "max_overflow": 0},
+}
 
 
 def build_mssql_connection_url(settings: Settings) -> str:
@@ -34,9 +51,157 @@ def build_mssql_connection_url(settings: Settings) -> str:
     return f"{settings.DB_DIALECT}:///?odbc_connect={quote_plus(odbc)}"
 
 
-def build_engine(settings: Settings) -> Engine:
+# -----------------------------
+# Per-connection session settings
+# -----------------------------
+_SESSION_INFO_KEY = "session_settings_signature"
+
+
+def session_statements(settings: Settings) -> List[str]:
+    """
+    SQL Server session settings applied once per physical connection:
+      - MSSQL_SET_NOCOUNT:      SET NOCOUNT ON (no "x rows affected" chatter)
+      - MSSQL_LOCK_TIMEOUT_MS:  SET LOCK_TIMEOUT (avoid blocking forever on locks; <= 0 disables)
+      - MSSQL_READ_UNCOMMITTED: analytics-friendly isolation (avoid reader blocking writers)
+    A disabled setting is sent as its explicit server default (NOCOUNT OFF,
+    LOCK_TIMEOUT -1, READ COMMITTED), so re-applying on a connection that was
+    initialized with it enabled actually undoes it.
+    """
+    nocount = bool(getattr(settings, "MSSQL_SET_NOCOUNT", True))
+    lock_timeout_ms = int(getattr(settings, "MSSQL_LOCK_TIMEOUT_MS", 30000) or 0)
+    read_uncommitted = bool(getattr(settings, "MSSQL_READ_UNCOMMITTED", True))
+    return [
+        "SET NOCOUNT ON;" if nocount else "SET NOCOUNT OFF;",
+        f"SET LOCK_TIMEOUT {lock_timeout_ms if lock_timeout_ms > 0 else -1};",
+        "SET TRANSACTION ISOLATION LEVEL READ UNCOMMITTED;" if read_uncommitted
+        else "SET TRANSACTION ISOLATION LEVEL READ COMMITTED;",
+    ]
+
+
+@dataclass
+class SessionInitializer:
+    """
+    Pool hooks that apply session settings when a DBAPI connection is opened,
+    and re-apply them on checkout only if the connection was initialized with
+    a different set (tracked in the pool record's info dict). Steady-state
+    queries pay no extra round trips.
+    """
+
+    statements: List[str]
+    signature: str = ""
+
+    def __post_init__(self) -> None:
+        self.update(self.statements)
+
+    def update(self, statements: List[str]) -> None:
+        self.statements = list(statements)
+        self.signature = hashlib.sha256("\n".join(self.statements).encode("utf-8")).hexdigest()[:16]
+
+    def install(self, engine: Engine) -> None:
+        event.listen(engine, "connect", self._on_connect)
+        event.listen(engine, "checkout", self._on_checkout)
+        _SESSION_MANAGED.add(engine)
+
+    def _on_connect(self, dbapi_conn: Any, record: Any) -> None:
+        self._apply(dbapi_conn, record)
+
+    def _on_checkout(self, dbapi_conn: Any, record: Any, proxy: Any) -> None:
+        if record.info.get(_SESSION_INFO_KEY) != self.signature:
+            self._apply(dbapi_conn, record)
+
+    def _apply(self, dbapi_conn: Any, record: Any) -> None:
+        if not self.statements:
+            record.info[_SESSION_INFO_KEY] = self.signature
+            return
+        cur = dbapi_conn.cursor()
+        try:
+            try:
+                # one batch = one round trip
+                cur.execute(" ".join(self.statements))
+            except Exception:
+                # fall back statement-by-statement so one unsupported SET doesn't drop the rest
+                for stmt in self.statements:
+                    try:
+                        cur.execute(stmt)
+                    except Exception as e:
+                        log.warning(f"session setting failed: {stmt} ({type(e).__name__})")
+        finally:
+            cur.close()
+        record.info[_SESSION_INFO_KEY] = self.signature
+
+
+_SESSION_MANAGED: "weakref.WeakSet[Engine]" = weakref.WeakSet()
+
+
+def is_session_managed(engine: Engine) -> bool:
     """
-    Build a pooled SQLAlchemy engine (safe for Streamlit reruns).
+    True if session settings are applied by pool hooks for this engine
+    (callers must then NOT send per-query SET statements).
+    """
+    return engine in _SESSION_MANAGED
+
+
+# -----------------------------
+# Pool telemetry
+# -----------------------------
+@dataclass
+class PoolTelemetry:
+    checkouts: int = 0
+    timeouts: int = 0
+    total_wait_seconds: float = 0.0
+    max_wait_seconds: float = 0.0
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def record(self, waited: float, timed_out: bool) -> None:
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+            else:
+                self.checkouts += 1
+            self.total_wait_seconds += waited
+            self.max_wait_seconds = max(self.max_wait_seconds, waited)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            n = max(self.checkouts + self.timeouts, 1)
+            return {
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "avg_wait_ms": round(self.total_wait_seconds / n * 1000.0, 3),
+                "max_wait_ms": round(self.max_wait_seconds * 1000.0, 3),
+            }
+
+
+class TelemetryQueuePool(QueuePool):
+    """
+    QueuePool that measures how long callers wait to get a connection
+    (including time spent opening a new one when the pool grows).
+    """
+
+    def __init__(self, *args: Any, **kw: Any):
+        super().__init__(*args, **kw)
+        self.telemetry = PoolTelemetry()
+
+    def _do_get(self):  # type: ignore[override]
+        t0 = time.perf_counter()
+        try:
+            conn = super()._do_get()
+        except PoolTimeoutError:
+            self.telemetry.record(time.perf_counter() - t0, timed_out=True)
+            raise
+        self.telemetry.record(time.perf_counter() - t0, timed_out=False)
+        return conn
+
+
+# -----------------------------
+# Engine manager
+# -----------------------------
+class EngineManager:
+    """
+    Owns every SQLAlchemy engine in the process: one bounded pool per
+    DSN/purpose/session settings, created lazily and reused across Streamlit
+    reruns and runs. Session settings are part of the key so two Settings for
+    the same DSN never re-initialize each other's connections on checkout.
 
     IMPORTANT:
     - pool_size/max_overflow prevent connection explosion
@@ -45,48 +210,122 @@ def build_engine(settings: Settings) -> Engine:
     - pool_pre_ping checks connections before using them
     - pool_use_lifo improves behavior under bursty workloads (Streamlit reruns)
     """
-    url = build_mssql_connection_url(settings)
-
-    # ---- Pool knobs (add these to Settings; defaults here are safe) ----
-    pool_size = int(getattr(settings, "SQL_POOL_SIZE", 5))
-    max_overflow = int(getattr(settings, "SQL_MAX_OVERFLOW", 2))
-    pool_timeout = int(getattr(settings, "SQL_POOL_TIMEOUT_SECONDS", 30))
-    pool_recycle = int(getattr(settings, "SQL_POOL_RECYCLE_SECONDS", 1800))
-    pool_use_lifo = bool(getattr(settings, "SQL_POOL_USE_LIFO", True))
-
-    engine = create_engine(
-        url,
-        future=True,
-        pool_pre_ping=True,
-        pool_size=pool_size,
-        max_overflow=max_overflow,
-        pool_timeout=pool_timeout,
-        pool_recycle=pool_recycle,
-        pool_use_lifo=pool_use_lifo,
-    )
 
-    # never log url directly
-    _ = redact_connection_string(url)
-    return engine
+    def __init__(self) -> None:
+        self._engines: Dict[Tuple[str, str, str], Engine] = {}
+        self._lock = threading.Lock()
+
+    def get(self, settings: Settings, purpose: str = "interactive") -> Engine:
+        if purpose not in POOL_PURPOSES:
+            raise ValueError(f"Unknown pool purpose: {purpose!r} (expected one of {POOL_PURPOSES})")
+        url = build_mssql_connection_url(settings)
+        init = SessionInitializer(session_statements(settings))
+        key = (hashlib.sha256(url.encode("utf-8")).hexdigest()[:16], purpose, init.signature)
+
+        with self._lock:
+            engine = self._engines.get(key)
+            if engine is None:
+                engine = self._build(settings, url, purpose)
+                init.install(engine)
+                self._engines[key] = engine
+            return engine
+
+    def pool_options(self, settings: Settings, purpose: str) -> Dict[str, Any]:
+        """
+        Pool knobs. SQL_POOL_SIZE / SQL_MAX_OVERFLOW size the interactive pool;
+        other purposes use SQL_POOL_SIZE_<PURPOSE> / SQL_MAX_OVERFLOW_<PURPOSE>
+        (e.g. SQL_POOL_SIZE_PROFILING). Timeout/recycle apply to all pools and
+        can be overridden per purpose the same way.
+        """
+        defaults = _PURPOSE_DEFAULTS[purpose]
+        sfx = "" if purpose == "interactive" else f"_{purpose.upper()}"
+
+        def knob(name: str, default: Any) -> Any:
+            return getattr(settings, f"{name}{sfx}", getattr(settings, name, default))
+
+        return {
+            "pool_size": int(getattr(settings, f"SQL_POOL_SIZE{sfx}", defaults["pool_size"])),
+            "max_overflow": int(getattr(settings, f"SQL_MAX_OVERFLOW{sfx}", defaults["max_overflow"])),
+            "pool_timeout": int(knob("SQL_POOL_TIMEOUT_SECONDS", 30)),
+            "pool_recycle": int(knob("SQL_POOL_RECYCLE_SECONDS", 1800)),
+            "pool_use_lifo": bool(getattr(settings, "SQL_POOL_USE_LIFO", True)),
+        }
+
+    def telemetry(self) -> List[Dict[str, Any]]:
+        out: List[Dict[str, Any]] = []
+        with self._lock:
+            items = list(self._engines.items())
+        for (dsn, purpose, session), engine in items:
+            pool = engine.pool
+            row: Dict[str, Any] = {
+                "dsn": dsn,
+                "purpose": purpose,
+                "session": session,
+                "pool_size": pool.size() if hasattr(pool, "size") else None,
+                "checked_out": pool.checkedout() if hasattr(pool, "checkedout") else None,
+                "checked_in": pool.checkedin() if hasattr(pool, "checkedin") else None,
+                "overflow": pool.overflow() if hasattr(pool, "overflow") else None,
+            }
+            telemetry = getattr(pool, "telemetry", None)
+            if telemetry is not None:
+                row.update(telemetry.snapshot())
+            out.append(row)
+        return out
+
+    def dispose_all(self) -> None:
+        with self._lock:
+            engines, self._engines = list(self._engines.values()), {}
+        for engine in engines:
+            try:
+                engine.dispose()
+            except Exception:
+                pass
+
+    def _build(self, settings: Settings, url: str, purpose: str) -> Engine:
+        engine = create_engine(
+            url,
+            future=True,
+            pool_pre_ping=True,
+            poolclass=TelemetryQueuePool,
+            **self.pool_options(settings, purpose),
+        )
+        # never log url directly
+        _ = redact_connection_string(url)
+        return engine
+
+
+ENGINE_MANAGER = EngineManager()
+
+
+def get_pooled_engine(settings: Settings, purpose: str = "interactive") -> Engine:
+    """
+    Single entry point for DB access: returns the shared pooled engine for
+    the settings' DSN and the given purpose (interactive/profiling/introspection).
+    """
+    return ENGINE_MANAGER.get(settings, purpose)
+
+
+def pool_telemetry() -> List[Dict[str, Any]]:
+    return ENGINE_MANAGER.telemetry()
+
+
+def build_engine(settings: Settings) -> Engine:
+    """
+    Kept for compatibility: returns the managed interactive engine instead of
+    building a new pool.
+    """
+    return get_pooled_engine(settings, "interactive")
 
 
 def get_shared_engine(settings: Settings) -> Engine:
     """
     Returns a singleton Engine (best for Streamlit so reruns don't create new pools).
     """
-    global _ENGINE_SINGLETON
-    if _ENGINE_SINGLETON is None:
-        _ENGINE_SINGLETON = build_engine(settings)
-    return _ENGINE_SINGLETON
+    return get_pooled_engine(settings, "interactive")
 
 
 def dispose_shared_engine() -> None:
     """
     Optional: call this on app shutdown / debugging to force close pool connections.
     """
-    global _ENGINE_SINGLETON
-    if _ENGINE_SINGLETON is not None:
-        try:
-            _ENGINE_SINGLETON.dispose()
-        finally:
-            _ENGINE_SINGLETON = None
\ No newline at end of file
+    ENGINE_MANAGER.dispose_all()
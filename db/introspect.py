@@ -3,14 +3,15 @@ from __future__ import annotations
 from typing import Any, Dict, List, Optional
 import pandas as pd
 from sqlalchemy import text
-from sqlalchemy.engine import Engine
+from sqlalchemy.engine import Connection, Engine
 
 
 def fetch_tables(engine: Engine) -> List[Dict[str, Any]]:
     sql = """
     SELECT
         s.name AS schema_name,
-        t.name AS table_name
+        t.name AS table_name,
+        t.modify_date
     FROM sys.tables t
     JOIN sys.schemas s ON t.schema_id = s.schema_id
     WHERE t.is_ms_shipped = 0
@@ -97,3 +98,154 @@ def pk_fk_hints(engine: Engine, schema: str, table: str) -> Dict[str, Any]:
         pk = conn.execute(text(pk_sql), {"schema": schema, "table": table}).mappings().all()
         fk = conn.execute(text(fk_sql), {"schema": schema, "table": table}).mappings().all()
     return {"primary_key": [r["column_name"] for r in pk], "foreign_keys": [dict(r) for r in fk]}
+
+
+# -----------------------------
+# Bulk (set-based) introspection
+# -----------------------------
+# One query per catalog view for the whole database, grouped client-side by
+# "schema.table". Shapes match the per-table functions above.
+
+_ALL_COLUMNS_SQL = """
+SELECT
+    s.name AS schema_name,
+    t.name AS table_name,
+    c.name AS column_name,
+    ty.name AS data_type,
+    c.max_length,
+    c.precision,
+    c.scale,
+    c.is_nullable
+FROM sys.columns c
+JOIN sys.types ty ON c.user_type_id = ty.user_type_id
+JOIN sys.tables t ON c.object_id = t.object_id
+JOIN sys.schemas s ON t.schema_id = s.schema_id
+WHERE t.is_ms_shipped = 0
+ORDER BY s.name, t.name, c.column_id
+"""
+
+_ALL_ROW_COUNTS_SQL = """
+SELECT
+    s.name AS schema_name,
+    t.name AS table_name,
+    SUM(ps.row_count) AS row_count
+FROM sys.dm_db_partition_stats ps
+JOIN sys.tables t ON ps.object_id = t.object_id
+JOIN sys.schemas s ON t.schema_id = s.schema_id
+WHERE t.is_ms_shipped = 0
+  AND ps.index_id IN (0,1)
+GROUP BY s.name, t.name
+"""
+
+_ALL_PRIMARY_KEYS_SQL = """
+SELECT
+    s.name AS schema_name,
+    t.name AS table_name,
+    c.name AS column_name
+FROM sys.indexes i
+JOIN sys.index_columns ic ON i.object_id = ic.object_id AND i.index_id = ic.index_id
+JOIN sys.columns c ON ic.object_id = c.object_id AND ic.column_id = c.column_id
+JOIN sys.tables t ON i.object_id = t.object_id
+JOIN sys.schemas s ON t.schema_id = s.schema_id
+WHERE i.is_primary_key = 1 AND t.is_ms_shipped = 0
+ORDER BY s.name, t.name, ic.key_ordinal
+"""
+
+_ALL_FOREIGN_KEYS_SQL = """
+SELECT
+  s1.name AS schema_name,
+  t1.name AS table_name,
+  cpa.name AS parent_column,
+  s2.name AS ref_schema,
+  t2.name AS ref_table,
+  cr.name AS ref_column
+FROM sys.foreign_key_columns fkc
+JOIN sys.tables t1 ON fkc.parent_object_id = t1.object_id
+JOIN sys.schemas s1 ON t1.schema_id = s1.schema_id
+JOIN sys.columns cpa ON fkc.parent_object_id = cpa.object_id AND fkc.parent_column_id = cpa.column_id
+JOIN sys.tables t2 ON fkc.referenced_object_id = t2.object_id
+JOIN sys.schemas s2 ON t2.schema_id = s2.schema_id
+JOIN sys.columns cr ON fkc.referenced_object_id = cr.object_id AND fkc.referenced_column_id = cr.column_id
+WHERE t1.is_ms_shipped = 0
+ORDER BY s1.name, t1.name, fkc.constraint_object_id, fkc.constraint_column_id
+"""
+
+
+def _group_rows(conn: Connection, sql: str) -> Dict[str, List[Dict[str, Any]]]:
+    out: Dict[str, List[Dict[str, Any]]] = {}
+    for r in conn.execute(text(sql)).mappings():
+        row = dict(r)
+        key = f"{row.pop('schema_name')}.{row.pop('table_name')}"
+        out.setdefault(key, []).append(row)
+    return out
+
+
+def _all_columns(conn: Connection) -> Dict[str, List[Dict[str, Any]]]:
+    return _group_rows(conn, _ALL_COLUMNS_SQL)
+
+
+def _all_row_counts(conn: Connection) -> Dict[str, int]:
+    return {k: int(rows[0]["row_count"] or 0) for k, rows in _group_rows(conn, _ALL_ROW_COUNTS_SQL).items()}
+
+
+def _all_primary_keys(conn: Connection) -> Dict[str, List[str]]:
+    return {k: [r["column_name"] for r in rows] for k, rows in _group_rows(conn, _ALL_PRIMARY_KEYS_SQL).items()}
+
+
+def _all_foreign_keys(conn: Connection) -> Dict[str, List[Dict[str, Any]]]:
+    return _group_rows(conn, _ALL_FOREIGN_KEYS_SQL)
+
+
+def fetch_all_columns(engine: Engine) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    {"schema.table": [column dicts as in fetch_columns, in column_id order]}
+    """
+    with engine.connect() as conn:
+        return _all_columns(conn)
+
+
+def fetch_all_row_counts(engine: Engine) -> Dict[str, int]:
+    """
+    {"schema.table": approx row count} (same source as fetch_row_count).
+    """
+    with engine.connect() as conn:
+        return _all_row_counts(conn)
+
+
+def fetch_all_primary_keys(engine: Engine) -> Dict[str, List[str]]:
+    with engine.connect() as conn:
+        return _all_primary_keys(conn)
+
+
+def fetch_all_foreign_keys(engine: Engine) -> Dict[str, List[Dict[str, Any]]]:
+    with engine.connect() as conn:
+        return _all_foreign_keys(conn)
+
+
+def fetch_catalog(engine: Engine) -> Dict[str, Any]:
+    """
+    Whole-database catalog in four queries on one connection:
+      - columns:      {"schema.table": [...]}
+      - row_counts:   {"schema.table": int}
+      - primary_keys: {"schema.table": [column_name, ...]}
+      - foreign_keys: {"schema.table": [{parent_column, ref_schema, ref_table, ref_column}, ...]}
+    Tables missing from a section simply have no entry (no columns / rows / keys).
+    """
+    with engine.connect() as conn:
+        return {
+            "columns": _all_columns(conn),
+            "row_counts": _all_row_counts(conn),
+            "primary_keys": _all_primary_keys(conn),
+            "foreign_keys": _all_foreign_keys(conn),
+        }
+
+
+def catalog_pk_fk_hints(catalog: Dict[str, Any], schema: str, table: str) -> Dict[str, Any]:
+    """
+    Same shape as pk_fk_hints(), read from a fetch_catalog() result.
+    """
+    key = f"{schema}.{table}"
+    return {
+        "primary_key": list(catalog["primary_keys"].get(key, [])),
+        "foreign_keys": [dict(fk) for fk in catalog["foreign_keys"].get(key, [])],
+    }
@@ -0,0 +1,125 @@
+from __future__ import annotations
+
+from typing import Any, Dict, List, Sequence, Tuple
+
+import pandas as pd
+
+# SQL builders for table-content profiling (SQL Server). Each builder covers
+# several columns in ONE table scan; the parse_* helpers turn the result back
+# into per-column payloads ({"minmax": ..., "top_values": ..., "null_count": ...}).
+
+MINMAX_TYPE_HINTS = ("int", "decimal", "numeric", "float", "real", "money", "date", "time")
+
+
+def is_minmax_type(ctype: str) -> bool:
+    ctype = (ctype or "").lower()
+    return any(x in ctype for x in MINMAX_TYPE_HINTS)
+
+
+def _q(name: str) -> str:
+    return "[" + str(name).replace("]", "]]") + "]"
+
+
+def chunked(items: Sequence[Any], size: int) -> List[List[Any]]:
+    size = max(1, int(size))
+    return [list(items[i : i + size]) for i in range(0, len(items), size)]
+
+
+# -----------------------------
+# MIN / MAX / NULL count (one scan for many columns)
+# -----------------------------
+def aggregate_profile_sql(table_sql: str, columns: Sequence[Tuple[str, str]]) -> str:
+    """
+    One aggregate over the table: MIN/MAX for numeric/date-ish columns and a
+    NULL count for every column. columns = [(name, type_name), ...].
+    Output aliases are positional (mn_i, mx_i, nl_i) so any column name is safe.
+    """
+    parts: List[str] = ["COUNT_BIG(1) AS [row_total]"]
+    for i, (c, ctype) in enumerate(columns):
+        col = _q(c)
+        if is_minmax_type(ctype):
+            parts.append(f"MIN({col}) AS [mn_{i}]")
+            parts.append(f"MAX({col}) AS [mx_{i}]")
+        parts.append(f"COUNT_BIG(1) - COUNT_BIG({col}) AS [nl_{i}]")  # BIGINT: SUM over an INT CASE overflows past 2^31 rows
+    select_list = ",\n  ".join(parts)
+    return f"SELECT\n  {select_list}\nFROM {table_sql}"
+
+
+def parse_aggregate_profile(df: pd.DataFrame, columns: Sequence[Tuple[str, str]], json_safe) -> Dict[str, Dict[str, Any]]:
+    out: Dict[str, Dict[str, Any]] = {}
+    if df is None or df.empty:
+        return out
+    row = df.iloc[0]
+    for i, (c, ctype) in enumerate(columns):
+        res: Dict[str, Any] = {}
+        if is_minmax_type(ctype):
+            res["minmax"] = {"min": json_safe(row.get(f"mn_{i}")), "max": json_safe(row.get(f"mx_{i}"))}
+        nulls = json_safe(row.get(f"nl_{i}"))
+        res["null_count"] = int(nulls) if nulls is not None else 0
+        out[c] = res
+    return out
+
+
+# -----------------------------
+# Top values (one scan for a batch of columns)
+# -----------------------------
+def top_values_sql(table_sql: str, columns: Sequence[str], top_values: int) -> str:
+    """
+    Unpivots a batch of columns with CROSS APPLY (VALUES ...) and ranks value
+    counts per column with ROW_NUMBER, so k columns cost one scan instead of k.
+    Same semantics as the per-column TOP (n) ... GROUP BY CAST(... AS NVARCHAR(4000)).
+    """
+    values = ",\n    ".join(f"({i}, CAST(t.{_q(c)} AS NVARCHAR(4000)))" for i, c in enumerate(columns))
+    return f"""
+SELECT x.[col_idx], x.[value], x.[cnt]
+FROM (
+  SELECT
+    v.[col_idx],
+    v.[value],
+    COUNT_BIG(1) AS [cnt],
+    ROW_NUMBER() OVER (PARTITION BY v.[col_idx] ORDER BY COUNT_BIG(1) DESC) AS [rn]
+  FROM {table_sql} AS t
+  CROSS APPLY (VALUES
+    {values}
+  ) AS v([col_idx], [value])
+  WHERE v.[value] IS NOT NULL
+  GROUP BY v.[col_idx], v.[value]
+) AS x
+WHERE x.[rn] <= {int(top_values)}
+ORDER BY x.[col_idx], x.[rn]
+"""
+
+
+def parse_top_values(df: pd.DataFrame, columns: Sequence[str]) -> Dict[str, List[Dict[str, Any]]]:
+    out: Dict[str, List[Dict[str, Any]]] = {}
+    if df is None or df.empty:
+        return out
+    for idx, grp in df.groupby("col_idx", sort=True):
+        c = columns[int(idx)]
+        out[c] = [{"value": v, "cnt": int(n)} for v, n in zip(grp["value"], grp["cnt"])]
+    return out
+
+
+# -----------------------------
+# Sampled scan (approximate profiling)
+# -----------------------------
+def sample_scan_sql(table_sql: str, columns: Sequence[str], row_count: int, row_budget: int) -> Tuple[str, Dict[str, Any]]:
+    """
+    Bounded sample of a table for sketch-based profiling. Small tables
+    (row_count <= row_budget) are read with TOP (row_budget); larger ones with
+    TABLESAMPLE SYSTEM at a rate picked from row_count (oversampled 1.5x because
+    SYSTEM sampling is page-based), still capped by TOP (row_budget).
+    Returns (sql, sampling meta).
+    """
+    col_list = ", ".join(_q(c) for c in columns)
+    budget = max(1, int(row_budget))
+    if row_count <= budget:
+        return (
+            f"SELECT TOP ({budget}) {col_list} FROM {table_sql}",
+            {"sampling": "top", "sample_percent": 100.0, "row_budget": budget},
+        )
+    percent = min(100.0, max(0.001, budget / float(row_count) * 100.0 * 1.5))
+    return (
+        f"SELECT TOP ({budget}) {col_list} FROM {table_sql} TABLESAMPLE SYSTEM ({percent:.4f} PERCENT)",
+        {"sampling": "tablesample", "sample_percent": round(percent, 4), "row_budget": budget},
+    )
@@ -1,13 +1,15 @@
 from __future__ import annotations
 
 from typing import Any, Dict, Optional
-import time
 import re
 
 import pandas as pd
 from sqlalchemy.engine import Engine, Connection
 from sqlalchemy import text
 
+from db.engine import is_session_managed
+from db.query_control import QueryCancelledError, QueryControl, install_cancel_hook, watch
+
 
 _SELECT_ONLY_RE = re.compile(r"^\s*(?:--[^\n]*\n|\s|/\*.*?\*/)*select\b", re.IGNORECASE | re.DOTALL)
 
@@ -54,6 +56,7 @@ def run_sql_query(
     # SQL Server-specific knobs (safe defaults)
     sqlserver_lock_timeout_ms: int = 30_000,
     sqlserver_read_uncommitted: bool = True,
+    control: Optional[QueryControl] = None,
 ) -> pd.DataFrame:
     """
     Execute a SELECT query safely via SQLAlchemy Engine.
@@ -62,12 +65,17 @@ def run_sql_query(
     - SELECT-only (defense-in-depth)
     - Streamed reads with chunking
     - Hard cap on max_rows
-    - Best-effort timeout (driver + wall-clock cutoff)
+    - Server-side cancel at timeout_seconds (db.query_control watchdog →
+      cursor.cancel()), raising QueryCancelledError; pass `control` to cancel
+      from elsewhere (listed by db.list_inflight_queries)
+
+    Session settings: engines from db.engine.get_pooled_engine apply them once per
+    physical connection (MSSQL_* settings); the sqlserver_* arguments only apply
+    to engines created elsewhere.
 
     Notes on timeout:
-    - For SQL Server/pyodbc, query timeout is often controlled by the driver.
-      SQLAlchemy `execution_options(timeout=...)` is respected by many drivers,
-      but not all. We still keep a wall-clock cutoff to stop ingestion.
+    - The driver timeout (`execution_options(timeout=...)`) is set as well, but
+      is not respected by all drivers; the watchdog also covers a slow first chunk.
     """
     _assert_select_only(sql)
 
@@ -77,52 +85,61 @@ def run_sql_query(
     max_rows = int(max_rows) if max_rows and max_rows > 0 else 200000
     chunksize = int(chunksize) if chunksize and chunksize > 0 else 50000
 
-    t0 = time.time()
+    control = control or QueryControl(sql=sql, timeout_seconds=timeout_seconds)
     collected: list[pd.DataFrame] = []
     rows_so_far = 0
 
     # Use a single connection, streamed, and returned to pool reliably.
     # execution_options(stream_results=True) helps avoid buffering huge result sets.
-    with engine.connect() as conn:
-        # SQL Server session settings (safe)
+    install_cancel_hook(engine)
+    with watch(control), engine.connect() as conn:
+        # SQL Server session settings (safe). Managed pools already applied them
+        # when the physical connection was opened; skip the extra round trips.
+        if not is_session_managed(engine):
+            try:
+                _apply_sqlserver_session_settings(
+                    conn,
+                    lock_timeout_ms=sqlserver_lock_timeout_ms,
+                    read_uncommitted=sqlserver_read_uncommitted,
+                )
+            except Exception:
+                # Don’t fail the query if these statements are not supported / permissions differ.
+                pass
+
+        # driver-side timeout where supported; the statement's cursor is handed
+        # to `control` (engine hook) so the watchdog can cancel it on the server
+        conn = conn.execution_options(stream_results=True, timeout=timeout_seconds, query_control=control)
+
         try:
-            _apply_sqlserver_session_settings(
-                conn,
-                lock_timeout_ms=sqlserver_lock_timeout_ms,
-                read_uncommitted=sqlserver_read_uncommitted,
+            # pandas: iterator when chunksize is set
+            result_iter = pd.read_sql_query(
+                sql=text(sql),
+                con=conn,
+                params=params,
+                chunksize=chunksize,
             )
-        except Exception:
-            # Don’t fail the query if these statements are not supported / permissions differ.
-            pass
-
-        # Best-effort driver-side timeout (often respected; harmless if ignored)
-        conn = conn.execution_options(stream_results=True, timeout=timeout_seconds)
-
-        # pandas: iterator when chunksize is set
-        result_iter = pd.read_sql_query(
-            sql=text(sql),
-            con=conn,
-            params=params,
-            chunksize=chunksize,
-        )
-
-        # If pandas ever returns a DF (shouldn't with chunksize), handle anyway.
-        if isinstance(result_iter, pd.DataFrame):
-            return result_iter.head(max_rows)
-
-        for chunk in result_iter:
-            if chunk is None or chunk.empty:
-                continue
-
-            collected.append(chunk)
-            rows_so_far += int(len(chunk))
-
-            if rows_so_far >= max_rows:
-                break
-
-            # Soft wall-clock stop (does not cancel server query in all drivers)
-            if (time.time() - t0) > float(timeout_seconds):
-                break
+
+            # If pandas ever returns a DF (shouldn't with chunksize), handle anyway.
+            if isinstance(result_iter, pd.DataFrame):
+                return result_iter.head(max_rows)
+
+            for chunk in result_iter:
+                if chunk is None or chunk.empty:
+                    continue
+
+                collected.append(chunk)
+                rows_so_far += int(len(chunk))
+
+                if rows_so_far >= max_rows:
+                    break
+        except QueryCancelledError:
+            raise
+        except Exception as e:
+            if control.cancelled:
+                raise QueryCancelledError(control.query_id, control.cancel_reason or "cancelled") from e
+            raise
+        # a cancel that raced with the last fetch still wins
+        control.check()
 
     if not collected:
         return pd.DataFrame()
@@ -0,0 +1,217 @@
+from __future__ import annotations
+
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterator, List, Optional
+import heapq
+import logging
+import threading
+import time
+import uuid
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+log = logging.getLogger("db.query_control")
+
+_CONTROL_OPTION = "query_control"
+
+
+class QueryCancelledError(RuntimeError):
+    """
+    Raised when an in-flight statement was cancelled on the server
+    (deadline reached or cancelled by a user).
+    """
+
+    def __init__(self, query_id: str, reason: str):
+        super().__init__(f"Query {query_id} cancelled ({reason})")
+        self.query_id = query_id
+        self.reason = reason
+
+
+@dataclass
+class QueryControl:
+    """
+    Cancellation handle for one statement.
+
+    The DBAPI cursor is attached right before execution (engine hook), so
+    cancel() can be called from any thread: it calls cursor.cancel() (pyodbc →
+    SQLCancel, the server stops the statement) or connection.interrupt()
+    for drivers without cursor-level cancel (sqlite3).
+    """
+
+    sql: str
+    timeout_seconds: float
+    label: str = ""
+    query_id: str = field(default_factory=lambda: uuid.uuid4().hex[:12])
+    started_at: float = field(default_factory=time.time)
+    cancelled: bool = False
+    cancel_reason: Optional[str] = None
+    _cursor: Any = field(default=None, repr=False)
+    _finished: bool = field(default=False, repr=False)
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    @property
+    def deadline(self) -> Optional[float]:
+        if not self.timeout_seconds or self.timeout_seconds <= 0:
+            return None
+        return self.started_at + float(self.timeout_seconds)
+
+    def attach(self, cursor: Any) -> None:
+        with self._lock:
+            self._cursor = cursor
+            cancelled = self.cancelled
+        if cancelled:
+            # cancelled while waiting for a connection → never start the statement
+            raise QueryCancelledError(self.query_id, self.cancel_reason or "cancelled")
+
+    def cancel(self, reason: str = "user") -> bool:
+        """
+        Returns True if a cancel was issued (False if the query already finished).
+        """
+        with self._lock:
+            if self._finished or self.cancelled:
+                return False
+            self.cancelled = True
+            self.cancel_reason = reason
+            cursor = self._cursor
+        if cursor is not None:
+            _cancel_cursor(cursor)
+        log.warning(f"query {self.query_id} cancelled ({reason})")
+        return True
+
+    def finish(self) -> None:
+        with self._lock:
+            self._finished = True
+            self._cursor = None
+
+    def check(self) -> None:
+        if self.cancelled:
+            raise QueryCancelledError(self.query_id, self.cancel_reason or "cancelled")
+
+    def meta(self) -> Dict[str, Any]:
+        return {"query_id": self.query_id, "cancelled": self.cancelled, "cancel_reason": self.cancel_reason}
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "query_id": self.query_id,
+            "label": self.label,
+            "running_seconds": round(time.time() - self.started_at, 1),
+            "timeout_seconds": self.timeout_seconds,
+            "sql": " ".join((self.sql or "").split())[:300],
+        }
+
+
+def _cancel_cursor(cursor: Any) -> None:
+    try:
+        if hasattr(cursor, "cancel"):
+            cursor.cancel()
+            return
+        conn = getattr(cursor, "connection", None)
+        if conn is not None and hasattr(conn, "interrupt"):
+            conn.interrupt()
+    except Exception as e:
+        log.warning(f"driver cancel failed: {type(e).__name__}: {e}")
+
+
+# -----------------------------
+# Watchdog + in-flight registry
+# -----------------------------
+class _Watchdog:
+    """
+    One daemon thread for the whole process: sleeps until the nearest
+    deadline and cancels statements that run past it.
+    """
+
+    def __init__(self) -> None:
+        self._cond = threading.Condition()
+        self._heap: List[Any] = []
+        self._inflight: Dict[str, QueryControl] = {}
+        self._thread: Optional[threading.Thread] = None
+
+    def register(self, control: QueryControl) -> None:
+        with self._cond:
+            self._inflight[control.query_id] = control
+            if control.deadline is not None:
+                heapq.heappush(self._heap, (control.deadline, control.query_id))
+                if self._thread is None or not self._thread.is_alive():
+                    self._thread = threading.Thread(target=self._loop, name="query-watchdog", daemon=True)
+                    self._thread.start()
+            self._cond.notify()
+
+    def unregister(self, control: QueryControl) -> None:
+        with self._cond:
+            self._inflight.pop(control.query_id, None)
+
+    def inflight(self) -> List[QueryControl]:
+        with self._cond:
+            return list(self._inflight.values())
+
+    def get(self, query_id: str) -> Optional[QueryControl]:
+        with self._cond:
+            return self._inflight.get(query_id)
+
+    def _loop(self) -> None:
+        while True:
+            expired: List[QueryControl] = []
+            with self._cond:
+                # drop finished queries from the top of the heap
+                while self._heap and self._heap[0][1] not in self._inflight:
+                    heapq.heappop(self._heap)
+                if not self._heap:
+                    self._cond.wait(timeout=60.0)
+                    continue
+                now = time.time()
+                while self._heap and self._heap[0][0] <= now:
+                    _, qid = heapq.heappop(self._heap)
+                    control = self._inflight.get(qid)
+                    if control is not None:
+                        expired.append(control)
+                if not expired:
+                    self._cond.wait(timeout=max(0.01, self._heap[0][0] - now))
+            for control in expired:
+                control.cancel(f"timeout after {control.timeout_seconds}s")
+
+
+_WATCHDOG = _Watchdog()
+
+
+@contextmanager
+def watch(control: QueryControl) -> Iterator[QueryControl]:
+    """
+    Registers the query as in-flight for the duration of the block
+    (visible to list_inflight_queries / cancel_query and to the deadline watchdog).
+    """
+    _WATCHDOG.register(control)
+    try:
+        yield control
+    finally:
+        control.finish()
+        _WATCHDOG.unregister(control)
+
+
+def list_inflight_queries() -> List[Dict[str, Any]]:
+    return [c.snapshot() for c in sorted(_WATCHDOG.inflight(), key=lambda c: c.started_at)]
+
+
+def cancel_query(query_id: str, reason: str = "cancelled by user") -> bool:
+    control = _WATCHDOG.get(query_id)
+    return control.cancel(reason) if control is not None else False
+
+
+# -----------------------------
+# Engine hook
+# -----------------------------
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    control = conn.get_execution_options().get(_CONTROL_OPTION)
+    if control is not None:
+        control.attach(cursor)
+
+
+def install_cancel_hook(engine: Engine) -> None:
+    """
+    Idempotent. Statements executed with execution_options(query_control=...)
+    hand their DBAPI cursor to that control.
+    """
+    if not event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
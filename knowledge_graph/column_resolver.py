@@ -0,0 +1,252 @@
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+import hashlib
+import re
+import threading
+
+import numpy as np
+
+from knowledge_graph.content_index import ContentIndexStore
+from knowledge_graph.schema_registry import SchemaRegistry
+
+NGRAM = 3
+NUM_PERM = 64
+BANDS = 32  # 32 bands x 2 rows: pairs with Jaccard >= 0.3 collide with probability > 0.95
+ROWS = NUM_PERM // BANDS
+
+_PRIME = np.uint64(4294967311)  # > 2^32, so (a * x + b) stays inside uint64 for 32-bit x, a, b < 2^31
+_rng = np.random.RandomState(20240611)
+_PERM_A = _rng.randint(1, 2**31 - 1, size=NUM_PERM).astype(np.uint64)
+_PERM_B = _rng.randint(0, 2**31 - 1, size=NUM_PERM).astype(np.uint64)
+
+
+def normalize_name(name: str) -> str:
+    """
+    "CustomerName" / "customer_name" / "Customer Name" -> "customername".
+    """
+    s = re.sub(r"([a-z0-9])([A-Z])", r"\1 \2", str(name or ""))
+    return re.sub(r"[^a-z0-9]+", "", s.lower())
+
+
+def shingles(name: str) -> Set[str]:
+    s = f"#{normalize_name(name)}#"
+    if len(s) <= NGRAM:
+        return {s}
+    return {s[i : i + NGRAM] for i in range(len(s) - NGRAM + 1)}
+
+
+def _shingle_hash(sh: str) -> int:
+    return int.from_bytes(hashlib.blake2b(sh.encode("utf-8"), digest_size=4).digest(), "big")
+
+
+def minhash(sh: Set[str]) -> np.ndarray:
+    return minhash_many([sh])[0]
+
+
+def minhash_many(shingle_sets: List[Set[str]], chunk: int = 20000) -> np.ndarray:
+    """
+    (len(shingle_sets), NUM_PERM) signatures, computed in vectorized chunks.
+    """
+    out = np.empty((len(shingle_sets), NUM_PERM), dtype=np.uint64)
+    for start in range(0, len(shingle_sets), chunk):
+        part = shingle_sets[start : start + chunk]
+        lengths = np.fromiter((len(sh) for sh in part), dtype=np.int64, count=len(part))
+        x = np.fromiter((_shingle_hash(s) for sh in part for s in sh), dtype=np.uint64, count=int(lengths.sum()))
+        hashed = (_PERM_A[:, None] * x[None, :] + _PERM_B[:, None]) % _PRIME
+        offsets = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+        out[start : start + len(part)] = np.minimum.reduceat(hashed, offsets, axis=1).T
+    return out
+
+
+def _band_keys(sigs: np.ndarray) -> np.ndarray:
+    """
+    (n, NUM_PERM) signatures -> (n, BANDS) bucket keys (ROWS values folded into one uint64).
+    """
+    keys = np.zeros((sigs.shape[0], BANDS), dtype=np.uint64)
+    for r in range(ROWS):
+        keys = keys * np.uint64(1000003) ^ sigs[:, r::ROWS][:, :BANDS]
+    return keys
+
+
+# "Status" vs "StatusId": the longer name is the shorter one plus a key suffix,
+# i.e. a different (surrogate / code) column, not a spelling variant
+KEY_SUFFIXES = {"id", "key", "code", "no", "num", "nbr", "sk", "fk", "pk"}
+
+
+# -----------------------------
+# Synonyms derived at refresh time (content index "column_synonyms")
+# -----------------------------
+ABBREVIATIONS = {
+    "qty": "quantity", "amt": "amount", "dt": "date", "cust": "customer", "desc": "description",
+    "cnt": "count", "pct": "percent", "addr": "address", "prod": "product", "num": "number",
+    "nbr": "number", "no": "number", "cat": "category", "dept": "department", "emp": "employee",
+    "acct": "account", "txn": "transaction", "trx": "transaction", "inv": "invoice", "ord": "order",
+    "prc": "price", "val": "value", "yr": "year", "mth": "month", "wk": "week", "tot": "total",
+}
+
+
+def name_words(name: str) -> List[str]:
+    s = re.sub(r"([a-z0-9])([A-Z])", r"\1 \2", str(name or ""))
+    return [w for w in re.split(r"[^a-z0-9]+", s.lower()) if w]
+
+
+def derive_column_synonyms(table_name: str, columns: Iterable[str]) -> Dict[str, List[str]]:
+    """
+    Name-derived aliases for a table's columns (no descriptions exist in the
+    catalog), for the spellings trigram matching cannot bridge:
+    - abbreviations expanded: "OrderQty" -> "order_quantity", "ShipDt" -> "ship_date"
+    - the table-name prefix dropped: "OrderStatus" in Orders -> "status"
+      (not when only a key suffix would remain: "OrderId" stays as is)
+    """
+    table_words = set(name_words(table_name))
+    table_words |= {w[:-1] for w in table_words if w.endswith("s") and len(w) > 3}
+    out: Dict[str, List[str]] = {}
+    for col in columns:
+        words = name_words(col)
+        if not words:
+            continue
+        variants = [[ABBREVIATIONS.get(w, w) for w in words]]
+        if len(words) > 1 and words[0] in table_words:
+            rest = words[1:]
+            if "".join(rest) not in KEY_SUFFIXES:
+                variants += [rest, [ABBREVIATIONS.get(w, w) for w in rest]]
+        own = normalize_name(col)
+        aliases = ["_".join(v) for v in variants if normalize_name("_".join(v)) != own]
+        if aliases:
+            out[col] = list(dict.fromkeys(aliases))
+    return out
+
+
+def jaccard(a: Set[str], b: Set[str]) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / float(len(a | b))
+
+
+def similarity(hint_norm: str, hint_sh: Set[str], surface_norm: str, surface_sh: Set[str]) -> float:
+    """
+    Trigram Jaccard scaled by the length ratio of the normalized names, so a
+    short hint is not matched to a longer column that merely starts like it;
+    0 when the names differ only by a key suffix.
+    """
+    if not hint_norm or not surface_norm:
+        return 0.0
+    if hint_norm == surface_norm:
+        return 1.0
+    short, long_ = sorted((hint_norm, surface_norm), key=len)
+    if long_.startswith(short) and long_[len(short):] in KEY_SUFFIXES:
+        return 0.0
+    return jaccard(hint_sh, surface_sh) * len(short) / float(len(long_))
+
+
+@dataclass
+class ColumnResolver:
+    """
+    Fuzzy column-name index over the schema registry.
+
+    Every column (plus any synonyms listed in the content index under
+    "column_synonyms": {column: [alias, ...]}) is reduced to character
+    trigrams of its normalized name and a MinHash signature. Signatures are
+    banded into LSH buckets, so a lookup only scores the handful of names
+    sharing a bucket with the hint (scored with similarity()), not every column.
+    """
+
+    version: Any = None
+    entries: List[Tuple[str, str, str]] = field(default_factory=list)  # (table_key, column, surface form)
+    entry_shingles: List[Set[str]] = field(default_factory=list)
+    band_keys: List[np.ndarray] = field(default_factory=list)  # per band: sorted bucket keys
+    band_ids: List[np.ndarray] = field(default_factory=list)  # per band: entry ids aligned with band_keys
+    by_table: Dict[str, List[int]] = field(default_factory=dict)
+
+    @classmethod
+    def build(cls, registry: Dict[str, Any], content_tables: Dict[str, Any], version: Any = None) -> "ColumnResolver":
+        idx = cls(version=version)
+        for table_key, tmeta in (registry.get("tables") or {}).items():
+            names = [c.get("name") for c in (tmeta or {}).get("columns", []) if isinstance(c, dict) and c.get("name")]
+            ct = content_tables.get(table_key)
+            synonyms = ct.get("column_synonyms", {}) if isinstance(ct, dict) else {}
+            for col in names:
+                surfaces = [col] + [s for s in (synonyms.get(col) or []) if isinstance(s, str)]
+                for surface in dict.fromkeys(surfaces):
+                    idx.by_table.setdefault(table_key, []).append(len(idx.entries))
+                    idx.entries.append((table_key, col, surface))
+                    idx.entry_shingles.append(shingles(surface))
+
+        # LSH buckets as sorted arrays (one per band): built vectorized, probed with binary search
+        keys = _band_keys(minhash_many(idx.entry_shingles)) if idx.entries else np.empty((0, BANDS), np.uint64)
+        for band in range(BANDS):
+            order = np.argsort(keys[:, band], kind="stable")
+            idx.band_keys.append(keys[order, band])
+            idx.band_ids.append(order)
+        return idx
+
+    def candidates(self, hint: str) -> Set[int]:
+        keys = _band_keys(minhash(shingles(hint))[None, :])[0]
+        out: Set[int] = set()
+        for band in range(BANDS):
+            col = self.band_keys[band]
+            lo = int(np.searchsorted(col, keys[band], side="left"))
+            hi = int(np.searchsorted(col, keys[band], side="right"))
+            out.update(self.band_ids[band][lo:hi].tolist())
+        return out
+
+    def resolve(self, hint: str, tables: Iterable[str], min_score: float) -> Optional[Dict[str, Any]]:
+        """
+        Best match for `hint` among the columns of `tables` (earlier tables win
+        ties), or None when nothing reaches min_score.
+        Returns {"table", "column", "matched", "score"}.
+        """
+        order = {t: i for i, t in enumerate(tables)}
+        if not order:
+            return None
+        hint_sh = shingles(hint)
+        hint_norm = normalize_name(hint)
+        cands = [i for i in self.candidates(hint) if self.entries[i][0] in order]
+        if not cands:
+            # LSH miss: the chosen tables' columns are few, score them directly
+            cands = [i for t in order for i in self.by_table.get(t, [])]
+
+        best: Optional[Tuple[float, int, int]] = None
+        for i in cands:
+            score = similarity(hint_norm, hint_sh, normalize_name(self.entries[i][2]), self.entry_shingles[i])
+            key = (score, -order[self.entries[i][0]], -i)
+            if best is None or key > best:
+                best = key
+        if best is None or best[0] < min_score:
+            return None
+        table_key, column, surface = self.entries[-best[2]]
+        return {"table": table_key, "column": column, "matched": surface, "score": round(best[0], 3)}
+
+
+# -----------------------------
+# Process-wide cache
+# -----------------------------
+_RESOLVERS: Dict[str, ColumnResolver] = {}
+_RESOLVERS_LOCK = threading.Lock()
+
+
+def get_column_resolver(registry: SchemaRegistry) -> ColumnResolver:
+    """
+    Built once per (registry version, content index file version) and shared.
+    """
+    store = ContentIndexStore(Path(registry.kg_dir))
+    try:
+        st = store.path.stat()
+        content_key: Any = (st.st_mtime_ns, st.st_size)
+    except FileNotFoundError:
+        content_key = None
+    version = (registry.version(), content_key)
+    cache_key = str(Path(registry.kg_dir).resolve())
+
+    with _RESOLVERS_LOCK:
+        cached = _RESOLVERS.get(cache_key)
+    if cached is not None and cached.version == version:
+        return cached
+    content_tables = store.load().get("tables", {}) if content_key is not None else {}
+    resolver = ColumnResolver.build(registry.load(), content_tables, version=version)
+    with _RESOLVERS_LOCK:
+        _RESOLVERS[cache_key] = resolver
+    return resolver
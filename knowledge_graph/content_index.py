@@ -1,21 +1,38 @@
 from __future__ import annotations
 
-from dataclasses import dataclass
+from contextlib import contextmanager
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Any, Dict
+from typing import Any, Callable, Dict, Iterable, Iterator, Optional
 import json
+import os
+import uuid
 from utils.json_sanitize import json_sanitize
 
 
 @dataclass
 class ContentIndexStore:
+    """
+    content_index.json: {"tables": {table_key: content payload}}.
+
+    Every write replaces the file atomically (temp file + rename), so readers
+    always see a complete index. Inside batch(), upserts/deletes are staged in
+    memory and written once when the block exits. on_commit, if set, is called
+    with the written index after each file write (e.g. to warm the retrieval index).
+    """
+
     base_dir: Path
+    on_commit: Optional[Callable[[Dict[str, Any]], None]] = None
+    _staged: Optional[Dict[str, Any]] = field(default=None, init=False, repr=False)
+    _dirty: bool = field(default=False, init=False, repr=False)
 
     @property
     def path(self) -> Path:
         return self.base_dir / "content_index.json"
 
     def load(self) -> Dict[str, Any]:
+        if self._staged is not None:
+            return self._staged
         if not self.path.exists():
             return {"tables": {}}
 
@@ -44,9 +61,41 @@ class ContentIndexStore:
         return obj
 
     def save(self, obj: Dict[str, Any]) -> None:
+        if self._staged is not None:
+            self._staged = obj
+            self._dirty = True
+            return
+        self._write(obj)
+
+    def _write(self, obj: Dict[str, Any]) -> None:
         self.base_dir.mkdir(parents=True, exist_ok=True)
-        safe_obj = json_sanitize(obj)
-        self.path.write_text(json.dumps(safe_obj, indent=2), encoding="utf-8")
+        tmp = self.path.with_name(f".{self.path.name}.{uuid.uuid4().hex[:8]}.tmp")
+        try:
+            tmp.write_text(json.dumps(obj, default=json_sanitize), encoding="utf-8")
+            os.replace(tmp, self.path)
+        finally:
+            if tmp.exists():
+                tmp.unlink()
+        if self.on_commit is not None:
+            self.on_commit(obj)
+
+    @contextmanager
+    def batch(self) -> Iterator["ContentIndexStore"]:
+        """
+        Stages every write in the block and commits them with one file write.
+        If the block raises, nothing is written. Nested batches join the outer one.
+        """
+        if self._staged is not None:
+            yield self
+            return
+        self._staged, self._dirty = self.load(), False
+        try:
+            yield self
+            staged, dirty = self._staged, self._dirty
+        finally:
+            self._staged, self._dirty = None, False
+        if dirty:
+            self._write(staged)
 
     def upsert_table(self, table_key: str, payload: Dict[str, Any]) -> None:
         obj = self.load()
@@ -55,4 +104,16 @@ class ContentIndexStore:
         if "tables" not in obj or not isinstance(obj["tables"], dict):
             obj["tables"] = {}
         obj["tables"][table_key] = payload
-        self.save(obj)
\ No newline at end of file
+        self.save(obj)
+
+    def delete_tables(self, table_keys: Iterable[str]) -> int:
+        keys = set(table_keys)
+        if not keys:
+            return 0
+        obj = self.load()
+        before = len(obj["tables"])
+        obj["tables"] = {k: v for k, v in obj["tables"].items() if k not in keys}
+        removed = before - len(obj["tables"])
+        if removed:
+            self.save(obj)
+        return removed
@@ -0,0 +1,406 @@
+from __future__ import annotations
+
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Dict, FrozenSet, Iterable, List, Optional, Set, Tuple
+import heapq
+import re
+import threading
+
+from knowledge_graph.schema_registry import SchemaRegistry
+
+EDGE_WEIGHTS = {"fk": 1.0, "inferred": 2.0}  # declared FKs are preferred over name matches
+GENERIC_KEY_NAMES = {"id", "key", "code", "pk"}
+
+
+def _norm(name: str) -> str:
+    return re.sub(r"[^a-z0-9]+", "", str(name or "").lower())
+
+
+def _singular(name: str) -> str:
+    n = _norm(name)
+    if n.endswith("ies") and len(n) > 4:
+        return n[:-3] + "y"
+    if n.endswith("s") and not n.endswith("ss") and len(n) > 3:
+        return n[:-1]
+    return n
+
+
+class JoinFanoutError(ValueError):
+    """
+    Raised when a join set would multiply rows (chasm / fan trap).
+    """
+
+    def __init__(self, problems: List[str]):
+        super().__init__("Join set would fan out: " + "; ".join(problems))
+        self.problems = problems
+
+
+@dataclass(frozen=True)
+class JoinEdge:
+    """
+    many_table.many_cols = one_table.one_cols (column pairs in order).
+    one_unique: the one-side columns are exactly its primary key, so the join
+    is n:1 from the many side; False for name-based keys whose uniqueness is unknown.
+    """
+
+    many_table: str
+    one_table: str
+    many_cols: Tuple[str, ...]
+    one_cols: Tuple[str, ...]
+    kind: str  # "fk" | "inferred"
+    one_unique: bool
+
+    def other(self, table: str) -> str:
+        return self.one_table if table == self.many_table else self.many_table
+
+    def keys_from(self, table: str) -> List[Tuple[str, str]]:
+        """
+        (column on `table`, column on the other table) pairs.
+        """
+        if table == self.many_table:
+            return list(zip(self.many_cols, self.one_cols))
+        return list(zip(self.one_cols, self.many_cols))
+
+
+@dataclass
+class JoinGraph:
+    """
+    Join graph over the schema registry: declared FKs (pk_fk_hints) plus
+    inferred key-name matches (Orders.CustomerId -> Customers.CustomerId PK,
+    or -> Customers.Id). Shortest join paths are Dijkstra runs cached per
+    (source, allowed tables), i.e. all-pairs paths computed lazily.
+    """
+
+    version: Any = None
+    adjacency: Dict[str, List[JoinEdge]] = field(default_factory=dict)
+    columns: Dict[str, Set[str]] = field(default_factory=dict)
+    _paths: "OrderedDict[Tuple[str, Optional[FrozenSet[str]]], Tuple[Dict[str, float], Dict[str, JoinEdge]]]" = field(
+        default_factory=OrderedDict, repr=False
+    )
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    # -------------------------
+    # Build
+    # -------------------------
+    @classmethod
+    def build(cls, registry: Dict[str, Any], version: Any = None) -> "JoinGraph":
+        g = cls(version=version)
+        tables = registry.get("tables") or {}
+        g.adjacency = {t: [] for t in tables}
+
+        columns: Dict[str, List[str]] = {}
+        pks: Dict[str, List[str]] = {}
+        by_name: Dict[Tuple[str, str], str] = {}  # (schema, normalized table name) -> key
+        for key, t in tables.items():
+            columns[key] = [c["name"] for c in (t or {}).get("columns", []) if isinstance(c, dict) and c.get("name")]
+            hints = (t or {}).get("pk_fk_hints") or {}
+            pks[key] = list(hints.get("primary_key") or hints.get("primary_keys") or [])
+            g.columns[key] = set(columns[key])
+            schema, _, name = key.partition(".")
+            by_name[(_norm(schema), _norm(name or schema))] = key
+
+        linked: Set[FrozenSet[str]] = set()
+
+        # --- declared foreign keys (one edge per child -> parent, composite keys grouped)
+        for key, t in tables.items():
+            grouped: Dict[str, List[Tuple[str, str]]] = {}
+            for fk in ((t or {}).get("pk_fk_hints") or {}).get("foreign_keys") or []:
+                parent = by_name.get((_norm(fk.get("ref_schema")), _norm(fk.get("ref_table"))))
+                if parent and fk.get("parent_column") and fk.get("ref_column"):
+                    grouped.setdefault(parent, []).append((fk["parent_column"], fk["ref_column"]))
+            for parent, pairs in grouped.items():
+                parent_pk = set(pks.get(parent, []))
+                ref_cols = {r for _, r in pairs}
+                if parent_pk and ref_cols == parent_pk:
+                    groups = [pairs]  # one composite key
+                else:
+                    groups = [[p] for p in pairs]  # independent single-column references
+                for grp in groups:
+                    unique = bool(parent_pk) and {r for _, r in grp} == parent_pk
+                    g._add(JoinEdge(key, parent, tuple(c for c, _ in grp), tuple(r for _, r in grp), "fk", unique))
+                linked.add(frozenset((key, parent)))
+
+        # --- inferred key-name matches
+        key_index: Dict[str, List[Tuple[str, str, bool]]] = {}  # normalized column name -> [(table, key col, is_pk)]
+        for key, t in tables.items():
+            name = (t or {}).get("name") or key.partition(".")[2] or key
+            names = {_norm(name) + "id", _singular(name) + "id"}
+            if len(pks[key]) == 1:
+                pk = pks[key][0]
+                targets = names if _norm(pk) in GENERIC_KEY_NAMES else {_norm(pk)}
+                for n in targets:
+                    key_index.setdefault(n, []).append((key, pk, True))
+            elif not pks[key]:
+                # no declared PK: "<Table>Id" column of the table itself
+                for c in columns[key]:
+                    if _norm(c) in names:
+                        for n in names:
+                            key_index.setdefault(n, []).append((key, c, False))
+                        break
+
+        for key in tables:
+            for c in columns[key]:
+                for other, kcol, is_pk in key_index.get(_norm(c), []):
+                    if other == key or frozenset((key, other)) in linked:
+                        continue
+                    g._add(JoinEdge(key, other, (c,), (kcol,), "inferred", is_pk))
+                    linked.add(frozenset((key, other)))
+        return g
+
+    def _add(self, edge: JoinEdge) -> None:
+        self.adjacency.setdefault(edge.many_table, []).append(edge)
+        self.adjacency.setdefault(edge.one_table, []).append(edge)
+
+    # -------------------------
+    # Paths
+    # -------------------------
+    def edges_between(self, a: str, b: str) -> List[JoinEdge]:
+        return [e for e in self.adjacency.get(a, []) if e.other(a) == b]
+
+    def _dijkstra(self, source: str, allowed: Optional[FrozenSet[str]]) -> Tuple[Dict[str, float], Dict[str, JoinEdge]]:
+        key = (source, allowed)
+        with self._lock:
+            hit = self._paths.get(key)
+            if hit is not None:
+                self._paths.move_to_end(key)
+                return hit
+        dist: Dict[str, float] = {source: 0.0}
+        prev: Dict[str, JoinEdge] = {}
+        heap: List[Tuple[float, str]] = [(0.0, source)]
+        while heap:
+            d, u = heapq.heappop(heap)
+            if d > dist.get(u, float("inf")):
+                continue
+            for e in self.adjacency.get(u, []):
+                v = e.other(u)
+                if allowed is not None and v not in allowed:
+                    continue
+                nd = d + EDGE_WEIGHTS.get(e.kind, 1.0)
+                if nd < dist.get(v, float("inf")):
+                    dist[v] = nd
+                    prev[v] = e
+                    heapq.heappush(heap, (nd, v))
+        with self._lock:
+            self._paths[key] = (dist, prev)
+            while len(self._paths) > 1024:
+                self._paths.popitem(last=False)
+        return dist, prev
+
+    def shortest_path(self, a: str, b: str, allowed: Optional[Iterable[str]] = None) -> Optional[List[Tuple[str, JoinEdge]]]:
+        """
+        [(from_table, edge), ...] from a to b, or None if not connected.
+        """
+        allowed_fs = frozenset(allowed) | {a, b} if allowed else None
+        dist, prev = self._dijkstra(a, allowed_fs)
+        if b not in dist:
+            return None
+        steps: List[Tuple[str, JoinEdge]] = []
+        node = b
+        while node != a:
+            e = prev[node]
+            frm = e.other(node)
+            steps.append((frm, e))
+            node = frm
+        return list(reversed(steps))
+
+    # -------------------------
+    # Join completion
+    # -------------------------
+    def complete_joins(
+        self,
+        tables: List[str],
+        joins: Optional[List[Any]] = None,
+        allowed: Optional[Iterable[str]] = None,
+    ) -> Dict[str, Any]:
+        """
+        Turns (tables, proposed joins) into a join tree rooted at tables[0]:
+        proposed joins are kept when their columns exist (source "fk"/"inferred"
+        when they match a graph edge, "plan" otherwise), oriented so each join's left_table is already
+        joined; tables still unconnected are reached via shortest paths
+        (bridge tables restricted to `allowed`).
+
+        Returns {"tables", "joins", "added", "dropped", "unreachable"}.
+        """
+        if not tables:
+            return {"tables": [], "joins": [], "added": [], "dropped": [], "unreachable": []}
+        root = tables[0]
+        connected: List[str] = [root]
+        out: List[Dict[str, Any]] = []
+        dropped: List[Dict[str, Any]] = []
+        added: List[Dict[str, Any]] = []
+
+        pending: List[Dict[str, Any]] = []
+        for j in joins or []:
+            if not isinstance(j, dict):
+                continue
+            lt, rt, lk, rk = (j.get(k) for k in ("left_table", "right_table", "left_key", "right_key"))
+            if lk in self.columns.get(lt, ()) and rk in self.columns.get(rt, ()):
+                pending.append(j)
+            else:
+                dropped.append({**j, "reason": "unknown table or column"})
+        progress = True
+        while pending and progress:
+            progress = False
+            for j in list(pending):
+                lt, rt = j.get("left_table"), j.get("right_table")
+                if lt in connected and rt in connected:
+                    pending.remove(j)
+                    dropped.append({**j, "reason": "cycle"})
+                    progress = True
+                elif lt in connected or rt in connected:
+                    pending.remove(j)
+                    if lt not in connected:  # orient: left side already joined
+                        j = {**j, "left_table": rt, "right_table": lt, "left_key": j.get("right_key"), "right_key": j.get("left_key")}
+                    j = {**j, "source": self._match_source(j)}
+                    if j["right_table"] not in tables:
+                        dropped.append({**j, "reason": "table not in plan"})
+                        continue
+                    out.append(j)
+                    connected.append(j["right_table"])
+                    progress = True
+        dropped.extend({**j, "reason": "not connected to the plan's tables"} for j in pending)
+
+        unreachable: List[str] = []
+        allowed_list = list(allowed) if allowed else None
+        for t in tables[1:]:
+            if t in connected:
+                continue
+            best: Optional[List[Tuple[str, JoinEdge]]] = None
+            for c in connected:
+                path = self.shortest_path(c, t, allowed_list)
+                if path is not None and (best is None or _cost(path) < _cost(best)):
+                    best = path
+            if best is None:
+                unreachable.append(t)
+                continue
+            for frm, e in best:
+                to = e.other(frm)
+                if to in connected:
+                    continue
+                j = self.join_dict(frm, e)
+                out.append(j)
+                added.append(j)
+                connected.append(to)
+
+        return {"tables": connected + [t for t in unreachable if t not in connected], "joins": out,
+                "added": added, "dropped": dropped, "unreachable": unreachable}
+
+    def join_dict(self, frm: str, e: JoinEdge, join_type: str = "LEFT") -> Dict[str, Any]:
+        pairs = e.keys_from(frm)
+        j: Dict[str, Any] = {
+            "left_table": frm,
+            "right_table": e.other(frm),
+            "left_key": pairs[0][0],
+            "right_key": pairs[0][1],
+            "join_type": join_type,
+            "source": e.kind,
+        }
+        if len(pairs) > 1:
+            j["extra_keys"] = [list(p) for p in pairs[1:]]
+        return j
+
+    def _match_source(self, j: Dict[str, Any]) -> str:
+        e = self._edge_for(j)
+        return e.kind if e is not None else "plan"
+
+    def _edge_for(self, j: Dict[str, Any]) -> Optional[JoinEdge]:
+        lt, rt = j.get("left_table"), j.get("right_table")
+        pair = (j.get("left_key"), j.get("right_key"))
+        for e in self.edges_between(lt, rt):
+            if pair in e.keys_from(lt):
+                return e
+        return None
+
+    # -------------------------
+    # Fan-out detection
+    # -------------------------
+    def cardinality(self, j: Dict[str, Any]) -> str:
+        """
+        "n:1", "1:n", "1:1" (left -> right) or "unknown" (no proven uniqueness).
+        """
+        e = self._edge_for(j)
+        if e is None or not e.one_unique:
+            return "unknown"
+        return "n:1" if e.many_table == j.get("left_table") else "1:n"
+
+    def fanout_problems(self, joins: List[Dict[str, Any]], additive_metric_tables: Iterable[str] = ()) -> Dict[str, Any]:
+        """
+        Checks a join tree for row multiplication:
+        - chasm trap: no table from which every join walks n:1 (two independent
+          one-to-many branches multiply each other);
+        - fan trap: an additive metric (SUM/AVG) on a table that sits on
+          the "one" side of a proven n:1 step from the grain table.
+        Unknown cardinalities are never counted as problems.
+        Returns {"grain": table|None, "problems": [...], "cardinality": [...]}.
+        """
+        cards = [(j, self.cardinality(j)) for j in joins]
+        nbrs: Dict[str, List[Tuple[str, str]]] = {}  # table -> [(other, cardinality walking table -> other)]
+        flip = {"n:1": "1:n", "1:n": "n:1", "unknown": "unknown"}
+        for j, c in cards:
+            lt, rt = j["left_table"], j["right_table"]
+            nbrs.setdefault(lt, []).append((rt, c))
+            nbrs.setdefault(rt, []).append((lt, flip[c]))
+
+        def walk(root: str) -> Tuple[List[str], Dict[str, bool]]:
+            bad: List[str] = []
+            multiplied: Dict[str, bool] = {root: False}  # reached through a proven n:1 step
+            stack = [root]
+            while stack:
+                u = stack.pop()
+                for v, c in nbrs.get(u, []):
+                    if v in multiplied:
+                        continue
+                    if c == "1:n":
+                        bad.append(f"{u} -> {v} is one-to-many")
+                    multiplied[v] = multiplied[u] or c == "n:1"
+                    stack.append(v)
+            return bad, multiplied
+
+        problems: List[str] = []
+        grain: Optional[str] = None
+        if nbrs:
+            root_order = [joins[0]["left_table"]] + [t for t in nbrs if t != joins[0]["left_table"]]
+            for r in root_order:
+                bad, multiplied = walk(r)
+                if not bad:
+                    grain = r
+                    break
+            if grain is None:
+                problems.append("no single grain: " + ", ".join(walk(root_order[0])[0]))
+            else:
+                for t in dict.fromkeys(additive_metric_tables):
+                    if multiplied.get(t):
+                        problems.append(f"additive metric on {t} is repeated per row of {grain}")
+        return {
+            "grain": grain,
+            "problems": problems,
+            "cardinality": [{"left_table": j["left_table"], "right_table": j["right_table"], "cardinality": c} for j, c in cards],
+        }
+
+
+def _cost(path: List[Tuple[str, JoinEdge]]) -> float:
+    return sum(EDGE_WEIGHTS.get(e.kind, 1.0) for _, e in path)
+
+
+# -----------------------------
+# Process-wide cache
+# -----------------------------
+_GRAPHS: Dict[str, JoinGraph] = {}
+_GRAPHS_LOCK = threading.Lock()
+
+
+def get_join_graph(registry: SchemaRegistry) -> JoinGraph:
+    """
+    Built once per registry version and shared (with its path cache).
+    """
+    version = registry.version()
+    cache_key = str(registry.kg_dir.resolve())
+    with _GRAPHS_LOCK:
+        g = _GRAPHS.get(cache_key)
+    if g is not None and g.version == version:
+        return g
+    g = JoinGraph.build(registry.load(), version=version)
+    with _GRAPHS_LOCK:
+        _GRAPHS[cache_key] = g
+    return g
@@ -0,0 +1,187 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+import hashlib
+import json
+import sqlite3
+
+from utils.json_sanitize import json_sanitize
+
+
+def content_version(obj: Dict[str, Any]) -> str:
+    raw = json.dumps(obj, sort_keys=True, default=json_sanitize)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:16]
+
+
+@dataclass
+class MetadataDB:
+    """
+    Embedded SQLite store for knowledge-graph metadata (schema + registry),
+    one row per table so point lookups never parse the whole document.
+
+    Tables:
+      - kg_tables: (kind, table_key) -> payload JSON, ord keeps document order
+      - kg_meta:   kind -> top-level fields other than "tables" (+ "version")
+
+    kind is "schema" or "registry". A document {"tables": {...}, **meta}
+    round-trips through replace()/load().
+    """
+
+    path: Path
+
+    def __post_init__(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._init_db()
+
+    def _conn(self) -> sqlite3.Connection:
+        return sqlite3.connect(str(self.path), timeout=30)
+
+    def _init_db(self) -> None:
+        con = self._conn()
+        try:
+            con.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS kg_tables (
+                    kind      TEXT NOT NULL,
+                    table_key TEXT NOT NULL,
+                    ord       INTEGER NOT NULL,
+                    payload   TEXT NOT NULL,
+                    PRIMARY KEY (kind, table_key)
+                );
+                CREATE TABLE IF NOT EXISTS kg_meta (
+                    kind    TEXT PRIMARY KEY,
+                    payload TEXT NOT NULL
+                );
+                """
+            )
+        finally:
+            con.close()
+
+    # -------------------------
+    # Whole documents
+    # -------------------------
+    def replace(self, kind: str, doc: Dict[str, Any]) -> str:
+        """
+        Replaces every row of `kind` in one transaction. Returns the content version.
+        """
+        tables = doc.get("tables") or {}
+        meta = {k: v for k, v in doc.items() if k != "tables"}
+        meta["version"] = content_version(doc)
+        rows = [
+            (kind, key, i, json.dumps(payload, default=json_sanitize))
+            for i, (key, payload) in enumerate(tables.items())
+        ]
+        con = self._conn()
+        try:
+            with con:
+                con.execute("DELETE FROM kg_tables WHERE kind = ?", (kind,))
+                con.executemany("INSERT INTO kg_tables (kind, table_key, ord, payload) VALUES (?, ?, ?, ?)", rows)
+                con.execute(
+                    "INSERT OR REPLACE INTO kg_meta (kind, payload) VALUES (?, ?)",
+                    (kind, json.dumps(meta, default=json_sanitize)),
+                )
+        finally:
+            con.close()
+        return meta["version"]
+
+    def load(self, kind: str) -> Optional[Dict[str, Any]]:
+        """
+        The full document, or None if `kind` was never written.
+        """
+        con = self._conn()
+        try:
+            meta_row = con.execute("SELECT payload FROM kg_meta WHERE kind = ?", (kind,)).fetchone()
+            if meta_row is None:
+                return None
+            rows = con.execute(
+                "SELECT table_key, payload FROM kg_tables WHERE kind = ? ORDER BY ord", (kind,)
+            ).fetchall()
+        finally:
+            con.close()
+        doc = json.loads(meta_row[0])
+        doc.pop("version", None)
+        doc["tables"] = {k: json.loads(p) for k, p in rows}
+        return doc
+
+    def meta(self, kind: str) -> Optional[Dict[str, Any]]:
+        con = self._conn()
+        try:
+            row = con.execute("SELECT payload FROM kg_meta WHERE kind = ?", (kind,)).fetchone()
+        finally:
+            con.close()
+        return json.loads(row[0]) if row else None
+
+    # -------------------------
+    # Point lookups
+    # -------------------------
+    def keys(self, kind: str) -> List[str]:
+        con = self._conn()
+        try:
+            rows = con.execute("SELECT table_key FROM kg_tables WHERE kind = ? ORDER BY ord", (kind,)).fetchall()
+        finally:
+            con.close()
+        return [r[0] for r in rows]
+
+    def get(self, kind: str, table_key: str) -> Optional[Dict[str, Any]]:
+        con = self._conn()
+        try:
+            row = con.execute(
+                "SELECT payload FROM kg_tables WHERE kind = ? AND table_key = ?", (kind, table_key)
+            ).fetchone()
+        finally:
+            con.close()
+        return json.loads(row[0]) if row else None
+
+    def has(self, kind: str, table_key: str) -> bool:
+        con = self._conn()
+        try:
+            row = con.execute(
+                "SELECT 1 FROM kg_tables WHERE kind = ? AND table_key = ?", (kind, table_key)
+            ).fetchone()
+        finally:
+            con.close()
+        return row is not None
+
+    def count(self, kind: str) -> int:
+        con = self._conn()
+        try:
+            return int(con.execute("SELECT COUNT(1) FROM kg_tables WHERE kind = ?", (kind,)).fetchone()[0])
+        finally:
+            con.close()
+
+    # -------------------------
+    # JSON compatibility
+    # -------------------------
+    def import_json(self, kind: str, json_path: Path) -> bool:
+        """
+        Loads a legacy JSON document into `kind`. Returns False if the file is missing or unreadable.
+        """
+        try:
+            doc = json.loads(Path(json_path).read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return False
+        if not isinstance(doc, dict):
+            return False
+        doc.setdefault("tables", {})
+        self.replace(kind, doc)
+        return True
+
+    def migrate_json(self, kind: str, json_path: Path) -> bool:
+        """
+        One-time migration: imports the JSON file if `kind` has never been written.
+        The JSON file is left in place.
+        """
+        if self.meta(kind) is not None or not Path(json_path).exists():
+            return False
+        return self.import_json(kind, json_path)
+
+    def export_json(self, kind: str, json_path: Path) -> Path:
+        doc = self.load(kind) or {"tables": {}}
+        json_path = Path(json_path)
+        json_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = json_path.with_suffix(json_path.suffix + ".tmp")
+        tmp.write_text(json.dumps(doc, indent=2, default=json_sanitize), encoding="utf-8")
+        tmp.replace(json_path)
+        return json_path
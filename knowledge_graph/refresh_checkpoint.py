@@ -0,0 +1,176 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+import hashlib
+import json
+import os
+import shutil
+import time
+import uuid
+
+from utils.json_sanitize import json_sanitize
+
+
+@dataclass
+class RefreshCheckpoint:
+    """
+    Checkpoint for SchemaAgent.refresh so a long refresh survives a timeout or
+    Streamlit rerun.
+
+    Layout (under <kg_dir>/refresh_checkpoint/):
+      - state.json      refresh_id, status, options, table order (written at start/end)
+      - progress.jsonl  one line per finished table: {"key", "status": "done"|"failed", "error"}
+                        (the refresh cursor; appended as tables finish)
+      - tables/<id>.json per-table result (schema entry, registry entry, content payload)
+
+    status: "running" (in progress or interrupted), "incomplete" (finished with
+    failed tables), "done".
+    """
+
+    base_dir: Path
+
+    def __post_init__(self) -> None:
+        self.root = self.base_dir / "refresh_checkpoint"
+
+    @property
+    def state_path(self) -> Path:
+        return self.root / "state.json"
+
+    @property
+    def progress_path(self) -> Path:
+        return self.root / "progress.jsonl"
+
+    def _table_path(self, key: str) -> Path:
+        return self.root / "tables" / f"{hashlib.sha1(key.encode('utf-8')).hexdigest()[:20]}.json"
+
+    # -------------------------
+    # Lifecycle
+    # -------------------------
+    def start(self, options: Dict[str, Any], table_keys: List[str]) -> Dict[str, Any]:
+        if self.root.exists():
+            shutil.rmtree(self.root, ignore_errors=True)
+        (self.root / "tables").mkdir(parents=True, exist_ok=True)
+        state = {
+            "refresh_id": uuid.uuid4().hex[:12],
+            "status": "running",
+            "started_at": int(time.time()),
+            "finished_at": None,
+            "options": options,
+            "tables": list(table_keys),
+        }
+        self._write_state(state)
+        return state
+
+    def resume(self, table_keys: List[str]) -> Optional[Dict[str, Any]]:
+        """
+        Returns the resumable state (status != "done") with its table order
+        updated to the current catalog, or None.
+        """
+        state = self.load_state()
+        if not state or state.get("status") == "done":
+            return None
+        (self.root / "tables").mkdir(parents=True, exist_ok=True)
+        state["status"] = "running"
+        state["tables"] = list(table_keys)
+        self._write_state(state)
+        return state
+
+    def finish(self, failed: bool) -> None:
+        state = self.load_state() or {}
+        state["status"] = "incomplete" if failed else "done"
+        state["finished_at"] = int(time.time())
+        self._write_state(state)
+        if not failed:
+            # results are in schema.json / registry / content index now
+            shutil.rmtree(self.root / "tables", ignore_errors=True)
+
+    # -------------------------
+    # Per-table results
+    # -------------------------
+    def record_done(self, key: str, result: Dict[str, Any]) -> None:
+        path = self._table_path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(".tmp")
+        tmp.write_text(json.dumps({"key": key, **result}, default=json_sanitize), encoding="utf-8")
+        os.replace(tmp, path)
+        self._append_progress({"key": key, "status": "done"})
+
+    def record_failed(self, key: str, error: str) -> None:
+        self._append_progress({"key": key, "status": "failed", "error": error[:2000]})
+
+    def completed(self) -> Dict[str, Dict[str, Any]]:
+        """
+        {table_key: result} for tables whose last recorded outcome is "done".
+        """
+        out: Dict[str, Dict[str, Any]] = {}
+        for key, rec in self._latest().items():
+            if rec.get("status") != "done":
+                continue
+            path = self._table_path(key)
+            try:
+                payload = json.loads(path.read_text(encoding="utf-8"))
+            except (OSError, ValueError):
+                continue  # lost/corrupt table file → the table is simply redone
+            payload.pop("key", None)
+            out[key] = payload
+        return out
+
+    # -------------------------
+    # Status
+    # -------------------------
+    def load_state(self) -> Optional[Dict[str, Any]]:
+        if not self.state_path.exists():
+            return None
+        try:
+            return json.loads(self.state_path.read_text(encoding="utf-8"))
+        except ValueError:
+            return None
+
+    def status(self) -> Dict[str, Any]:
+        state = self.load_state()
+        if not state:
+            return {"status": "none", "total": 0, "completed": 0, "failed": 0, "pending": 0, "failed_tables": {}}
+        latest = self._latest()
+        keys = state.get("tables", [])
+        done = [k for k in keys if latest.get(k, {}).get("status") == "done"]
+        failed = {k: latest[k].get("error") for k in keys if latest.get(k, {}).get("status") == "failed"}
+        return {
+            "refresh_id": state.get("refresh_id"),
+            "status": state.get("status"),
+            "started_at": state.get("started_at"),
+            "finished_at": state.get("finished_at"),
+            "total": len(keys),
+            "completed": len(done),
+            "failed": len(failed),
+            "pending": len(keys) - len(done) - len(failed),
+            "failed_tables": failed,
+        }
+
+    # -------------------------
+    # Internals
+    # -------------------------
+    def _write_state(self, state: Dict[str, Any]) -> None:
+        self.root.mkdir(parents=True, exist_ok=True)
+        tmp = self.state_path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(state, indent=2, default=json_sanitize), encoding="utf-8")
+        os.replace(tmp, self.state_path)
+
+    def _append_progress(self, rec: Dict[str, Any]) -> None:
+        rec = {**rec, "ts": int(time.time())}
+        with self.progress_path.open("a", encoding="utf-8") as f:
+            f.write(json.dumps(rec, ensure_ascii=False) + "\n")
+
+    def _latest(self) -> Dict[str, Dict[str, Any]]:
+        latest: Dict[str, Dict[str, Any]] = {}
+        if not self.progress_path.exists():
+            return latest
+        for line in self.progress_path.read_text(encoding="utf-8").splitlines():
+            try:
+                rec = json.loads(line)
+            except ValueError:
+                continue  # torn last line after a crash
+            if isinstance(rec, dict) and rec.get("key"):
+                latest[rec["key"]] = rec
+        return latest
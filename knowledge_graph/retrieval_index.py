@@ -0,0 +1,245 @@
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+import math
+import re
+import threading
+
+from knowledge_graph.content_index import ContentIndexStore
+from knowledge_graph.schema_registry import SchemaRegistry
+
+# Field boosts (same weights schema_reasoning used for its substring checks).
+FIELD_WEIGHTS = {"table": 3.0, "col": 1.0, "blob": 1.5, "top": 2.5, "sample": 1.0}
+SCHEMA_FIELDS = ("table", "col")
+
+_TOKEN_RE = re.compile(r"[a-z0-9_]+")
+
+
+def _tokens(text: Any) -> List[str]:
+    return _TOKEN_RE.findall(str(text).lower()) if text is not None else []
+
+
+def _trigrams(term: str) -> Set[str]:
+    return {term[i : i + 3] for i in range(len(term) - 2)}
+
+
+@dataclass
+class RetrievalIndex:
+    """
+    Inverted index over table names, column names, the content keyword blob,
+    top values and sample-row tokens, used to rank candidate tables.
+
+    A query word matches every indexed term that contains it, which keeps the
+    substring semantics of the old per-table scan. Matching terms are found
+    through a trigram index over the vocabulary. Each (word, field) hit
+    scores FIELD_WEIGHTS[field] * idf(word), where idf is the BM25 idf over
+    tables, so rare words count more than words found in every table.
+    """
+
+    tables: List[str]
+    row_counts: List[int]
+    join_bonus: List[float]
+    has_content: List[bool]
+    postings: Dict[str, Dict[str, Set[int]]] = field(default_factory=dict)  # field -> term -> docs
+    top_postings: Dict[str, Dict[int, Set[str]]] = field(default_factory=dict)  # term -> doc -> columns
+    vocab: Set[str] = field(default_factory=set)
+    grams: Dict[str, Set[str]] = field(default_factory=dict)  # trigram -> vocabulary terms
+    _expand_cache: Dict[str, List[str]] = field(default_factory=dict, repr=False)
+
+    @classmethod
+    def build(cls, registry: Dict[str, Any], content_tables: Dict[str, Any]) -> "RetrievalIndex":
+        reg_tables = registry.get("tables", {}) or {}
+        idx = cls(tables=list(reg_tables.keys()), row_counts=[], join_bonus=[], has_content=[])
+        idx.postings = {f: {} for f in FIELD_WEIGHTS if f != "top"}
+
+        def add(fld: str, term: str, doc: int) -> None:
+            if term:
+                idx.postings[fld].setdefault(term, set()).add(doc)
+
+        for doc, t in enumerate(idx.tables):
+            tmeta = reg_tables.get(t) or {}
+            idx.row_counts.append(int(tmeta.get("row_count", 0) or 0))
+            hints = tmeta.get("pk_fk_hints", {})
+            has_keys = isinstance(hints, dict) and (hints.get("primary_key") or hints.get("primary_keys") or hints.get("foreign_keys"))
+            idx.join_bonus.append(0.5 if has_keys else 0.0)
+
+            add("table", (t or "").lower(), doc)
+            for c in tmeta.get("columns", []) or []:
+                if isinstance(c, dict):
+                    add("col", (c.get("name", "") or "").lower(), doc)
+
+            ct = content_tables.get(t)
+            ct = ct if isinstance(ct, dict) else {}
+            idx.has_content.append(bool(ct))
+            if isinstance(ct.get("table_text"), str):
+                for tok in set(_tokens(ct["table_text"])):
+                    add("blob", tok, doc)
+            top_vals = ct.get("top_values", {})
+            if isinstance(top_vals, dict):
+                for col, rows in top_vals.items():
+                    if not isinstance(rows, list):
+                        continue
+                    for r in rows[:20]:
+                        if isinstance(r, dict):
+                            for tok in _tokens(r.get("value", "")):
+                                idx.top_postings.setdefault(tok, {}).setdefault(doc, set()).add(col)
+            samples = ct.get("sample_rows", [])
+            if isinstance(samples, list):
+                for row in samples[:10]:
+                    if isinstance(row, dict):
+                        for v in row.values():
+                            vs = str(v) if v is not None else ""
+                            if vs and len(vs) <= 80:
+                                for tok in _tokens(vs):
+                                    add("sample", tok, doc)
+
+        idx.vocab = set(idx.top_postings)
+        for terms in idx.postings.values():
+            idx.vocab.update(terms)
+        for term in idx.vocab:
+            for g in _trigrams(term):
+                idx.grams.setdefault(g, set()).add(term)
+        return idx
+
+    # -------------------------
+    # Query
+    # -------------------------
+    def _expand(self, word: str) -> List[str]:
+        """
+        Vocabulary terms containing `word` (trigram candidates, then verified).
+        """
+        hit = self._expand_cache.get(word)
+        if hit is not None:
+            return hit
+        grams = _trigrams(word)
+        if grams:
+            sets = sorted((self.grams.get(g, set()) for g in grams), key=len)
+            cands: Iterable[str] = set.intersection(*sets) if sets[0] else ()
+        else:
+            cands = self.vocab  # words shorter than a trigram
+        out = sorted(t for t in cands if word in t)
+        if len(self._expand_cache) > 4096:
+            self._expand_cache.clear()
+        self._expand_cache[word] = out
+        return out
+
+    def score(self, q_words: Iterable[str], allowed: Optional[Iterable[str]] = None) -> Tuple[List[Tuple[float, str]], Dict[str, Any]]:
+        """
+        Returns (scored, breakdown): scored is [(total, table)] for the allowed
+        tables, best first (ties keep registry order); breakdown has the
+        schema_reasoning score_breakdown entry for each of them.
+        """
+        allowed_set = set(allowed) if allowed else None
+        docs = [d for d, t in enumerate(self.tables) if allowed_set is None or t in allowed_set]
+        n = max(1, len(self.tables))
+
+        schema_score: Dict[int, float] = {}
+        content_score: Dict[int, float] = {}
+        matched_schema: Dict[int, List[str]] = {}
+        matched_content: Dict[int, List[str]] = {}
+
+        for w in sorted(set(q_words)):
+            terms = self._expand(w)
+            if not terms:
+                continue
+            hits: Dict[str, Set[int]] = {}
+            for fld, post in self.postings.items():
+                s: Set[int] = set()
+                for term in terms:
+                    s |= post.get(term, set())
+                if s:
+                    hits[fld] = s
+            top_cols: Dict[int, Set[str]] = {}
+            for term in terms:
+                for doc, cols in self.top_postings.get(term, {}).items():
+                    top_cols.setdefault(doc, set()).update(cols)
+
+            df = len(set().union(*hits.values(), top_cols.keys()))
+            if not df:
+                continue
+            idf = math.log(1.0 + (n - df + 0.5) / (df + 0.5))
+
+            for fld, fdocs in hits.items():
+                target, labels = (schema_score, matched_schema) if fld in SCHEMA_FIELDS else (content_score, matched_content)
+                for doc in fdocs:
+                    target[doc] = target.get(doc, 0.0) + FIELD_WEIGHTS[fld] * idf
+                    labels.setdefault(doc, []).append(f"{fld}:{w}")
+            for doc, cols in top_cols.items():
+                content_score[doc] = content_score.get(doc, 0.0) + FIELD_WEIGHTS["top"] * idf * len(cols)
+                matched_content.setdefault(doc, []).extend(f"top:{c}:{w}" for c in sorted(cols))
+
+        ranked: List[Tuple[float, int, str]] = []
+        breakdown: Dict[str, Any] = {}
+        for doc in docs:
+            t = self.tables[doc]
+            ss = schema_score.get(doc, 0.0)
+            cs = content_score.get(doc, 0.0)
+            jb = self.join_bonus[doc]
+            total = ss + cs + jb
+            breakdown[t] = {
+                "total_score": round(total, 3),
+                "schema_score": round(ss, 3),
+                "content_score": round(cs, 3),
+                "join_bonus": round(jb, 3),
+                "matched_schema": matched_schema.get(doc, [])[:30],
+                "matched_content": matched_content.get(doc, [])[:40],
+                "row_count": self.row_counts[doc],
+                "has_content_index": self.has_content[doc],
+            }
+            ranked.append((total, doc, t))
+        ranked.sort(key=lambda x: (-x[0], x[1]))
+        return [(s, t) for s, _, t in ranked], breakdown
+
+
+# -----------------------------
+# Process-wide cache
+# -----------------------------
+_INDEXES: Dict[str, Tuple[Any, RetrievalIndex]] = {}
+_INDEXES_LOCK = threading.Lock()
+
+
+def _version(store: ContentIndexStore, registry: SchemaRegistry) -> Tuple[Any, str]:
+    try:
+        st = store.path.stat()
+        content_key: Any = (st.st_mtime_ns, st.st_size)
+    except FileNotFoundError:
+        content_key = None
+    return content_key, registry.version()
+
+
+def warm_retrieval_index(
+    kg_dir: str, registry: SchemaRegistry, content_tables: Optional[Dict[str, Any]] = None
+) -> RetrievalIndex:
+    """
+    Builds the index now and caches it for get_retrieval_index. Called when
+    the content index is committed and at the end of a schema refresh, so the
+    first question after a refresh doesn't pay the build. content_tables is
+    what was just written (saves re-reading the file); None reads it.
+    """
+    store = ContentIndexStore(Path(kg_dir))
+    version = _version(store, registry)
+    if content_tables is None:
+        content_tables = store.load().get("tables", {}) if version[0] is not None else {}
+    idx = RetrievalIndex.build(registry.load(), content_tables)
+    with _INDEXES_LOCK:
+        _INDEXES[str(Path(kg_dir).resolve())] = (version, idx)
+    return idx
+
+
+def get_retrieval_index(kg_dir: str, registry: SchemaRegistry) -> Tuple[RetrievalIndex, bool]:
+    """
+    Returns (index, used_content_index). The index is built once per
+    (content index file version, registry version) and shared by all callers.
+    Writers warm it (warm_retrieval_index); the version check rebuilds it
+    here only when another process changed either file.
+    """
+    version = _version(ContentIndexStore(Path(kg_dir)), registry)
+    with _INDEXES_LOCK:
+        cached = _INDEXES.get(str(Path(kg_dir).resolve()))
+    if cached is not None and cached[0] == version:
+        idx = cached[1]
+    else:
+        idx = warm_retrieval_index(kg_dir, registry)
+    return idx, any(idx.has_content)
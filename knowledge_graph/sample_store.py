@@ -0,0 +1,112 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, Iterable, Optional
+import hashlib
+import os
+import re
+import uuid
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+
+@dataclass
+class SampleStore:
+    """
+    Per-table sample rows as Parquet files:
+      <base_dir>/samples/<table_key>-<hash>.parquet
+
+    The schema only keeps a small reference ({"path", "rows", "columns"}, path
+    relative to base_dir); rows are read when a view or agent asks for them.
+    """
+
+    base_dir: Path
+
+    @property
+    def root(self) -> Path:
+        return self.base_dir / "samples"
+
+    def path_for(self, table_key: str) -> Path:
+        safe = re.sub(r"[^A-Za-z0-9_.-]+", "_", table_key)[:80]
+        digest = hashlib.sha1(table_key.encode("utf-8")).hexdigest()[:8]
+        return self.root / f"{safe}-{digest}.parquet"
+
+    def save(self, table_key: str, df: pd.DataFrame) -> Optional[Dict[str, Any]]:
+        """
+        Writes the sample (atomically) and returns its reference, or None for a sample without columns.
+        """
+        if df is None or len(df.columns) == 0:
+            self.delete([table_key])
+            return None
+        path = self.path_for(table_key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f".{path.name}.{uuid.uuid4().hex[:8]}.tmp")
+        try:
+            pq.write_table(_to_arrow(df), tmp)
+            os.replace(tmp, path)
+        finally:
+            if tmp.exists():
+                tmp.unlink()
+        return {
+            "path": path.relative_to(self.base_dir).as_posix(),
+            "rows": int(len(df)),
+            "columns": [str(c) for c in df.columns],
+        }
+
+    def load(self, ref: Dict[str, Any], limit: Optional[int] = None) -> pd.DataFrame:
+        path = self.base_dir / str(ref.get("path", ""))
+        if not ref.get("path") or not path.exists():
+            return pd.DataFrame()
+        if limit is None:
+            return pd.read_parquet(path)
+        # read only the row groups needed for `limit` rows
+        pf = pq.ParquetFile(path)
+        batches = []
+        remaining = int(limit)
+        for batch in pf.iter_batches(batch_size=max(1, min(remaining, 65536))):
+            batches.append(batch.slice(0, remaining))
+            remaining -= batches[-1].num_rows
+            if remaining <= 0:
+                break
+        if not batches:
+            return pf.schema_arrow.empty_table().to_pandas()
+        return pa.Table.from_batches(batches).to_pandas()
+
+    def delete(self, table_keys: Iterable[str]) -> int:
+        removed = 0
+        for key in table_keys:
+            path = self.path_for(key)
+            if path.exists():
+                path.unlink()
+                removed += 1
+        return removed
+
+    def prune(self, keep_table_keys: Iterable[str]) -> int:
+        """
+        Deletes sample files of tables that are no longer in the schema.
+        """
+        if not self.root.exists():
+            return 0
+        keep = {self.path_for(k).name for k in keep_table_keys}
+        removed = 0
+        for path in self.root.glob("*.parquet"):
+            if path.name not in keep:
+                path.unlink()
+                removed += 1
+        return removed
+
+
+def _to_arrow(df: pd.DataFrame) -> pa.Table:
+    df = df.copy()
+    df.columns = [str(c) for c in df.columns]
+    try:
+        return pa.Table.from_pandas(df, preserve_index=False)
+    except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError):
+        # mixed-type object columns (e.g. sql_variant) → keep them as text
+        for c in df.columns:
+            if df[c].dtype == object:
+                df[c] = df[c].where(df[c].isna(), df[c].astype(str))
+        return pa.Table.from_pandas(df, preserve_index=False)
@@ -1,40 +1,180 @@
 from __future__ import annotations
 
-from typing import Any, Dict, List, Optional, Tuple
+from dataclasses import dataclass, field
+from typing import Any, Dict, FrozenSet, List, Optional, Tuple
 from pathlib import Path
+import hashlib
 import json
+import os
+import threading
+
+from knowledge_graph.metadata_db import MetadataDB
+
+
+@dataclass
+class _RegistrySnapshot:
+    """
+    Parsed registry + lookup indexes, built once per file version.
+    """
+
+    data: Dict[str, Any]
+    version: str
+    stat_key: Tuple[int, int]  # (mtime_ns, size)
+    columns: Dict[str, List[str]] = field(default_factory=dict)
+    column_sets: Dict[str, FrozenSet[str]] = field(default_factory=dict)
+    columns_ci: Dict[str, Dict[str, str]] = field(default_factory=dict)
+    column_types: Dict[Tuple[str, str], str] = field(default_factory=dict)
+
+    @classmethod
+    def build(cls, data: Dict[str, Any], version: str, stat_key: Tuple[int, int]) -> "_RegistrySnapshot":
+        snap = cls(data=data, version=version, stat_key=stat_key)
+        for key, t in (data.get("tables") or {}).items():
+            cols = [c["name"] for c in (t or {}).get("columns", [])]
+            for c in (t or {}).get("columns", []):
+                snap.column_types.setdefault((key, c["name"]), str(c.get("type") or ""))
+            snap.columns[key] = cols
+            snap.column_sets[key] = frozenset(cols)
+            ci: Dict[str, str] = {}
+            for c in cols:
+                ci.setdefault(c.lower(), c)  # first match wins, like the linear scan did
+            snap.columns_ci[key] = ci
+        return snap
+
+
+_EMPTY = _RegistrySnapshot.build({"tables": {}}, version="empty", stat_key=(0, 0))
+
+# Process-wide: every SchemaRegistry on the same file shares one parsed snapshot.
+_SNAPSHOTS: Dict[str, _RegistrySnapshot] = {}
+_SNAPSHOTS_LOCK = threading.Lock()
 
 
 class SchemaRegistry:
     """
     Local registry derived from DB introspection.
     Used to validate that planner/sql-agent never invents names.
+
+    The registry is parsed once per change (mtime/size, then content version)
+    into a process-wide snapshot with per-table column indexes; lookups never
+    touch disk.
+
+    backend="sqlite" (default) keeps it in <kg_dir>/metadata.sqlite next to the
+    schema (see MetadataDB); an existing schema_registry.json is imported on
+    first use. backend="json" is the legacy single-file document.
     """
 
-    def __init__(self, kg_dir: str):
+    def __init__(self, kg_dir: str, backend: str = "sqlite"):
         self.kg_dir = Path(kg_dir)
         self.path = self.kg_dir / "schema_registry.json"
+        self.backend = (backend or "sqlite").lower()
+        self.db: Optional[MetadataDB] = None
+        if self.backend == "sqlite":
+            self.db = MetadataDB(self.kg_dir / "metadata.sqlite")
+            self.db.migrate_json("registry", self.path)
+
+    @property
+    def _source(self) -> Path:
+        return self.db.path if self.db is not None else self.path
+
+    # -------------------------
+    # Snapshot management
+    # -------------------------
+    def _snapshot(self) -> _RegistrySnapshot:
+        cache_key = str(self._source.resolve())
+        try:
+            st = self._source.stat()
+        except FileNotFoundError:
+            with _SNAPSHOTS_LOCK:
+                _SNAPSHOTS.pop(cache_key, None)
+            return _EMPTY
+        stat_key = (st.st_mtime_ns, st.st_size)
+
+        with _SNAPSHOTS_LOCK:
+            snap = _SNAPSHOTS.get(cache_key)
+        if snap is not None and snap.stat_key == stat_key:
+            return snap
+
+        if self.db is not None:
+            meta = self.db.meta("registry")
+            if meta is None:
+                return _EMPTY
+            version = str(meta.get("version"))
+        else:
+            raw = self.path.read_bytes()
+            version = hashlib.sha256(raw).hexdigest()[:16]
+        if snap is not None and snap.version == version:
+            snap.stat_key = stat_key  # touched (or another kind written), not changed
+            return snap
+
+        data = self.db.load("registry") if self.db is not None else json.loads(raw.decode("utf-8"))
+        snap = _RegistrySnapshot.build(data or {"tables": {}}, version, stat_key)
+        with _SNAPSHOTS_LOCK:
+            _SNAPSHOTS[cache_key] = snap
+        return snap
+
+    def version(self) -> str:
+        """
+        Content hash of the current registry (changes whenever it is rewritten with new content).
+        """
+        return self._snapshot().version
 
     def load(self) -> Dict[str, Any]:
-        if not self.path.exists():
-            return {"tables": {}}
-        return json.loads(self.path.read_text(encoding="utf-8"))
+        """
+        Returns the parsed registry. The dict is shared process-wide: treat it
+        as read-only (build a new dict and save() it to change the registry).
+        """
+        return self._snapshot().data
 
     def save(self, registry: Dict[str, Any]) -> None:
-        self.path.write_text(json.dumps(registry, indent=2), encoding="utf-8")
+        self.kg_dir.mkdir(parents=True, exist_ok=True)
+        if self.db is not None:
+            self.db.replace("registry", registry)
+        else:
+            raw = json.dumps(registry, indent=2)
+            tmp = self.path.with_name(f".{self.path.name}.{os.getpid()}.tmp")
+            tmp.write_text(raw, encoding="utf-8")
+            os.replace(tmp, self.path)
+        # drop the cached snapshot; the next read re-parses what was actually written
+        with _SNAPSHOTS_LOCK:
+            _SNAPSHOTS.pop(str(self._source.resolve()), None)
+
+    def export_json(self, path: Optional[str] = None) -> Path:
+        target = Path(path) if path else self.path
+        if self.db is not None:
+            return self.db.export_json("registry", target)
+        if target != self.path:
+            target.write_text(self.path.read_text(encoding="utf-8"), encoding="utf-8")
+        return target
+
+    def import_json(self, path: Optional[str] = None) -> bool:
+        source = Path(path) if path else self.path
+        if not source.exists():
+            return False
+        self.save(json.loads(source.read_text(encoding="utf-8")))
+        return True
 
+    # -------------------------
+    # Lookups (indexed)
+    # -------------------------
     def list_tables(self) -> List[str]:
-        reg = self.load()
-        return sorted(reg.get("tables", {}).keys())
+        return sorted(self._snapshot().columns.keys())
 
     def table_columns(self, table_key: str) -> List[str]:
-        reg = self.load()
-        t = reg.get("tables", {}).get(table_key, {})
-        return [c["name"] for c in t.get("columns", [])]
+        return list(self._snapshot().columns.get(table_key, []))
 
     def has_table(self, table_key: str) -> bool:
-        return table_key in self.load().get("tables", {})
+        return table_key in self._snapshot().columns
 
     def has_column(self, table_key: str, col: str) -> bool:
-        cols = set(self.table_columns(table_key))
-        return col in cols
+        return col in self._snapshot().column_sets.get(table_key, frozenset())
+
+    def column_type(self, table_key: str, col: str) -> str:
+        """
+        Registry type name of an exact column ("" when unknown).
+        """
+        return self._snapshot().column_types.get((table_key, col), "")
+
+    def resolve_column(self, table_key: str, name: str) -> Optional[str]:
+        """
+        Case-insensitive column lookup: returns the registry's spelling or None.
+        """
+        return self._snapshot().columns_ci.get(table_key, {}).get((name or "").lower())
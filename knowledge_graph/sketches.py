@@ -0,0 +1,138 @@
+from __future__ import annotations
+
+from typing import Any, Dict, Hashable, List, Tuple
+import hashlib
+import heapq
+import math
+
+import numpy as np
+
+
+def _hash64(value: str) -> int:
+    # stable across processes (unlike hash()), so profiles are reproducible
+    return int.from_bytes(hashlib.blake2b(value.encode("utf-8", errors="ignore"), digest_size=8).digest(), "big")
+
+
+class HyperLogLog:
+    """
+    Distinct-count sketch: 2^p one-byte registers, relative standard error
+    ~1.04 / sqrt(2^p) (p=12 → 4 KB, ~1.6%). Adding a value twice is a no-op,
+    so callers may feed pre-deduplicated batches.
+    """
+
+    def __init__(self, p: int = 12):
+        if not 4 <= p <= 16:
+            raise ValueError("HyperLogLog precision p must be in [4, 16]")
+        self.p = p
+        self.m = 1 << p
+        self.registers = bytearray(self.m)
+
+    @property
+    def relative_error(self) -> float:
+        return 1.04 / math.sqrt(self.m)
+
+    def add(self, value: str) -> None:
+        h = _hash64(value)
+        idx = h >> (64 - self.p)
+        w = (h << self.p) & 0xFFFFFFFFFFFFFFFF
+        rank = min(64 - self.p, 64 - w.bit_length()) + 1
+        if rank > self.registers[idx]:
+            self.registers[idx] = rank
+
+    def merge(self, other: "HyperLogLog") -> None:
+        if other.p != self.p:
+            raise ValueError("cannot merge HyperLogLog sketches with different precision")
+        self.registers = bytearray(max(a, b) for a, b in zip(self.registers, other.registers))
+
+    def estimate(self) -> float:
+        m = self.m
+        alpha = 0.7213 / (1 + 1.079 / m) if m >= 128 else {16: 0.673, 32: 0.697, 64: 0.709}[m]
+        raw = alpha * m * m / sum(2.0 ** -r for r in self.registers)
+        zeros = self.registers.count(0)
+        if raw <= 2.5 * m and zeros:
+            # small-range correction (linear counting)
+            return m * math.log(m / zeros)
+        return raw
+
+
+class SpaceSaving:
+    """
+    Heavy-hitters sketch (Metwally et al.) keeping at most `capacity` counters.
+    For every reported item: count - error <= true count <= count, and any
+    item with true frequency > total / capacity is guaranteed to be present.
+    Supports weighted updates (pre-aggregated batches).
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = max(1, int(capacity))
+        self.counts: Dict[Hashable, int] = {}
+        self.errors: Dict[Hashable, int] = {}
+        self.total = 0
+        self._heap: List[Tuple[int, int, Hashable]] = []  # (count, tiebreak, item), lazily invalidated
+        self._tick = 0
+
+    def update(self, item: Hashable, weight: int = 1) -> None:
+        self.total += weight
+        if item in self.counts:
+            self.counts[item] += weight
+            self._push(item)
+            return
+        if len(self.counts) < self.capacity:
+            self.counts[item] = weight
+            self.errors[item] = 0
+            self._push(item)
+            return
+        # evict the current minimum; the newcomer inherits its count as error
+        while True:
+            count, _, victim = heapq.heappop(self._heap)
+            if self.counts.get(victim) == count:
+                break
+        del self.counts[victim]
+        del self.errors[victim]
+        self.counts[item] = count + weight
+        self.errors[item] = count
+        self._push(item)
+
+    def _push(self, item: Hashable) -> None:
+        self._tick += 1
+        heapq.heappush(self._heap, (self.counts[item], self._tick, item))
+        if len(self._heap) > 4 * self.capacity:
+            # drop stale heap entries
+            self._heap = [(c, t, i) for c, t, i in self._heap if self.counts.get(i) == c]
+            heapq.heapify(self._heap)
+
+    def top(self, n: int) -> List[Dict[str, Any]]:
+        items = sorted(self.counts.items(), key=lambda kv: (-kv[1], str(kv[0])))[: int(n)]
+        return [{"value": k, "count": c, "error": self.errors[k]} for k, c in items]
+
+
+class ReservoirSample:
+    """
+    Uniform sample of at most `capacity` numbers from a stream (Algorithm R,
+    vectorized per batch). Seeded, so profiles are reproducible. Used for
+    equi-depth histograms: quantiles of the reservoir estimate the stream's.
+    """
+
+    def __init__(self, capacity: int, seed: int = 7):
+        self.capacity = max(1, int(capacity))
+        self.values = np.empty(0, dtype=np.float64)
+        self.seen = 0
+        self._rng = np.random.default_rng(seed)
+
+    def add_many(self, values: np.ndarray) -> None:
+        values = np.asarray(values, dtype=np.float64)
+        room = self.capacity - len(self.values)
+        if room > 0:
+            self.values = np.concatenate([self.values, values[:room]])
+            self.seen += min(room, len(values))
+            values = values[room:]
+        if len(values) == 0:
+            return
+        # item i (1-based stream position) replaces a random slot with probability capacity / i
+        positions = self.seen + np.arange(1, len(values) + 1)
+        slots = (self._rng.random(len(values)) * positions).astype(np.int64)
+        idx = np.nonzero(slots < self.capacity)[0][::-1]
+        _, last = np.unique(slots[idx], return_index=True)  # later stream items win a repeated slot
+        pick = idx[last]
+        self.values[slots[pick]] = values[pick]
+        self.seen += len(values)
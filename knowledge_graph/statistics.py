@@ -0,0 +1,419 @@
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+import math
+
+import numpy as np
+import pandas as pd
+
+from knowledge_graph.schema_registry import SchemaRegistry
+
+# Selectivities used when a column has no statistics (same spirit as the
+# defaults of cost-based optimizers: equality is rare, a range keeps a third).
+DEFAULT_EQ_SEL = 0.005
+DEFAULT_RANGE_SEL = 1.0 / 3.0
+DEFAULT_LIKE_SEL = 0.05
+
+NUMERIC_TYPE_HINTS = ("int", "decimal", "numeric", "float", "real", "money")
+DATE_TYPE_HINTS = ("date", "time")
+
+# periods per year for time_grain group-bys
+_GRAIN_PER_DAY = {"day": 1.0, "week": 1 / 7.0, "month": 12 / 365.25, "quarter": 4 / 365.25, "year": 1 / 365.25}
+
+
+def column_kind(ctype: str) -> Optional[str]:
+    """
+    "numeric" / "date" for histogram-able column types, else None.
+    """
+    ctype = (ctype or "").lower()
+    if any(x in ctype for x in DATE_TYPE_HINTS):
+        return "date"
+    if any(x in ctype for x in NUMERIC_TYPE_HINTS):
+        return "numeric"
+    return None
+
+
+def _to_number(value: Any, kind: Optional[str]) -> Optional[float]:
+    """
+    Histogram axis: floats for numeric columns, epoch nanoseconds for dates.
+    """
+    if value is None:
+        return None
+    try:
+        if kind == "date":
+            ts = pd.Timestamp(value)
+            return None if ts is pd.NaT else float(ts.value)
+        out = float(value)
+        return None if math.isnan(out) else out
+    except (TypeError, ValueError):
+        return None
+
+
+def _from_number(value: float, kind: str) -> Any:
+    return pd.Timestamp(int(value)).isoformat() if kind == "date" else float(value)
+
+
+def _plain(value: Any) -> Any:
+    if isinstance(value, (pd.Timestamp,)) or hasattr(value, "isoformat"):
+        return value.isoformat()
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+def equi_depth_bounds(
+    values: np.ndarray, kind: str, buckets: int, lo: Any = None, hi: Any = None
+) -> List[Any]:
+    """
+    buckets + 1 bounds with the same share of `values` between neighbours,
+    the outer ones widened to lo / hi (exact min / max) when given.
+    values are on the histogram axis (see _to_number).
+    """
+    vals = np.asarray(values, dtype=float)
+    k = max(1, min(int(buckets), len(vals)))
+    bounds = np.quantile(vals, np.linspace(0.0, 1.0, k + 1))
+    lo_n, hi_n = _to_number(lo, kind), _to_number(hi, kind)
+    if lo_n is not None:
+        bounds[0] = min(bounds[0], lo_n)
+    if hi_n is not None:
+        bounds[-1] = max(bounds[-1], hi_n)
+    return [_from_number(b, kind) for b in bounds]
+
+
+def _widen_bounds(bounds: List[Any], kind: Optional[str], lo: Any, hi: Any) -> List[Any]:
+    """
+    Outer histogram bounds stretched to the column's min / max (a reservoir
+    rarely holds the extremes); bounds are left alone when the types don't convert.
+    """
+    first, last = _to_number(bounds[0], kind), _to_number(bounds[-1], kind)
+    lo_n, hi_n = _to_number(lo, kind), _to_number(hi, kind)
+    if None in (first, last, kind):
+        return list(bounds)
+    out = list(bounds)
+    if lo_n is not None and lo_n < first:
+        out[0] = _from_number(lo_n, kind)
+    if hi_n is not None and hi_n > last:
+        out[-1] = _from_number(hi_n, kind)
+    return out
+
+
+def estimate_ndv(counts: pd.Series, total_non_null: float) -> float:
+    """
+    Distinct values of a column from a sample's value counts (Haas & Stokes
+    Duj1): n*d / (n - f1 + f1*n/N), where f1 = values seen exactly once.
+    Sample distincts are a lower bound, the non-null row count an upper one.
+    """
+    n = float(counts.sum())
+    d = float(len(counts))
+    if n <= 0:
+        return 0.0
+    if total_non_null <= n:
+        return d
+    f1 = float((counts == 1).sum())
+    est = n * d / (n - f1 + f1 * n / total_non_null)
+    return min(max(est, d), total_non_null)
+
+
+# -----------------------------
+# Collection (schema refresh)
+# -----------------------------
+def build_column_stats(
+    sample_df: Optional[pd.DataFrame],
+    columns: Sequence[Tuple[str, str]],
+    row_count: int,
+    column_results: Optional[Dict[str, Any]] = None,
+    primary_key: Sequence[str] = (),
+    top_values_limit: Optional[int] = None,
+    buckets: int = 32,
+    mcv_count: int = 20,
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Per-column statistics for one table, from what a refresh already read
+    (no extra scans): the sample rows plus the profiling results
+    (NULL counts, MIN/MAX, top values).
+
+    columns = [(name, type_name), ...]. For each column:
+    - null_frac: profiled NULL count / row_count, else from the sample
+    - ndv: row_count for a single-column PK; the exact distinct count when the
+      top-values profile returned fewer than top_values_limit values; otherwise
+      Duj1 over the sample
+    - min / max: profiled when available, else the sample's
+    - histogram (numeric/date): the profiler's (equi-depth over a uniform
+      reservoir of its bounded sample scan, exact and approximate mode), outer
+      bounds widened to the profiled min / max; else equi-depth over the
+      sample rows only when they are the whole table. A TOP (n) prefix of a
+      larger table is not uniform (clustered by date, it covers the first
+      days only), so such columns get no histogram and range predicates
+      fall back to DEFAULT_RANGE_SEL
+    - mcv: most common values with their fraction of all rows (top values)
+    Columns with neither sample values nor profile results are left out.
+    """
+    column_results = column_results or {}
+    rows = max(0, int(row_count or 0))
+    sample = sample_df if sample_df is not None else pd.DataFrame()
+    pk = list(primary_key or [])
+    out: Dict[str, Dict[str, Any]] = {}
+
+    for name, ctype in columns:
+        res = column_results.get(name) or {}
+        s = sample[name] if name in sample.columns else None
+        if s is None and not res and not (len(pk) == 1 and pk[0] == name):
+            continue
+        kind = column_kind(ctype)
+        non_null = s.dropna() if s is not None else pd.Series(dtype=object)
+        n = len(s) if s is not None else 0
+
+        if res.get("null_count") is not None and rows:
+            null_frac = min(1.0, float(res["null_count"]) / rows)
+        elif n:
+            null_frac = (n - len(non_null)) / float(n)
+        else:
+            null_frac = 0.0
+        total_non_null = max(rows * (1.0 - null_frac), float(len(non_null)))
+
+        tv = res.get("top_values") or []
+        distinct = res.get("distinct_estimate") or {}
+        if len(pk) == 1 and pk[0] == name:
+            ndv: Optional[float] = float(rows)
+        elif tv and not res.get("approx") and top_values_limit and len(tv) < int(top_values_limit):
+            ndv = float(len(tv))  # the top-values scan saw every distinct value
+        elif distinct.get("high_cardinality"):
+            ndv = total_non_null
+        elif len(non_null):
+            ndv = estimate_ndv(non_null.astype(str).value_counts(), total_non_null)
+        else:
+            ndv = None
+
+        stats: Dict[str, Any] = {"null_frac": round(null_frac, 6), "ndv": None if ndv is None else max(1, int(round(ndv)))}
+
+        lo = hi = None
+        if isinstance(res.get("minmax"), dict):
+            lo, hi = res["minmax"].get("min"), res["minmax"].get("max")
+        if kind and len(non_null) and (lo is None or hi is None):
+            try:
+                lo = non_null.min() if lo is None else lo
+                hi = non_null.max() if hi is None else hi
+            except TypeError:
+                pass
+        if lo is not None or hi is not None:
+            stats["min"], stats["max"] = _plain(lo), _plain(hi)
+
+        hist = res.get("histogram")
+        if isinstance(hist, dict) and len(hist.get("bounds") or []) >= 2:
+            # built by the profiler from its sample-scan reservoir
+            stats["histogram"] = {**hist, "bounds": _widen_bounds(hist["bounds"], hist.get("kind") or kind, lo, hi)}
+        elif kind and rows and n >= rows and len(non_null) >= 2:
+            # the sample is a TOP (n) prefix: only trusted when it is the whole table
+            vals = np.array([v for v in (_to_number(x, kind) for x in non_null.tolist()) if v is not None], dtype=float)
+            if len(vals) >= 2:
+                stats["histogram"] = {"kind": kind, "bounds": equi_depth_bounds(vals, kind, buckets, lo, hi)}
+
+        if tv and rows:
+            stats["mcv"] = [
+                {"value": str(r.get("value")), "frac": round(min(1.0, float(r.get("cnt", 0)) / rows), 6)}
+                for r in tv[: int(mcv_count)]
+                if isinstance(r, dict)
+            ]
+        stats["sample_rows"] = n
+        out[name] = stats
+    return out
+
+
+# -----------------------------
+# Estimation (planning)
+# -----------------------------
+@dataclass
+class CardinalityEstimator:
+    """
+    Row-count estimates for a plan from the column statistics catalog
+    (schema entries' "column_stats") and registry row counts.
+
+    Standard textbook model: predicates are independent, equality uses the
+    MCV list or 1/ndv, ranges interpolate inside equi-depth histogram
+    buckets, an equi-join keeps |L|*|R| / max(ndv_l, ndv_r) rows and a
+    group-by returns min(input rows, product of the key ndvs).
+    Columns without statistics fall back to DEFAULT_*_SEL.
+    """
+
+    registry: SchemaRegistry
+    stats: Dict[str, Dict[str, Any]] = field(default_factory=dict)  # table -> column -> stats
+
+    @classmethod
+    def for_tables(cls, kg: Any, registry: SchemaRegistry, tables: Iterable[str]) -> "CardinalityEstimator":
+        """
+        Loads column_stats for `tables` only (point lookups on the knowledge graph store).
+        """
+        stats = {t: ((kg.get_table(t) or {}).get("column_stats") or {}) for t in dict.fromkeys(tables)}
+        return cls(registry=registry, stats=stats)
+
+    # -------------------------
+    # Lookups
+    # -------------------------
+    def row_count(self, table: str) -> int:
+        return int(((self.registry.load().get("tables") or {}).get(table) or {}).get("row_count", 0) or 0)
+
+    def column(self, table: str, column: str) -> Dict[str, Any]:
+        return (self.stats.get(table) or {}).get(column) or {}
+
+    def locate(self, field_name: Any, tables: Sequence[str]) -> Optional[Tuple[str, str]]:
+        """
+        (table, column) for a plan field: "schema.table.col" or a bare column
+        name looked up in plan-table order (case-insensitive).
+        """
+        name = str(field_name or "").strip().strip("[]")
+        if not name:
+            return None
+        if name.count(".") >= 2:
+            tkey, _, col = name.rpartition(".")
+            if tkey in tables:
+                hit = self.registry.resolve_column(tkey, col)
+                return (tkey, hit) if hit else None
+        for t in tables:
+            hit = self.registry.resolve_column(t, name)
+            if hit:
+                return t, hit
+        return None
+
+    def ndv(self, table: str, column: str) -> float:
+        st = self.column(table, column)
+        if st.get("ndv"):
+            return float(st["ndv"])
+        return max(1.0, float(self.row_count(table)))  # unknown: assume unique (a join then keeps the larger side)
+
+    # -------------------------
+    # Selectivity
+    # -------------------------
+    def selectivity(self, table: str, column: str, op: str, value: Any) -> float:
+        st = self.column(table, column)
+        op = (op or "=").strip().lower()
+        if op == "in":
+            values = value if isinstance(value, list) else [value]
+            return min(1.0, sum(self._eq_sel(st, v) for v in values))
+        if op == "=":
+            return self._eq_sel(st, value)
+        if op in {"!=", "<>"}:
+            return max(0.0, 1.0 - float(st.get("null_frac", 0.0)) - self._eq_sel(st, value))
+        if op == "like":
+            text = str(value or "")
+            return self._eq_sel(st, text) if "%" not in text and "_" not in text else DEFAULT_LIKE_SEL
+        if op in {"<", "<=", ">", ">="}:
+            below = self._fraction_below(st, value)
+            if below is None:
+                return DEFAULT_RANGE_SEL
+            non_null = 1.0 - float(st.get("null_frac", 0.0))
+            return non_null * (below if op in {"<", "<="} else 1.0 - below)
+        return DEFAULT_EQ_SEL
+
+    def _eq_sel(self, st: Dict[str, Any], value: Any) -> float:
+        if not st.get("ndv"):
+            return DEFAULT_EQ_SEL
+        non_null = 1.0 - float(st.get("null_frac", 0.0))
+        mcv = st.get("mcv") or []
+        for m in mcv:
+            if m.get("value") == str(value):
+                return float(m.get("frac", 0.0))
+        rest = max(0.0, non_null - sum(float(m.get("frac", 0.0)) for m in mcv))
+        return rest / max(1.0, float(st["ndv"]) - len(mcv))
+
+    def _fraction_below(self, st: Dict[str, Any], value: Any) -> Optional[float]:
+        """
+        Fraction of non-null values below `value`, interpolated within the
+        equi-depth bucket that contains it.
+        """
+        hist = st.get("histogram") or {}
+        kind = hist.get("kind")
+        bounds = [_to_number(b, kind) for b in hist.get("bounds") or []]
+        x = _to_number(value, kind)
+        if len(bounds) < 2 or x is None or any(b is None for b in bounds):
+            return None
+        k = len(bounds) - 1
+        if x <= bounds[0]:
+            return 0.0
+        if x >= bounds[-1]:
+            return 1.0
+        i = int(np.searchsorted(bounds, x, side="right")) - 1
+        lo, hi = bounds[i], bounds[i + 1]
+        within = (x - lo) / (hi - lo) if hi > lo else 1.0
+        return (i + within) / k
+
+    # -------------------------
+    # Plan estimate
+    # -------------------------
+    def estimate(self, plan: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        {"scan_rows", "join_rows", "result_rows", "work_rows", "tables": {t: {"rows", "filtered_rows"}}, "stats_coverage"}
+        work_rows = rows read + intermediate join rows, the number cost risk is judged on.
+        """
+        tables = [t for t in plan.get("tables", []) or [] if isinstance(t, str)]
+        if not tables:
+            return {"scan_rows": 0, "join_rows": 0, "result_rows": 0, "work_rows": 0, "tables": {}, "stats_coverage": 0.0}
+
+        rows = {t: float(self.row_count(t)) for t in tables}
+        sel = {t: 1.0 for t in tables}
+        used: List[bool] = []
+
+        for f in plan.get("filters", []) or []:
+            if not isinstance(f, dict):
+                continue
+            hit = self.locate(f.get("field"), tables)
+            if not hit:
+                continue
+            used.append(bool(self.column(*hit)))
+            sel[hit[0]] *= self.selectivity(hit[0], hit[1], str(f.get("op", "=")), f.get("value"))
+        filtered = {t: rows[t] * sel[t] for t in tables}
+
+        # joins in plan order (join-graph completed: left side already joined)
+        current = filtered[tables[0]]
+        intermediate = 0.0
+        joined = {tables[0]}
+        for j in plan.get("joins", []) or []:
+            if not isinstance(j, dict):
+                continue
+            lt, rt = j.get("left_table"), j.get("right_table")
+            if lt not in rows or rt not in rows or rt in joined:
+                continue
+            used.extend([bool(self.column(lt, j.get("left_key", ""))), bool(self.column(rt, j.get("right_key", "")))])
+            ndv_l = min(self.ndv(lt, j.get("left_key", "")), max(1.0, filtered[lt]))
+            ndv_r = min(self.ndv(rt, j.get("right_key", "")), max(1.0, filtered[rt]))
+            out = current * filtered[rt] / max(ndv_l, ndv_r, 1.0)
+            if str(j.get("join_type") or "LEFT").upper() in {"LEFT", "FULL"}:
+                out = max(out, current)
+            current = out
+            intermediate += out
+            joined.add(rt)
+
+        result = current
+        metrics = plan.get("metrics") or []
+        dims = [d for d in plan.get("dimensions") or [] if isinstance(d, str)]
+        if metrics:
+            groups = 1.0
+            for d in dims:
+                hit = self.locate(d, tables)
+                if hit:
+                    used.append(bool(self.column(*hit)))
+                    groups *= self.ndv(*hit)
+            groups *= self._time_buckets(plan, tables)
+            result = min(current, groups) if (dims or plan.get("time_field")) else min(current, 1.0)
+
+        scan = sum(rows.values())
+        return {
+            "scan_rows": int(scan),
+            "join_rows": int(round(intermediate)),
+            "result_rows": int(round(result)),
+            "work_rows": int(round(scan + intermediate)),
+            "tables": {t: {"rows": int(rows[t]), "filtered_rows": int(round(filtered[t]))} for t in tables},
+            "stats_coverage": round(sum(used) / len(used), 3) if used else 0.0,
+        }
+
+    def _time_buckets(self, plan: Dict[str, Any], tables: Sequence[str]) -> float:
+        grain = str(plan.get("time_grain") or "").lower()
+        hit = self.locate(plan.get("time_field"), tables) if plan.get("time_field") else None
+        if not hit:
+            return 1.0
+        st = self.column(*hit)
+        lo, hi = _to_number(st.get("min"), "date"), _to_number(st.get("max"), "date")
+        if grain not in _GRAIN_PER_DAY or lo is None or hi is None:
+            return self.ndv(*hit)
+        days = max(0.0, (hi - lo) / 86_400e9)
+        return max(1.0, math.ceil(days * _GRAIN_PER_DAY[grain]) + 1.0)
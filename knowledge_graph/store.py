@@ -1,23 +1,44 @@
 from __future__ import annotations
 
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, Iterable, List, Optional
 from pathlib import Path
 import json
 import time
+
+import pandas as pd
+
 from utils.json_sanitize import json_sanitize
+from knowledge_graph.metadata_db import MetadataDB
+from knowledge_graph.sample_store import SampleStore
 
 class KnowledgeGraphStore:
     """
-    Simple JSON-based knowledge graph store:
-    - schema.json: tables, columns, stats, pk/fk hints
+    Knowledge graph store:
+    - schema: tables, columns, stats, pk/fk hints
+
+    backend="sqlite" (default): one row per table in <base>/metadata.sqlite, so
+    has_table / get_table / list_tables do not load the whole schema. An existing
+    schema.json is imported on first use and export_json() writes it back.
+    backend="json": legacy single schema.json document.
+
+    Sample rows live in per-table Parquet files (see SampleStore); table
+    entries carry a "sample_ref" and load_sample() reads the rows on demand.
     """
 
-    def __init__(self, base_dir: str):
+    def __init__(self, base_dir: str, backend: str = "sqlite"):
         self.base = Path(base_dir)
         self.base.mkdir(parents=True, exist_ok=True)
         self.schema_path = self.base / "schema.json"
+        self.backend = (backend or "sqlite").lower()
+        self.samples = SampleStore(self.base)
+        self.db: Optional[MetadataDB] = None
+        if self.backend == "sqlite":
+            self.db = MetadataDB(self.base / "metadata.sqlite")
+            self.db.migrate_json("schema", self.schema_path)
 
     def load_schema(self) -> Dict[str, Any]:
+        if self.db is not None:
+            return self.db.load("schema") or {"updated_at": None, "tables": {}}
         if not self.schema_path.exists():
             return {"updated_at": None, "tables": {}}
         return json.loads(self.schema_path.read_text(encoding="utf-8"))
@@ -25,4 +46,66 @@ class KnowledgeGraphStore:
     def save_schema(self, schema: Dict[str, Any]) -> None:
         schema = dict(schema)
         schema["updated_at"] = int(time.time())
+        if self.db is not None:
+            self.db.replace("schema", schema)
+            return
         self.schema_path.write_text(json.dumps(schema, indent=2, default=json_sanitize), encoding="utf-8")
+
+    # -------------------------
+    # Point lookups
+    # -------------------------
+    def list_tables(self) -> List[str]:
+        if self.db is not None:
+            return self.db.keys("schema")
+        return list(self.load_schema().get("tables", {}).keys())
+
+    def get_table(self, table_key: str) -> Optional[Dict[str, Any]]:
+        if self.db is not None:
+            return self.db.get("schema", table_key)
+        return self.load_schema().get("tables", {}).get(table_key)
+
+    def has_table(self, table_key: str) -> bool:
+        if self.db is not None:
+            return self.db.has("schema", table_key)
+        return table_key in self.load_schema().get("tables", {})
+
+    def has_schema(self) -> bool:
+        if self.db is not None:
+            return self.db.count("schema") > 0
+        return bool(self.load_schema().get("tables"))
+
+    # -------------------------
+    # Samples (Parquet, loaded lazily)
+    # -------------------------
+    def save_sample(self, table_key: str, df: pd.DataFrame) -> Optional[Dict[str, Any]]:
+        return self.samples.save(table_key, df)
+
+    def load_sample(self, table_key: str, limit: Optional[int] = None) -> pd.DataFrame:
+        t = self.get_table(table_key) or {}
+        if t.get("sample_ref"):
+            return self.samples.load(t["sample_ref"], limit=limit)
+        rows = t.get("sample") or []  # entries written before samples moved to Parquet
+        return pd.DataFrame(rows[:limit] if limit is not None else rows)
+
+    def prune_samples(self, keep_table_keys: Iterable[str]) -> int:
+        return self.samples.prune(keep_table_keys)
+
+    # -------------------------
+    # JSON import / export
+    # -------------------------
+    def export_json(self, path: Optional[str] = None) -> Path:
+        target = Path(path) if path else self.schema_path
+        if self.db is not None:
+            return self.db.export_json("schema", target)
+        if target != self.schema_path:
+            target.write_text(self.schema_path.read_text(encoding="utf-8"), encoding="utf-8")
+        return target
+
+    def import_json(self, path: Optional[str] = None) -> bool:
+        source = Path(path) if path else self.schema_path
+        if not source.exists():
+            return False
+        if self.db is not None:
+            return self.db.import_json("schema", source)
+        self.save_schema(json.loads(source.read_text(encoding="utf-8")))
+        return True
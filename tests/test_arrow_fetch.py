@@ -0,0 +1,114 @@
+from __future__ import annotations
+
+from types import SimpleNamespace
+
+import pyarrow as pa
+from sqlalchemy import create_engine
+
+from db import run_sql_query, run_sql_query_arrow
+
+
+def _engine():
+    engine = create_engine("sqlite:///:memory:")
+    with engine.begin() as conn:
+        conn.exec_driver_sql("CREATE TABLE t (a INTEGER, b TEXT, c REAL)")
+        conn.exec_driver_sql("INSERT INTO t VALUES (1, 'x', 1.5), (2, NULL, NULL), (3, 'z', 2.5)")
+    return engine
+
+
+def test_arrow_fetch_batches_and_max_rows():
+    settings = SimpleNamespace(FETCH_CHUNK_SIZE=1000, SQL_FETCH_MODE="arrow")
+    engine = _engine()
+
+    table = run_sql_query_arrow(
+        sql="SELECT a, b, c FROM t ORDER BY a", params={}, timeout_seconds=10, max_rows=2,
+        settings=settings, engine=engine,
+    )
+    assert isinstance(table, pa.Table)
+    assert table.num_rows == 2
+    assert table.column("b").to_pylist() == ["x", None]
+
+    df = run_sql_query(
+        sql="SELECT a, b, c FROM t WHERE a > :x ORDER BY a", params={"x": 1}, timeout_seconds=10, max_rows=10,
+        settings=settings, engine=engine,
+    )
+    assert list(df["a"]) == [2, 3]
+
+    # empty results keep their columns
+    empty = run_sql_query(
+        sql="SELECT a, b FROM t WHERE a > 99", params={}, timeout_seconds=10, max_rows=10,
+        settings=settings, engine=engine,
+    )
+    assert empty.empty and list(empty.columns) == ["a", "b"]
+
+
+def test_snapshot_cache_streams_batches_atomically(tmp_path):
+    from cache.snapshot_cache import SnapshotCache
+
+    cache = SnapshotCache(tmp_path)
+    batches = [
+        pa.record_batch({"a": pa.array([1, 2]), "b": pa.array(["x", None])}),
+        pa.record_batch({"a": pa.array([3]), "b": pa.array(["z"])}),
+    ]
+    handle = cache.put_batches("k", iter(batches))
+    assert handle.num_rows == 3 and handle.columns == ["a", "b"]
+    assert list(handle.to_pandas()["a"]) == [1, 2, 3]
+
+    def failing():
+        yield batches[0]
+        raise RuntimeError("query interrupted")
+
+    try:
+        cache.put_batches("k2", failing())
+    except RuntimeError:
+        pass
+    # no partial entry, no temp leftovers
+    assert cache.handle("k2") is None
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["k.parquet"]
+
+
+def test_all_null_first_batch_is_unified_not_refetched(tmp_path):
+    import decimal
+
+    from cache.snapshot_cache import SnapshotCache
+    from db.arrow_fetch import arrow_type_for
+
+    # DECIMAL is typed from the cursor description, so an all-NULL block is not "null"
+    assert arrow_type_for(decimal.Decimal, 12, 2) == pa.decimal128(12, 2)
+    assert arrow_type_for(decimal.Decimal, None, None) is None
+
+    cache = SnapshotCache(tmp_path)
+    batches = [
+        pa.record_batch({"a": pa.array([1, 2]), "d": pa.array([None, None])}),  # inferred as null type
+        pa.record_batch({"a": pa.array([3]), "d": pa.array([decimal.Decimal("1.25")])}),
+    ]
+    handle = cache.put_batches("k", iter(batches))
+    assert handle.to_arrow().schema.field("d").type == pa.float64()
+    assert handle.to_pandas()["d"].tolist()[2] == 1.25
+
+    # a column that never gets a value within the probe window is stored as text
+    handle = cache.put_batches("k2", iter(batches[:1] * 3), schema_probe_rows=4)
+    assert handle.num_rows == 6 and handle.to_arrow().schema.field("d").type == pa.string()
+
+
+def test_snapshot_validation_and_head_do_not_load_the_snapshot(tmp_path):
+    from agents.data_quality_agent import DataQualityAgent
+    from cache.snapshot_cache import SnapshotCache
+
+    cache = SnapshotCache(tmp_path)
+    batches = [
+        pa.record_batch({"a": pa.array([1, 2, 1]), "b": pa.array(["x", None, "x"])}),
+        pa.record_batch({"a": pa.array([3]), "b": pa.array([None], type=pa.string())}),
+    ]
+    handle = cache.put_batches("k", iter(batches))
+
+    report = DataQualityAgent().run_snapshot(handle, expected_columns=["a", "b"])
+    assert report["ok"] and report["rows"] == 4 and report["columns"] == ["a", "b"]
+    assert report["null_rate"] == {"a": 0.0, "b": 0.5}
+    assert report["duplicate_rows"] == 1
+    # matches the in-memory report
+    assert DataQualityAgent().run(handle.to_pandas())["null_rate"] == report["null_rate"]
+
+    assert DataQualityAgent().run_snapshot(handle, expected_columns=["c"])["missing"] == ["c"]
+    assert list(handle.head(2)["a"]) == [1, 2]
+    assert len(handle.head(10)) == 4 and handle.head(0).empty
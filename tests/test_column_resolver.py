@@ -0,0 +1,96 @@
+from __future__ import annotations
+
+from agents.sql_agent import SQLAgent
+from config import Settings
+from knowledge_graph.column_resolver import ColumnResolver, derive_column_synonyms, normalize_name
+from knowledge_graph.schema_registry import SchemaRegistry
+
+
+REGISTRY = {
+    "tables": {
+        "dbo.orders": {"columns": [{"name": "OrderId"}, {"name": "CustomerName"}, {"name": "Revenues"}]},
+        "dbo.regions": {"columns": [{"name": "RegionName"}]},
+    }
+}
+
+
+def test_resolver_matches_spelling_variants_and_synonyms():
+    content = {"dbo.orders": {"column_synonyms": {"Revenues": ["sales_amount"]}}}
+    r = ColumnResolver.build(REGISTRY, content)
+
+    assert normalize_name("Customer_Name") == normalize_name("customerName") == "customername"
+    assert r.resolve("customer_name", ["dbo.orders"], 0.5)["column"] == "CustomerName"
+    assert r.resolve("revenue", ["dbo.orders"], 0.5)["column"] == "Revenues"
+    assert r.resolve("sales amount", ["dbo.orders"], 0.5)["matched"] == "sales_amount"
+    # only the plan's tables are considered, and weak matches are dropped
+    assert r.resolve("region_name", ["dbo.orders"], 0.5) is None
+    assert r.resolve("zzz", ["dbo.orders"], 0.5) is None
+
+
+def test_sql_agent_uses_fuzzy_columns_and_logs_decisions(tmp_path):
+    reg = SchemaRegistry(str(tmp_path))
+    reg.save(REGISTRY)
+    plan = {
+        "tables": ["dbo.orders"],
+        "dimensions": ["customer_name", "dbo.orders.OrderID"],
+        "metrics": [{"name": "total revenue", "agg": "sum", "field": "revenue"}],
+        "order_by": [{"field": "total revenue", "dir": "desc"}],
+    }
+    bundle = SQLAgent(Settings(), reg).generate_sql(plan, [])
+
+    assert "SUM(t0.[Revenues]) AS [total revenue]" in bundle["sql"]
+    assert "ORDER BY [total revenue] DESC" in bundle["sql"]
+    methods = {(d["hint"], d["method"], d["column"]) for d in bundle["column_resolution"]}
+    assert ("customer_name", "fuzzy", "CustomerName") in methods
+    assert ("dbo.orders.OrderID", "fuzzy", "OrderId") in methods
+    assert ("revenue", "fuzzy", "Revenues") in methods
+
+
+def test_near_miss_columns_are_not_fuzzy_matched(tmp_path):
+    reg = SchemaRegistry(str(tmp_path))
+    reg.save(
+        {
+            "tables": {
+                "dbo.sales": {
+                    "columns": [
+                        {"name": "StatusId", "type": "int"},
+                        {"name": "OrderDateKey", "type": "int"},
+                        {"name": "CustomerId", "type": "int"},
+                        {"name": "ShipDate", "type": "datetime2"},
+                        {"name": "Amount", "type": "decimal"},
+                    ]
+                }
+            }
+        }
+    )
+    r = ColumnResolver.build(reg.load(), {})
+    for hint in ("status", "order_date", "customer"):
+        assert r.resolve(hint, ["dbo.sales"], 0.5) is None, hint
+
+    plan = {
+        "tables": ["dbo.sales"],
+        "metrics": [{"name": "total", "agg": "sum", "field": "Amount"}],
+        "filters": [{"field": "amount_", "op": "=", "value": "open"}, {"field": "amounts", "op": ">", "value": 10}],
+        "time_field": "ship_dates",
+        "time_grain": "month",
+    }
+    plan_bad_time = dict(plan, time_field="amounts")
+    bundle = SQLAgent(Settings(), reg).generate_sql(plan, [])
+    methods = [(d["hint"], d["method"]) for d in bundle["column_resolution"]]
+    # text value never lands on a numeric column; a numeric one does
+    assert ("amount_", "fuzzy_rejected_type") in methods and ("amounts", "fuzzy") in methods
+    assert "t0.[Amount] > :p1" in bundle["sql"] and ":p0" not in bundle["sql"]
+    assert "[ShipDate]" in bundle["sql"]
+
+    bundle = SQLAgent(Settings(), reg).generate_sql(plan_bad_time, [])
+    assert ("amounts", "fuzzy_rejected_type") in [(d["hint"], d["method"]) for d in bundle["column_resolution"]]
+
+
+def test_refresh_derived_synonyms_resolve_abbreviations():
+    syn = derive_column_synonyms("Orders", ["OrderId", "OrderStatus", "OrderQty", "ShipDt"])
+    assert syn == {"OrderStatus": ["status"], "OrderQty": ["order_quantity", "qty", "quantity"], "ShipDt": ["ship_date"]}
+
+    registry = {"tables": {"dbo.Orders": {"columns": [{"name": c} for c in ("OrderId", "OrderStatus", "OrderQty", "ShipDt")]}}}
+    r = ColumnResolver.build(registry, {"dbo.Orders": {"column_synonyms": syn}})
+    assert r.resolve("quantity", ["dbo.Orders"], 0.5)["column"] == "OrderQty"
+    assert r.resolve("ship_date", ["dbo.Orders"], 0.5)["column"] == "ShipDt"
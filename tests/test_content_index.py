@@ -0,0 +1,36 @@
+from __future__ import annotations
+
+import json
+
+import pytest
+
+from knowledge_graph.content_index import ContentIndexStore
+
+
+def test_batch_stages_writes_and_commits_once(tmp_path, monkeypatch):
+    store = ContentIndexStore(tmp_path)
+    store.upsert_table("dbo.old", {"row_count": 1})
+
+    writes = []
+    real_write = store._write
+    monkeypatch.setattr(store, "_write", lambda obj: (writes.append(1), real_write(obj)))
+
+    with store.batch():
+        for i in range(5):
+            store.upsert_table(f"dbo.t{i}", {"row_count": i})
+        store.delete_tables(["dbo.old"])
+        # readers of the file still see the previous complete index
+        assert list(json.loads(store.path.read_text(encoding="utf-8"))["tables"]) == ["dbo.old"]
+
+    assert len(writes) == 1
+    assert sorted(store.load()["tables"]) == [f"dbo.t{i}" for i in range(5)]
+
+
+def test_failed_batch_writes_nothing(tmp_path):
+    store = ContentIndexStore(tmp_path)
+    store.upsert_table("dbo.a", {"row_count": 1})
+    with pytest.raises(RuntimeError):
+        with store.batch():
+            store.upsert_table("dbo.b", {"row_count": 2})
+            raise RuntimeError("boom")
+    assert list(store.load()["tables"]) == ["dbo.a"]
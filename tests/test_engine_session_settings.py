@@ -0,0 +1,79 @@
+from __future__ import annotations
+
+import sqlite3
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.pool import QueuePool
+
+from db.engine import SessionInitializer, is_session_managed
+
+
+def test_session_settings_applied_once_per_connection():
+    executed: list[str] = []
+    dbapi_conns: list[sqlite3.Connection] = []
+
+    def creator() -> sqlite3.Connection:
+        con = sqlite3.connect(":memory:", check_same_thread=False)
+        con.set_trace_callback(executed.append)  # sees the initializer's raw-cursor statements too
+        dbapi_conns.append(con)
+        return con
+
+    # one pooled connection, so every checkout below reuses the same DBAPI connection
+    engine = create_engine("sqlite://", creator=creator, poolclass=QueuePool, pool_size=1, max_overflow=0)
+    init = SessionInitializer(["PRAGMA foreign_keys=ON;"])
+    init.install(engine)
+    assert is_session_managed(engine)
+
+    def settings_runs(value: str) -> int:
+        return sum(1 for s in executed if f"foreign_keys={value}" in s.replace(" ", ""))
+
+    seen = set()
+    for _ in range(5):
+        with engine.connect() as conn:
+            seen.add(id(conn.connection.driver_connection))
+            assert conn.execute(text("PRAGMA foreign_keys")).scalar() == 1
+    assert len(dbapi_conns) == 1 and len(seen) == 1
+    assert settings_runs("ON") == 1
+
+    # a settings change is re-applied once on the next checkout of the same connection
+    init.update(["PRAGMA foreign_keys=OFF;"])
+    for _ in range(3):
+        with engine.connect() as conn:
+            assert conn.execute(text("PRAGMA foreign_keys")).scalar() == 0
+    assert len(dbapi_conns) == 1
+    assert settings_runs("OFF") == 1 and settings_runs("ON") == 1
+
+
+def test_disabled_session_settings_are_sent_as_explicit_defaults():
+    from config import Settings
+    from db.engine import session_statements
+
+    assert session_statements(Settings()) == [
+        "SET NOCOUNT ON;",
+        "SET LOCK_TIMEOUT 30000;",
+        "SET TRANSACTION ISOLATION LEVEL READ UNCOMMITTED;",
+    ]
+    # switching a setting off must undo it on connections initialized with it on
+    off = Settings(MSSQL_SET_NOCOUNT=False, MSSQL_LOCK_TIMEOUT_MS=0, MSSQL_READ_UNCOMMITTED=False)
+    assert session_statements(off) == [
+        "SET NOCOUNT OFF;",
+        "SET LOCK_TIMEOUT -1;",
+        "SET TRANSACTION ISOLATION LEVEL READ COMMITTED;",
+    ]
+
+
+def test_engines_are_keyed_by_session_settings(monkeypatch):
+    from config import Settings
+    from db.engine import EngineManager
+
+    manager = EngineManager()
+    monkeypatch.setattr(manager, "_build", lambda settings, url, purpose: create_engine("sqlite://", poolclass=QueuePool))
+
+    on, off = Settings(), Settings(MSSQL_READ_UNCOMMITTED=False)
+    a = manager.get(on, "profiling")
+    # same DSN, different session settings: separate pools, neither re-initializes the other's connections
+    b = manager.get(off, "profiling")
+    assert a is not b
+    assert manager.get(Settings(), "profiling") is a and manager.get(off, "profiling") is b
+    assert len({(r["dsn"], r["purpose"]) for r in manager.telemetry()}) == 1 and len(manager.telemetry()) == 2
+    manager.dispose_all()
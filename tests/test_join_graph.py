@@ -0,0 +1,70 @@
+from __future__ import annotations
+
+import pytest
+
+from agents.sql_agent import SQLAgent
+from config import Settings
+from knowledge_graph.join_graph import JoinFanoutError, JoinGraph
+from knowledge_graph.schema_registry import SchemaRegistry
+
+
+def _fk(col, table, ref):
+    return {"parent_column": col, "ref_schema": "dbo", "ref_table": table, "ref_column": ref}
+
+
+def _table(cols, pk, fks=()):
+    return {"columns": [{"name": c} for c in cols], "pk_fk_hints": {"primary_key": pk, "foreign_keys": list(fks)}}
+
+
+REGISTRY = {
+    "tables": {
+        "dbo.orders": _table(["OrderId", "CustomerId", "Amount"], ["OrderId"], [_fk("CustomerId", "customers", "CustomerId")]),
+        "dbo.customers": _table(["CustomerId", "RegionId"], ["CustomerId"]),
+        "dbo.regions": _table(["Id", "Name"], ["Id"]),  # reached by name: customers.RegionId -> regions.Id
+        "dbo.order_lines": _table(["LineId", "OrderId", "Qty"], ["LineId"], [_fk("OrderId", "orders", "OrderId")]),
+        "dbo.payments": _table(["PaymentId", "OrderId", "Paid"], ["PaymentId"], [_fk("OrderId", "orders", "OrderId")]),
+    }
+}
+
+
+def test_missing_joins_are_completed_through_bridge_tables():
+    g = JoinGraph.build(REGISTRY)
+    assert [e.kind for e in g.edges_between("dbo.customers", "dbo.regions")] == ["inferred"]
+
+    out = g.complete_joins(
+        ["dbo.orders", "dbo.regions"],
+        [{"left_table": "dbo.orders", "right_table": "dbo.regions", "left_key": "Nope", "right_key": "Id"}],
+    )
+    assert out["tables"] == ["dbo.orders", "dbo.customers", "dbo.regions"]
+    assert [(j["left_table"], j["right_table"], j["source"]) for j in out["joins"]] == [
+        ("dbo.orders", "dbo.customers", "fk"),
+        ("dbo.customers", "dbo.regions", "inferred"),
+    ]
+    assert out["dropped"][0]["reason"] == "unknown table or column"
+    # the bridge table has to be allowed
+    assert g.complete_joins(["dbo.orders", "dbo.regions"], allowed=["dbo.orders", "dbo.regions"])["unreachable"] == ["dbo.regions"]
+
+
+def test_fanout_is_detected():
+    g = JoinGraph.build(REGISTRY)
+    lines = g.complete_joins(["dbo.order_lines", "dbo.orders"])["joins"]
+    assert g.fanout_problems(lines)["grain"] == "dbo.order_lines"
+    assert g.fanout_problems(lines, ["dbo.order_lines"])["problems"] == []
+    assert g.fanout_problems(lines, ["dbo.orders"])["problems"]  # fan trap: order amount repeated per line
+
+    chasm = g.complete_joins(["dbo.orders", "dbo.order_lines", "dbo.payments"])["joins"]
+    assert g.fanout_problems(chasm)["grain"] is None
+
+
+def test_sql_agent_rejects_chasm_trap_and_joins_bridges(tmp_path):
+    reg = SchemaRegistry(str(tmp_path))
+    reg.save(REGISTRY)
+    agent = SQLAgent(Settings(), reg)
+
+    bundle = agent.generate_sql({"tables": ["dbo.orders", "dbo.regions"], "dimensions": ["Name"], "metrics": [{"name": "amt", "agg": "sum", "field": "Amount"}]}, [])
+    assert "LEFT JOIN [dbo].[customers] AS t1 ON t0.[CustomerId] = t1.[CustomerId]" in bundle["sql"]
+    assert "LEFT JOIN [dbo].[regions] AS t2 ON t1.[RegionId] = t2.[Id]" in bundle["sql"]
+    assert bundle["join_check"]["grain"] == "dbo.orders" and not bundle["join_check"]["problems"]
+
+    with pytest.raises(JoinFanoutError):
+        agent.generate_sql({"tables": ["dbo.orders", "dbo.order_lines", "dbo.payments"], "metrics": [{"name": "q", "agg": "sum", "field": "Qty"}]}, [])
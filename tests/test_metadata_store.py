@@ -0,0 +1,55 @@
+from __future__ import annotations
+
+import json
+
+import pandas as pd
+
+from knowledge_graph.schema_registry import SchemaRegistry
+from knowledge_graph.store import KnowledgeGraphStore
+
+
+def test_sqlite_backend_migrates_json_and_serves_point_lookups(tmp_path):
+    legacy = {"updated_at": 1, "tables": {"dbo.b": {"row_count": 2}, "dbo.a": {"row_count": 1}}}
+    (tmp_path / "schema.json").write_text(json.dumps(legacy), encoding="utf-8")
+    (tmp_path / "schema_registry.json").write_text(
+        json.dumps({"tables": {"dbo.a": {"columns": [{"name": "Id"}]}}}), encoding="utf-8"
+    )
+
+    kg = KnowledgeGraphStore(str(tmp_path))
+    assert kg.load_schema() == legacy  # imported, document order kept
+    assert kg.list_tables() == ["dbo.b", "dbo.a"]
+    assert kg.has_table("dbo.a") and not kg.has_table("dbo.c")
+    assert kg.get_table("dbo.b") == {"row_count": 2}
+
+    reg = SchemaRegistry(str(tmp_path))
+    assert reg.table_columns("dbo.a") == ["Id"]
+
+    kg.save_schema({"tables": {"dbo.c": {"row_count": 3}}})
+    assert kg.list_tables() == ["dbo.c"]
+    # the legacy file is untouched until exported
+    assert json.loads((tmp_path / "schema.json").read_text(encoding="utf-8")) == legacy
+    out = kg.export_json(str(tmp_path / "export.json"))
+    assert json.loads(out.read_text(encoding="utf-8"))["tables"] == {"dbo.c": {"row_count": 3}}
+
+
+def test_json_backend_is_unchanged(tmp_path):
+    kg = KnowledgeGraphStore(str(tmp_path), backend="json")
+    kg.save_schema({"tables": {"dbo.a": {}}})
+    assert not (tmp_path / "metadata.sqlite").exists()
+    assert json.loads((tmp_path / "schema.json").read_text(encoding="utf-8"))["tables"] == {"dbo.a": {}}
+    assert kg.has_schema() and kg.list_tables() == ["dbo.a"]
+
+
+def test_samples_are_parquet_files_loaded_on_demand(tmp_path):
+    kg = KnowledgeGraphStore(str(tmp_path))
+    df = pd.DataFrame({"id": [1, 2, 3], "v": ["a", 5, None]})  # mixed object column falls back to text
+    ref = kg.save_sample("dbo.a", df)
+    kg.save_schema({"tables": {"dbo.a": {"sample_ref": ref}, "dbo.old": {"sample": [{"id": 9}]}}})
+
+    assert ref["rows"] == 3 and (tmp_path / ref["path"]).exists()
+    assert kg.load_sample("dbo.a", limit=2)["v"].tolist() == ["a", "5"]
+    assert kg.load_sample("dbo.old").to_dict(orient="records") == [{"id": 9}]
+
+    kg.save_sample("dbo.gone", df)
+    assert kg.prune_samples(["dbo.a"]) == 1
+    assert len(kg.load_sample("dbo.a")) == 3
@@ -0,0 +1,27 @@
+from __future__ import annotations
+
+import pandas as pd
+
+from db.profile_queries import aggregate_profile_sql, parse_aggregate_profile, parse_top_values, top_values_sql
+
+
+def test_batched_profile_queries_round_trip():
+    cols = [("amount", "decimal"), ("city", "nvarchar")]
+    sql = aggregate_profile_sql("[dbo].[sales]", cols)
+    assert sql.count("FROM [dbo].[sales]") == 1
+    assert "MIN([amount])" in sql and "MIN([city])" not in sql
+    assert "COUNT_BIG(1) - COUNT_BIG([city]) AS [nl_1]" in sql and "SUM(" not in sql  # BIGINT null counts
+
+    agg = pd.DataFrame([{"row_total": 10, "mn_0": 1.5, "mx_0": 9.0, "nl_0": 0, "nl_1": 3}])
+    parsed = parse_aggregate_profile(agg, cols, lambda v: v)
+    assert parsed["amount"] == {"minmax": {"min": 1.5, "max": 9.0}, "null_count": 0}
+    assert parsed["city"] == {"null_count": 3}
+
+    sql = top_values_sql("[dbo].[sales]", ["city", "region"], 2)
+    assert sql.count("FROM [dbo].[sales]") == 1 and "CROSS APPLY" in sql
+
+    top = pd.DataFrame({"col_idx": [0, 0, 1], "value": ["Paris", "Rome", "EU"], "cnt": [5, 2, 7]})
+    assert parse_top_values(top, ["city", "region"]) == {
+        "city": [{"value": "Paris", "cnt": 5}, {"value": "Rome", "cnt": 2}],
+        "region": [{"value": "EU", "cnt": 7}],
+    }
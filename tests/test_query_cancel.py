@@ -0,0 +1,68 @@
+from __future__ import annotations
+
+from types import SimpleNamespace
+import threading
+import time
+
+import pytest
+from sqlalchemy import create_engine
+
+from db import QueryCancelledError, QueryControl, cancel_query, list_inflight_queries, run_sql_query
+
+HEAVY_SQL = "SELECT COUNT(1) AS n FROM t a, t b, t c"
+
+
+def _engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'q.db'}")
+    with engine.begin() as conn:
+        conn.exec_driver_sql("CREATE TABLE t (a INTEGER)")
+        conn.exec_driver_sql(
+            "WITH RECURSIVE r(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM r WHERE x < 2000) "
+            "INSERT INTO t SELECT x FROM r"
+        )
+    return engine
+
+
+def test_timeout_cancels_statement_on_server(tmp_path):
+    engine = _engine(tmp_path)
+    t0 = time.time()
+    with pytest.raises(QueryCancelledError) as exc:
+        run_sql_query(
+            sql=HEAVY_SQL, params={}, timeout_seconds=1, max_rows=10,
+            settings=SimpleNamespace(), engine=engine,
+        )
+    assert "timeout" in exc.value.reason
+    assert time.time() - t0 < 5
+    assert list_inflight_queries() == []
+
+
+def test_cancel_from_another_thread(tmp_path):
+    engine = _engine(tmp_path)
+    control = QueryControl(sql=HEAVY_SQL, timeout_seconds=60)
+
+    def cancel_soon():
+        time.sleep(0.3)
+        assert control.query_id in [q["query_id"] for q in list_inflight_queries()]
+        cancel_query(control.query_id)
+
+    threading.Thread(target=cancel_soon).start()
+    with pytest.raises(QueryCancelledError):
+        run_sql_query(
+            sql=HEAVY_SQL, params={}, timeout_seconds=60, max_rows=10,
+            settings=SimpleNamespace(), engine=engine, control=control,
+        )
+    assert control.meta()["cancelled"] is True
+
+
+def test_profiling_runner_cancels_on_server(tmp_path):
+    from db.query import run_sql_query as run_profile_query
+
+    engine = _engine(tmp_path)
+    t0 = time.time()
+    with pytest.raises(QueryCancelledError) as exc:
+        # the statement is busy before the first chunk: a between-chunks check never fires
+        run_profile_query(engine=engine, sql=HEAVY_SQL, timeout_seconds=1, max_rows=10)
+    assert "timeout" in exc.value.reason
+    assert time.time() - t0 < 5
+    assert list_inflight_queries() == []
+    assert list(run_profile_query(engine=engine, sql="SELECT COUNT(1) AS n FROM t", timeout_seconds=5)["n"]) == [2000]
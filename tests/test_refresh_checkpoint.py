@@ -0,0 +1,25 @@
+from __future__ import annotations
+
+from knowledge_graph.refresh_checkpoint import RefreshCheckpoint
+
+
+def test_checkpoint_tracks_progress_and_resumes(tmp_path):
+    cp = RefreshCheckpoint(tmp_path)
+    cp.start({"sample_rows": 50}, ["dbo.a", "dbo.b", "dbo.c"])
+    cp.record_done("dbo.a", {"schema": {"name": "a"}, "registry": {}, "content": None})
+    cp.record_failed("dbo.b", "TimeoutError: boom")
+
+    status = cp.status()
+    assert (status["status"], status["completed"], status["failed"], status["pending"]) == ("running", 1, 1, 1)
+
+    # a new process picks the cursor up again
+    cp2 = RefreshCheckpoint(tmp_path)
+    state = cp2.resume(["dbo.a", "dbo.b", "dbo.c"])
+    assert state["options"] == {"sample_rows": 50}
+    assert cp2.completed() == {"dbo.a": {"schema": {"name": "a"}, "registry": {}, "content": None}}
+
+    cp2.record_done("dbo.b", {"schema": {}, "registry": {}, "content": None})
+    cp2.record_done("dbo.c", {"schema": {}, "registry": {}, "content": None})
+    cp2.finish(failed=False)
+    assert cp2.status()["status"] == "done" and cp2.status()["completed"] == 3
+    assert cp2.resume(["dbo.a"]) is None
@@ -0,0 +1,74 @@
+from __future__ import annotations
+
+from knowledge_graph.retrieval_index import RetrievalIndex
+
+
+def _index():
+    registry = {
+        "tables": {
+            "dbo.sales_orders": {"columns": [{"name": "OrderId"}, {"name": "Region"}], "row_count": 10,
+                                 "pk_fk_hints": {"primary_keys": ["OrderId"]}},
+            "dbo.customers": {"columns": [{"name": "CustomerId"}, {"name": "Country"}], "row_count": 5},
+            "dbo.audit_log": {"columns": [{"name": "Message"}], "row_count": 7},
+        }
+    }
+    content = {
+        "dbo.customers": {"top_values": {"Country": [{"value": "Germany", "cnt": 3}]}, "table_text": "customers germany"},
+        "dbo.audit_log": {"sample_rows": [{"Message": "region changed"}]},
+    }
+    return RetrievalIndex.build(registry, content)
+
+
+def test_scores_keep_substring_semantics_and_breakdown_shape():
+    scored, breakdown = _index().score({"sales", "region", "germany"})
+
+    assert {t for s, t in scored if s > 0} == {"dbo.sales_orders", "dbo.customers", "dbo.audit_log"}
+    so = breakdown["dbo.sales_orders"]
+    assert set(so) == {
+        "total_score", "schema_score", "content_score", "join_bonus",
+        "matched_schema", "matched_content", "row_count", "has_content_index",
+    }
+    assert set(so["matched_schema"]) == {"table:sales", "col:region"}
+    assert so["join_bonus"] == 0.5 and so["has_content_index"] is False
+    assert set(breakdown["dbo.customers"]["matched_content"]) == {"blob:germany", "top:Country:germany"}
+    assert breakdown["dbo.audit_log"]["matched_content"] == ["sample:region"]
+
+
+def test_rare_words_outweigh_common_ones():
+    scored, _ = _index().score({"dbo", "audit"})
+    assert scored[0][1] == "dbo.audit_log"
+
+
+def test_allowlist_limits_ranked_tables():
+    scored, breakdown = _index().score({"customer"}, ["dbo.customers", "dbo.audit_log"])
+    assert [t for _, t in scored] == ["dbo.customers", "dbo.audit_log"]
+    assert scored[1][0] == 0 and set(breakdown) == {"dbo.customers", "dbo.audit_log"}
+
+
+def test_content_commit_warms_the_index_and_other_writers_trigger_a_rebuild(tmp_path, monkeypatch):
+    from knowledge_graph.content_index import ContentIndexStore
+    from knowledge_graph.retrieval_index import get_retrieval_index, warm_retrieval_index
+    from knowledge_graph.schema_registry import SchemaRegistry
+
+    kg_dir = str(tmp_path)
+    reg = SchemaRegistry(kg_dir)
+    reg.save({"tables": {"dbo.customers": {"columns": [{"name": "Country"}]}}})
+    store = ContentIndexStore(tmp_path, on_commit=lambda obj: warm_retrieval_index(kg_dir, reg, obj["tables"]))
+    with store.batch():
+        store.upsert_table("dbo.customers", {"table_text": "customers germany"})
+
+    builds = []
+    build = RetrievalIndex.build.__func__
+    monkeypatch.setattr(RetrievalIndex, "build", classmethod(lambda cls, *a: builds.append(1) or build(cls, *a)))
+
+    # the first question after the commit reuses the warmed index
+    idx, used_content = get_retrieval_index(kg_dir, reg)
+    assert used_content and builds == []
+    assert idx.score({"germany"})[0][0][1] == "dbo.customers"
+
+    # a write without the hook (another process) is picked up by the version check
+    ContentIndexStore(tmp_path).upsert_table("dbo.customers", {"table_text": "customers france"})
+    idx, _ = get_retrieval_index(kg_dir, reg)
+    assert builds == [1] and idx.score({"france"})[0][0][0] > 0
+    get_retrieval_index(kg_dir, reg)
+    assert builds == [1]
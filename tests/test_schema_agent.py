@@ -0,0 +1,311 @@
+from __future__ import annotations
+
+import re
+import threading
+import time
+
+import pandas as pd
+import pyarrow as pa
+import pytest
+
+import agents.schema_agent as schema_agent
+from agents.schema_agent import SchemaAgent
+from config import Settings
+from db import QueryCancelledError
+from knowledge_graph.schema_registry import SchemaRegistry
+from knowledge_graph.store import KnowledgeGraphStore
+
+COLUMNS = [("Id", "int"), ("Amount", "decimal"), ("Status", "nvarchar"), ("Region", "nvarchar")]
+
+
+class _FakeDB:
+    """
+    Stand-in for the SQL Server catalog + profiling queries, patched into
+    agents.schema_agent. Answers are a pure function of the table, so serial
+    and concurrent refreshes must persist the same thing.
+    """
+
+    def __init__(self, tables, delay: float = 0.0):
+        self.tables = dict(tables)  # name -> (modify_date, row_count)
+        self.delay = delay
+        self.fail = set()  # tables whose profiling queries raise
+        self.queried = []  # tables touched by sample/profile queries
+        self.minmax = (0.0, 40.0)  # profiled MIN/MAX of every range-typed column
+        self.inflight = 0
+        self.max_inflight = 0
+        self._lock = threading.Lock()
+
+    def install(self, monkeypatch) -> "_FakeDB":
+        monkeypatch.setattr(schema_agent, "fetch_tables", self.fetch_tables)
+        monkeypatch.setattr(schema_agent, "fetch_catalog", self.fetch_catalog)
+        monkeypatch.setattr(schema_agent, "sample_table", self.sample_table)
+        monkeypatch.setattr(schema_agent, "run_sql_query", self.run_sql_query)
+        monkeypatch.setattr(schema_agent, "iter_sql_record_batches", self.iter_sql_record_batches)
+        return self
+
+    def fetch_tables(self, engine):
+        return [{"schema_name": "dbo", "table_name": t, "modify_date": m} for t, (m, _) in sorted(self.tables.items())]
+
+    def fetch_catalog(self, engine):
+        cols = [
+            {"column_name": c, "data_type": ty, "max_length": 8, "precision": 0, "scale": 0, "is_nullable": True}
+            for c, ty in COLUMNS
+        ]
+        return {
+            "columns": {f"dbo.{t}": [dict(c) for c in cols] for t in self.tables},
+            "row_counts": {f"dbo.{t}": n for t, (_, n) in self.tables.items()},
+            "primary_keys": {f"dbo.{t}": ["Id"] for t in self.tables},
+            "foreign_keys": {},
+        }
+
+    def _query(self, table: str) -> None:
+        with self._lock:
+            self.queried.append(table)
+            self.inflight += 1
+            self.max_inflight = max(self.max_inflight, self.inflight)
+        try:
+            # later tables answer first, so concurrent completion order differs from table order
+            time.sleep(self.delay * (len(self.tables) - sorted(self.tables).index(table)))
+            if table in self.fail:
+                raise RuntimeError(f"profiling {table} failed")
+        finally:
+            with self._lock:
+                self.inflight -= 1
+
+    def _rows(self, table: str, rows: int) -> pd.DataFrame:
+        return pd.DataFrame(
+            {
+                "Id": range(rows),
+                "Amount": [float(i * 10) for i in range(rows)],
+                "Status": [("open", "closed")[i % 2] for i in range(rows)],
+                "Region": [f"{table}-r{i % 2}" for i in range(rows)],
+            }
+        )
+
+    def sample_table(self, engine, schema, table, columns, top_n=50):
+        self._query(table)
+        return self._rows(table, 5)[columns]
+
+    def iter_sql_record_batches(self, *, sql, max_rows, **kw):
+        # histogram scan: SELECT TOP (n) [a], [b] FROM [dbo].[T] (whole table below the row budget)
+        table = re.search(r"FROM \[dbo\]\.\[(\w+)\]", sql).group(1)
+        self._query(table)
+        cols = re.findall(r"\[(\w+)\]", sql.split(" FROM ")[0])
+        yield pa.RecordBatch.from_pandas(self._rows(table, min(self.tables[table][1], max_rows))[cols], preserve_index=False)
+
+    def run_sql_query(self, *, engine, sql, params, timeout_seconds, max_rows, control=None):
+        table = re.search(r"FROM \[dbo\]\.\[(\w+)\]", sql).group(1)
+        self._query(table)
+        if "[row_total]" in sql:
+            row = {"row_total": self.tables[table][1]}
+            for i in re.findall(r"\[nl_(\d+)\]", sql):
+                row[f"nl_{i}"] = int(i)
+            for kind, i in re.findall(r"\[(mn|mx)_(\d+)\]", sql):
+                row[f"{kind}_{i}"] = self.minmax[0] if kind == "mn" else self.minmax[1]
+            return pd.DataFrame([row])
+        cols = re.findall(r"\((\d+), CAST\(t\.\[(\w+)\]", sql)
+        return pd.DataFrame(
+            [{"col_idx": int(i), "value": f"{table}-{c}-v{k}", "cnt": 10 - k} for i, c in cols for k in range(2)]
+        )
+
+
+def _persisted(agent: SchemaAgent):
+    schema = agent.kg.load_schema()
+    schema.pop("updated_at", None)
+    return schema, agent.registry.load(), agent.content_store.load()
+
+
+@pytest.fixture
+def make_agent(tmp_path, monkeypatch):
+    # no SQL Server here: the pools are never used once the DB calls are stubbed
+    monkeypatch.setattr(schema_agent, "get_pooled_engine", lambda settings, purpose: None)
+
+    def make(kg_dir: str = "kg", **overrides) -> SchemaAgent:
+        d = str(tmp_path / kg_dir)
+        return SchemaAgent(Settings(KNOWLEDGE_GRAPH_DIR=d, **overrides), KnowledgeGraphStore(d), SchemaRegistry(d))
+
+    return make
+
+
+def test_approx_profile_keeps_rows_read_before_the_table_timeout(make_agent, monkeypatch):
+    agent = make_agent(PROFILE_SAMPLE_ROWS=1000)
+
+    def timed_out_scan(**kw):
+        for start in (0, 100):
+            yield pa.record_batch({"amount": pa.array([float(i) for i in range(start, start + 100)]),
+                                   "status": pa.array(["open"] * 90 + [None] * 10)})
+        raise QueryCancelledError("q1", "timeout after 120s")  # watchdog fired mid-scan
+
+    monkeypatch.setattr(schema_agent, "iter_sql_record_batches", timed_out_scan)
+    out = agent._profile_approx(
+        schema="dbo", table="t", columns=[("amount", "decimal"), ("status", "nvarchar")], top_values=5, row_count=10_000
+    )
+    meta = out["amount"]["approx"]
+    assert meta["truncated"] is True and meta["sample_rows"] == 200 and meta["scale"] == 50.0
+    assert out["amount"]["minmax"] == {"min": 0.0, "max": 199.0}
+    assert out["status"]["null_count"] == 1000 and out["status"]["top_values"][0]["value"] == "open"
+    assert "histogram" not in out["amount"]  # the rows read are only the start of the scan
+
+    def cancelled_at_once(**kw):
+        raise QueryCancelledError("q2", "timeout after 120s")
+        yield  # pragma: no cover
+
+    monkeypatch.setattr(schema_agent, "iter_sql_record_batches", cancelled_at_once)
+    with pytest.raises(QueryCancelledError):
+        agent._profile_approx(schema="dbo", table="t", columns=[("amount", "decimal")], top_values=5, row_count=10_000)
+
+
+def test_concurrent_refresh_matches_serial_refresh(make_agent, monkeypatch):
+    fake = _FakeDB({f"T{i}": ("2024-01-01T00:00:00", 100 * (i + 1)) for i in range(6)}, delay=0.005).install(monkeypatch)
+    fake.fail = {"T2"}
+
+    results, persisted, progress = {}, {}, {}
+    for workers in (1, 4):
+        agent = make_agent(f"w{workers}", SCHEMA_REFRESH_MAX_WORKERS=8, SQL_POOL_SIZE_PROFILING=3, SQL_MAX_OVERFLOW_PROFILING=0)
+        calls = []
+        main = threading.current_thread()
+
+        def on_progress(done, total, key, calls=calls):
+            assert threading.current_thread() is main
+            calls.append((done, total, key))
+
+        fake.max_inflight = 0
+        results[workers] = agent.refresh(max_workers=workers, progress_callback=on_progress)
+        persisted[workers] = _persisted(agent)
+        progress[workers] = calls
+        if workers == 1:
+            assert fake.max_inflight == 1
+        else:
+            assert agent._refresh_workers(workers) == 3  # capped by the profiling pool (3 + 0 overflow)
+            assert agent._refresh_workers(None) == 3 and agent._refresh_workers(2) == 2
+            assert 1 < fake.max_inflight <= 3
+
+    assert persisted[1] == persisted[4]
+    schema, registry, content = persisted[4]
+    assert sorted(registry["tables"]) == ["dbo.T0", "dbo.T1", "dbo.T3", "dbo.T4", "dbo.T5"]
+    assert schema["tables"]["dbo.T1"]["column_stats"]["Amount"]["min"] == 0.0
+    assert content["tables"]["dbo.T1"]["top_values"]["Region"][0]["value"] == "T1-Region-v0"
+
+    # a failing table is reported (on_error) without stopping the others
+    for workers in (1, 4):
+        assert results[workers]["failed_tables"] == {"dbo.T2": "RuntimeError: profiling T2 failed"}
+        assert results[workers]["refreshed_tables"] == 5
+    # "table N of M": one call per table, counting up, from the calling thread
+    for calls in progress.values():
+        assert [(d, t) for d, t, _ in calls] == [(i, 6) for i in range(1, 7)]
+        assert sorted(k for _, _, k in calls) == [f"dbo.T{i}" for i in range(6)]
+    assert [k for _, _, k in progress[1]] == [f"dbo.T{i}" for i in range(6)]
+
+
+def test_first_refresh_profiles_ranges_from_catalog_types(make_agent, monkeypatch):
+    fake = _FakeDB({"A": ("2024-01-01T00:00:00", 100)}).install(monkeypatch)
+    fake.minmax = (-5.0, 400.0)  # outside the sample's 0..40, so the stats show where the range came from
+    agent = make_agent()
+    assert agent.registry.load().get("tables", {}) == {}
+
+    agent.refresh(max_workers=1)
+    stats = agent.kg.load_schema()["tables"]["dbo.A"]["column_stats"]
+    # Amount is typed decimal in the catalog: MIN/MAX is profiled without a prior registry
+    assert (stats["Amount"]["min"], stats["Amount"]["max"]) == (-5.0, 400.0)
+
+
+def test_exact_profile_builds_histograms_for_mid_sized_tables(make_agent, monkeypatch):
+    # 500 rows: exact mode (below PROFILE_APPROX_MIN_ROWS) and more than the UI's 50-row sample
+    _FakeDB({"A": ("2024-01-01T00:00:00", 500)}).install(monkeypatch)
+    agent = make_agent(PROFILE_MODE="auto")
+    agent.refresh(sample_rows=50, max_workers=1)
+
+    content = agent.content_store.load()["tables"]["dbo.A"]
+    assert content["profile"]["mode"] == "exact"
+    stats = agent.kg.load_schema()["tables"]["dbo.A"]["column_stats"]
+    hist = stats["Amount"]["histogram"]
+    assert hist["kind"] == "numeric" and len(hist["bounds"]) == 33
+    # quantiles of the whole table (0..4990), not of the 50-row TOP prefix (0..490)
+    assert hist["bounds"][0] == 0.0 and hist["bounds"][-1] == 4990.0
+    assert 2000.0 < hist["bounds"][16] < 3000.0
+    assert "histogram" not in stats["Status"]
+
+
+def test_run_tasks_cancels_pending_work_on_first_failure():
+    ran = []
+
+    def boom():
+        raise RuntimeError("first task failed")
+
+    def slow(i):
+        time.sleep(0.02)
+        ran.append(i)
+
+    tasks = [boom] + [lambda i=i: slow(i) for i in range(20)]
+    with pytest.raises(RuntimeError, match="first task failed"):
+        schema_agent._run_tasks(tasks, workers=2, on_result=lambda i, r: None)
+    assert len(ran) < 20  # queued tasks were cancelled, not drained
+
+
+def test_incremental_refresh_reuses_unchanged_reprofiles_changed_drops_vanished(make_agent, monkeypatch):
+    import json
+
+    fake = _FakeDB({"A": ("2024-01-01T00:00:00", 100), "B": ("2024-01-01T00:00:00", 200), "C": ("2024-01-01T00:00:00", 300)})
+    fake.install(monkeypatch)
+    agent = make_agent()
+    agent.refresh(max_workers=1)
+
+    def entries(key):
+        schema, registry, content = _persisted(agent)
+        return [json.dumps(store["tables"].get(key), sort_keys=True) for store in (schema, registry, content)]
+
+    before_a = entries("dbo.A")
+    sample_c = agent.kg.base / agent.kg.get_table("dbo.C")["sample_ref"]["path"]
+    assert sample_c.exists()
+
+    fake.tables["B"] = ("2024-01-01T00:00:00", 250)  # more rows → new signature
+    del fake.tables["C"]
+    fake.queried.clear()
+    out = agent.refresh(max_workers=1, incremental=True)
+
+    assert out["unchanged_tables"] == 1 and out["refreshed_tables"] == 1 and out["dropped_tables"] == ["dbo.C"]
+    # unchanged: not queried, every store keeps its entry byte-for-byte
+    assert "A" not in fake.queried
+    assert entries("dbo.A") == before_a
+    # changed: sampled and profiled again, new signature and row count recorded
+    assert "B" in fake.queried
+    assert agent.registry.load()["tables"]["dbo.B"]["signature"]["row_count"] == 250
+    assert agent.kg.get_table("dbo.B")["row_count"] == 250
+    # vanished: gone from schema, registry, content index (and its sample file)
+    assert entries("dbo.C") == ["null", "null", "null"]
+    assert not sample_c.exists()
+
+
+def test_resume_skips_checkpointed_tables_after_an_interrupted_refresh(make_agent, monkeypatch):
+    fake = _FakeDB({t: ("2024-01-01T00:00:00", 100) for t in ("A", "B", "C", "D")}).install(monkeypatch)
+    fake.fail = {"B"}
+    agent = make_agent()
+
+    class Interrupted(Exception):
+        pass
+
+    def stop_after_three(done, total, key):
+        if done == 3:
+            raise Interrupted()  # e.g. a Streamlit rerun mid-refresh
+
+    with pytest.raises(Interrupted):
+        agent.refresh(max_workers=1, sample_rows=7, progress_callback=stop_after_three)
+
+    status = make_agent().refresh_status()  # a new process reads the same checkpoint
+    assert (status["status"], status["total"], status["completed"], status["failed"], status["pending"]) == (
+        "running", 4, 2, 1, 1,
+    )
+    assert status["failed_tables"] == {"dbo.B": "RuntimeError: profiling B failed"}
+    assert agent.registry.load()["tables"] == {}  # nothing was saved by the interrupted run
+
+    fake.fail.clear()
+    fake.queried.clear()
+    out = agent.refresh(max_workers=1, resume=True)
+
+    # completed tables come from the checkpoint; the failed and the pending one are run
+    assert sorted(set(fake.queried)) == ["B", "D"]
+    assert out["ok"] and out["resumed_tables"] == 2 and out["refreshed_tables"] == 4
+    assert sorted(agent.registry.load()["tables"]) == ["dbo.A", "dbo.B", "dbo.C", "dbo.D"]
+    status = agent.refresh_status()
+    assert (status["status"], status["completed"], status["failed"], status["pending"]) == ("done", 4, 0, 0)
+    assert agent.checkpoint.load_state()["options"]["sample_rows"] == 7  # the original run's options
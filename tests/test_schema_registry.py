@@ -0,0 +1,66 @@
+from __future__ import annotations
+
+from agents.sql_agent import SQLAgent
+from config import Settings
+from knowledge_graph.schema_registry import SchemaRegistry
+
+
+def _registry(tmp_path, cols):
+    reg = SchemaRegistry(str(tmp_path))
+    reg.save({"tables": {"dbo.orders": {"columns": [{"name": c} for c in cols]}}})
+    return reg
+
+
+def test_registry_indexes_and_reloads_on_change(tmp_path):
+    reg = _registry(tmp_path, ["OrderId", "Amount"])
+    v1 = reg.version()
+    assert reg.has_column("dbo.orders", "Amount") and not reg.has_column("dbo.orders", "amount")
+    assert reg.resolve_column("dbo.orders", "AMOUNT") == "Amount"
+    reg.save({"tables": {"dbo.orders": {"columns": [{"name": "OrderId", "type": "int"}, {"name": "Amount"}]}}})
+    assert reg.column_type("dbo.orders", "OrderId") == "int"
+    assert reg.column_type("dbo.orders", "Amount") == "" and reg.column_type("dbo.x", "OrderId") == ""
+    v1 = reg.version()
+
+    # another instance on the same file shares the snapshot and sees saves
+    other = SchemaRegistry(str(tmp_path))
+    assert other.load() is reg.load()
+    _registry(tmp_path, ["OrderId", "Amount", "Region"])
+    assert other.version() != v1
+    assert other.table_columns("dbo.orders") == ["OrderId", "Amount", "Region"]
+
+
+def test_generate_sql_is_memoized_per_registry_version(tmp_path):
+    reg = _registry(tmp_path, ["OrderId", "Amount"])
+    agent = SQLAgent(Settings(), reg)
+    plan = {"tables": [], "dimensions": ["orderid"], "metrics": []}
+
+    first = agent.generate_sql(dict(plan), [])
+    replay = dict(plan)
+    second = agent.generate_sql(replay, [])
+    assert second == first and second is not first
+    # plan side effects are re-applied on a hit
+    assert replay["tables"] == ["dbo.orders"] and replay["expected_columns"] == ["OrderId"]
+
+    _registry(tmp_path, ["ORDERID", "Amount"])
+    assert "[ORDERID]" in agent.generate_sql(dict(plan), [])["sql"]
+
+
+def test_generate_sql_retry_with_the_same_plan_dict_is_a_memo_hit(tmp_path):
+    reg = _registry(tmp_path, ["OrderId", "Amount"])
+    agent = SQLAgent(Settings(), reg)
+    calls = []
+    generate = agent._generate_sql
+    agent._generate_sql = lambda *a, **kw: calls.append(1) or generate(*a, **kw)
+
+    plan = {"tables": ["dbo.orders"], "dimensions": ["OrderId"], "metrics": [{"name": "amt", "agg": "sum", "field": "Amount"}]}
+    first = agent.generate_sql(plan, [])
+    assert "expected_columns" in plan  # written by the first call
+    plan["join_resolution"] = {"added_tables": []}  # planner annotation, not an SQL input
+    assert agent.generate_sql(plan, []) == first and len(calls) == 1
+
+    # recovered tables are written into the plan too; the retry still hits
+    recovered = {"tables": ["dbo.missing"], "dimensions": ["OrderId"], "metrics": []}
+    agent.generate_sql(recovered, [])
+    assert recovered["tables"] == ["dbo.orders"]
+    agent.generate_sql(recovered, [])
+    assert len(calls) == 2
@@ -0,0 +1,25 @@
+from __future__ import annotations
+
+from collections import Counter
+
+from knowledge_graph.sketches import HyperLogLog, SpaceSaving
+
+
+def test_hyperloglog_estimate_within_error():
+    hll = HyperLogLog(p=12)
+    for i in range(50_000):
+        hll.add(f"v{i}")
+        hll.add(f"v{i}")  # duplicates don't count
+    assert abs(hll.estimate() - 50_000) / 50_000 < 4 * hll.relative_error
+
+
+def test_space_saving_finds_heavy_hitters_with_bounds():
+    data = ["a"] * 500 + ["b"] * 300 + ["c"] * 100 + [f"noise{i}" for i in range(1000)]
+    ss = SpaceSaving(capacity=50)
+    for value, n in Counter(data).items():
+        ss.update(value, n)
+    top = ss.top(3)
+    assert [r["value"] for r in top] == ["a", "b", "c"]
+    truth = Counter(data)
+    for r in top:
+        assert r["count"] - r["error"] <= truth[r["value"]] <= r["count"]
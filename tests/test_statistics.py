@@ -0,0 +1,117 @@
+from __future__ import annotations
+
+import pandas as pd
+import pyarrow as pa
+import pytest
+
+from knowledge_graph.schema_registry import SchemaRegistry
+from knowledge_graph.statistics import CardinalityEstimator, build_column_stats, estimate_ndv
+from knowledge_graph.store import KnowledgeGraphStore
+
+
+def test_column_stats_from_sample_and_profile():
+    df = pd.DataFrame(
+        {
+            "Id": range(1000),
+            "Amount": [float(i % 100) for i in range(1000)],
+            "Status": ["open"] * 700 + ["closed"] * 250 + [None] * 50,
+            "OrderDate": pd.date_range("2024-01-01", periods=1000, freq="h"),
+        }
+    )
+    cols = [("Id", "int"), ("Amount", "decimal"), ("Status", "nvarchar"), ("OrderDate", "datetime2")]
+    results = {
+        "Status": {"null_count": 500, "top_values": [{"value": "open", "cnt": 7000}, {"value": "closed", "cnt": 2500}]},
+        "Amount": {"minmax": {"min": -5.0, "max": 99.0}, "null_count": 0},
+    }
+    stats = build_column_stats(df, cols, 10_000, results, primary_key=["Id"], top_values_limit=2000, buckets=4)
+
+    assert stats["Id"]["ndv"] == 10_000
+    assert stats["Status"]["null_frac"] == 0.05 and stats["Status"]["ndv"] == 2  # top values saw every value
+    assert stats["Status"]["mcv"][0] == {"value": "open", "frac": 0.7}
+    assert stats["Amount"]["ndv"] == 100 and stats["Amount"]["min"] == -5.0
+    # a TOP (n) prefix of a larger table is not trusted for histograms
+    assert "histogram" not in stats["Amount"] and "histogram" not in stats["OrderDate"]
+
+    whole = build_column_stats(df, cols, 1000, results, buckets=4)
+    assert whole["Amount"]["histogram"]["bounds"][0] == -5.0 and len(whole["Amount"]["histogram"]["bounds"]) == 5
+    assert whole["OrderDate"]["histogram"]["kind"] == "date"
+    assert whole["OrderDate"]["histogram"]["bounds"][0].startswith("2024-01-01")
+
+    # a profiled (reservoir) histogram is stretched to the exact MIN/MAX
+    profiled = {"Amount": {"minmax": {"min": -5.0, "max": 120.0}, "histogram": {"kind": "numeric", "bounds": [0.0, 50.0, 99.0]}}}
+    widened = build_column_stats(None, [("Amount", "decimal")], 10_000, profiled)
+    assert widened["Amount"]["histogram"]["bounds"] == [-5.0, 50.0, 120.0]
+
+
+def test_reservoir_histogram_costs_recent_dates_on_clustered_tables(tmp_path):
+    import numpy as np
+
+    from agents.schema_agent import _ApproxColumn
+    from knowledge_graph.statistics import equi_depth_bounds
+
+    # a date-clustered table streamed in order: a prefix would only cover the first days
+    st = _ApproxColumn(capacity=100, reservoir_size=2000)
+    days = pd.date_range("2021-01-01", "2023-12-31", freq="D")
+    for chunk in np.array_split(np.repeat(days.values, 50), 20):
+        st.add(pa.array(chunk))
+    hist = {"kind": "date", "bounds": equi_depth_bounds(st.reservoir.values, "date", 32)}
+    stats = build_column_stats(None, [("OrderDate", "date")], len(days) * 50, {"OrderDate": {"histogram": hist}})
+
+    reg = SchemaRegistry(str(tmp_path))
+    reg.save({"tables": {"dbo.f": {"row_count": len(days) * 50, "columns": [{"name": "OrderDate"}]}}})
+    est = CardinalityEstimator(registry=reg, stats={"dbo.f": stats})
+    assert est.selectivity("dbo.f", "OrderDate", ">=", "2023-01-01") == pytest.approx(1 / 3, abs=0.05)
+
+
+def test_ndv_scales_singletons_to_the_table():
+    counts = pd.Series(["a", "a", "b", "c", "d"]).value_counts()
+    assert estimate_ndv(counts, 5) == 4
+    assert 4 < estimate_ndv(counts, 5000) < 5000
+    unique = pd.Series(range(1000)).value_counts()
+    assert estimate_ndv(unique, 1_000_000) == pytest.approx(1_000_000)  # all-distinct sample → unique column
+
+
+def test_estimator_uses_histograms_mcvs_and_join_keys(tmp_path):
+    reg = SchemaRegistry(str(tmp_path))
+    reg.save(
+        {
+            "tables": {
+                "dbo.orders": {"row_count": 1_000_000, "columns": [{"name": "CustomerId"}, {"name": "Amount"}, {"name": "Status"}]},
+                "dbo.customers": {"row_count": 10_000, "columns": [{"name": "CustomerId"}, {"name": "Region"}]},
+            }
+        }
+    )
+    kg = KnowledgeGraphStore(str(tmp_path))
+    kg.save_schema(
+        {
+            "tables": {
+                "dbo.orders": {
+                    "column_stats": {
+                        "CustomerId": {"null_frac": 0.0, "ndv": 10_000},
+                        "Amount": {"null_frac": 0.0, "ndv": 1000, "histogram": {"kind": "numeric", "bounds": [0, 10, 20, 30, 100]}},
+                        "Status": {"null_frac": 0.0, "ndv": 3, "mcv": [{"value": "open", "frac": 0.9}]},
+                    }
+                },
+                "dbo.customers": {"column_stats": {"CustomerId": {"null_frac": 0.0, "ndv": 10_000}, "Region": {"null_frac": 0.0, "ndv": 5}}},
+            }
+        }
+    )
+    est = CardinalityEstimator.for_tables(kg, reg, ["dbo.orders", "dbo.customers"])
+
+    assert est.selectivity("dbo.orders", "Amount", "<", 15) == pytest.approx(0.375)
+    assert est.selectivity("dbo.orders", "Amount", ">=", 1000) == 0.0
+    assert est.selectivity("dbo.orders", "Status", "=", "open") == pytest.approx(0.9)
+    assert est.selectivity("dbo.orders", "Status", "=", "void") == pytest.approx(0.05)
+
+    plan = {
+        "tables": ["dbo.orders", "dbo.customers"],
+        "joins": [{"left_table": "dbo.orders", "right_table": "dbo.customers", "left_key": "CustomerId", "right_key": "CustomerId", "join_type": "INNER"}],
+        "filters": [{"field": "status", "op": "=", "value": "open"}],
+        "metrics": [{"name": "amt", "agg": "sum", "field": "Amount"}],
+        "dimensions": ["Region"],
+    }
+    out = est.estimate(plan)
+    assert out["tables"]["dbo.orders"]["filtered_rows"] == 900_000
+    assert out["join_rows"] == 900_000  # n:1 join keeps the order rows
+    assert out["result_rows"] == 5
+    assert out["scan_rows"] == 1_010_000 and out["stats_coverage"] == 1.0
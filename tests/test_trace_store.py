@@ -1,6 +1,8 @@
 from __future__ import annotations
 
+import os
 import tempfile
+import time
 from traces.trace_store import TraceStore
 
 
@@ -12,3 +14,138 @@ def test_trace_persist_and_load():
         doc = ts.load(run_id)
         assert doc["run_id"] == run_id
         assert "A_intent" in doc["nodes"]
+
+
+def test_append_mode_replays_same_document():
+    with tempfile.TemporaryDirectory() as d:
+        ts = TraceStore(d, mode="append")
+        run_id = ts.new_run()
+        ts.add_node(run_id, "A_intent", {"kpis": ["x"]})
+        ts.add_node(run_id, "A_intent", {"kpis": ["y"]})
+        ts.add_error(run_id, "B_schema_reasoning", "boom", "stack")
+        assert ts.get_node(run_id, "A_intent")["payload"] == {"kpis": ["y"]}
+        ts.finalize(run_id, status="failed")
+
+        doc = TraceStore(d, mode="append").load(run_id)
+        assert doc["status"] == "failed"
+        assert doc["errors"][0]["message"] == "boom"
+        assert [r["run_id"] for r in ts.list_runs()] == [run_id]
+
+
+def test_list_runs_paginates_and_filters_from_catalog():
+    with tempfile.TemporaryDirectory() as d:
+        ts = TraceStore(d, mode="append")
+        ids = [ts.new_run() for _ in range(3)]
+        ts.finalize(ids[0], status="success")
+        assert len(ts.list_runs(limit=2)) == 2
+        assert [r["run_id"] for r in ts.list_runs(status="success")] == [ids[0]]
+
+        # a fresh catalog is backfilled from the files on disk
+        (ts.base / "trace_catalog.sqlite").unlink()
+        for suffix in ("-wal", "-shm"):
+            p = ts.base / f"trace_catalog.sqlite{suffix}"
+            if p.exists():
+                p.unlink()
+        assert TraceStore(d).count_runs() == 3
+
+
+def test_session_buffers_writes_until_finalize():
+    with tempfile.TemporaryDirectory() as d:
+        ts = TraceStore(d, mode="append")
+        run_id = ts.new_run()
+        with ts.session(run_id):
+            ts.add_node(run_id, "A_intent", {"kpis": ["x"]})
+            assert ts.get_node(run_id, "A_intent")["payload"] == {"kpis": ["x"]}
+            assert "A_intent" not in TraceStore(d).load(run_id)["nodes"]
+            ts.finalize(run_id, status="success")
+            assert TraceStore(d).load(run_id)["status"] == "success"
+
+
+def test_session_keeps_payloads_as_recorded():
+    for mode in ("json", "append"):
+        with tempfile.TemporaryDirectory() as d:
+            ts = TraceStore(d, mode=mode)
+            run_id = ts.new_run()
+            plan = {"tables": ["dbo.sales"]}
+            with ts.session(run_id):
+                ts.add_node(run_id, "C_plan", plan)
+                plan["tables"] = ["recovered"]  # later stages keep editing the plan dict
+                plan["expected_columns"] = ["x"]
+                assert ts.get_node(run_id, "C_plan")["payload"] == {"tables": ["dbo.sales"]}
+                ts.finalize(run_id, status="success")
+            assert TraceStore(d).load(run_id)["nodes"]["C_plan"]["payload"] == {"tables": ["dbo.sales"]}
+
+
+def test_large_payloads_are_offloaded_and_deduplicated():
+    with tempfile.TemporaryDirectory() as d:
+        ts = TraceStore(d, mode="append", blob_threshold_bytes=1024)
+        html = {"html": "<div>" + "x" * 5000 + "</div>"}
+        run_a, run_b = ts.new_run(), ts.new_run()
+        ts.add_node(run_a, "J_dashboard__html", html)
+        ts.add_node(run_b, "J_dashboard__html", html)
+
+        raw = ts.load(run_a)["nodes"]["J_dashboard__html"]["payload"]
+        assert "$blob" in raw
+        assert ts.get_node(run_a, "J_dashboard__html")["payload"] == html
+        assert len(list((ts.base / "blobs").glob("*/*.json.gz"))) == 1
+
+
+def test_compact_compresses_prunes_and_reads_transparently():
+    with tempfile.TemporaryDirectory() as d:
+        ts = TraceStore(d, mode="append")
+        run_id = ts.new_run()
+        ts.add_node(run_id, "C_plan", {"tables": ["dbo.a"]})
+        ts.add_node(run_id, "C_plan__critique", {"confidence": 0.7})
+        ts.finalize(run_id, status="success")
+
+        later = time.time() + 40 * 86400
+        report = ts.compact(compress_after_days=7, critique_retention_days=30, now=later)
+        assert report["compressed"] == 1 and report["critique_pruned"] == 1
+        assert (ts.base / f"run_{run_id}.json.gz").exists()
+
+        doc = TraceStore(d).load(run_id)
+        assert list(doc["nodes"]) == ["C_plan"]
+        assert ts.list_runs()[0]["path"].endswith(".json.gz")
+
+        # writing again re-expands the run
+        ts.add_node(run_id, "D_human_review__applied", {"ok": True})
+        assert set(ts.load(run_id)["nodes"]) == {"C_plan", "D_human_review__applied"}
+
+
+def test_disk_budget_counts_blobs_of_deleted_runs():
+    with tempfile.TemporaryDirectory() as d:
+        ts = TraceStore(d, mode="append", blob_threshold_bytes=1024)
+        shared = {"rows": "x" * 5000}
+        for i in range(10):
+            run_id = ts.new_run()
+            ts.add_node(run_id, "G_execute", {"rows": os.urandom(20_000).hex()})
+            ts.add_node(run_id, "E_sql_generation", shared)
+            ts.finalize(run_id, status="success")
+            ts.catalog.upsert(run_id, created_at=1000 + i)
+
+        budget = ts.disk_usage() // 2
+        report = ts.compact(compress_after_days=1e9, max_total_bytes=budget)
+        assert 0 < report["deleted"] < 10
+        assert report["bytes_after"] <= budget
+        assert report["bytes_after"] > budget // 2  # stopped once the budget was met
+        # the blob still referenced by the remaining runs survives
+        assert len(list((ts.base / "blobs").glob("*/*.json.gz"))) == 10 - report["deleted"] + 1
+
+
+def test_stage_timings_feed_latency_percentiles():
+    from traces.analytics import stage_latency_percentiles
+
+    with tempfile.TemporaryDirectory() as d:
+        ts = TraceStore(d, mode="append")
+        for _ in range(3):
+            run_id = ts.new_run()
+            with ts.session(run_id):
+                ts.set_attrs(run_id, model="m1")
+                with ts.stage(run_id, "A_intent"):
+                    pass
+                ts.finalize(run_id, status="success")
+
+        df = stage_latency_percentiles(ts, group_by=["stage", "model"])
+        assert df.iloc[0]["stage"] == "A_intent"
+        assert df.iloc[0]["model"] == "m1" and int(df.iloc[0]["runs"]) == 3
+        assert len(ts.load(run_id)["stage_timings"]) == 1
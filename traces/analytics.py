@@ -0,0 +1,60 @@
+from __future__ import annotations
+
+from typing import Optional, Sequence
+import time
+
+import duckdb
+import pandas as pd
+
+from traces.trace_store import TraceStore
+
+GROUP_DIMENSIONS = ("stage", "model", "cache_hit", "status")
+
+
+def stage_latency_percentiles(
+    trace_store: TraceStore,
+    group_by: Sequence[str] = ("stage",),
+    since_days: Optional[float] = None,
+    only_ok: bool = True,
+) -> pd.DataFrame:
+    """
+    Cross-run latency report over the trace catalog's stage timings.
+
+    Returns one row per group with runs, count, mean and p50/p95/p99/max of
+    duration_ms. group_by may combine: stage, model, cache_hit, status.
+    """
+    dims = [g for g in group_by if g in GROUP_DIMENSIONS] or ["stage"]
+    started_after = time.time() - float(since_days) * 86400.0 if since_days else None
+
+    if trace_store.catalog.get_meta("backfilled") is None:
+        trace_store.rebuild_index()
+
+    cols = ["run_id", "stage", "started_at", "ended_at", "duration_ms", "ok", "model", "cache_hit", "status"]
+    timings = pd.DataFrame(trace_store.catalog.stage_timings(started_after=started_after), columns=cols)
+    if timings.empty:
+        return pd.DataFrame(columns=dims + ["runs", "n", "mean_ms", "p50_ms", "p95_ms", "p99_ms", "max_ms"])
+
+    dim_sql = ", ".join(dims)
+    where = "WHERE ok = 1" if only_ok else ""
+    con = duckdb.connect(database=":memory:")
+    try:
+        con.register("stage_timings", timings)
+        return con.execute(
+            f"""
+            SELECT
+              {dim_sql},
+              COUNT(DISTINCT run_id)                     AS runs,
+              COUNT(1)                                   AS n,
+              ROUND(AVG(duration_ms), 3)                 AS mean_ms,
+              ROUND(quantile_cont(duration_ms, 0.50), 3) AS p50_ms,
+              ROUND(quantile_cont(duration_ms, 0.95), 3) AS p95_ms,
+              ROUND(quantile_cont(duration_ms, 0.99), 3) AS p99_ms,
+              ROUND(MAX(duration_ms), 3)                 AS max_ms
+            FROM stage_timings
+            {where}
+            GROUP BY {dim_sql}
+            ORDER BY {dim_sql}
+            """
+        ).df()
+    finally:
+        con.close()
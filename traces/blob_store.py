@@ -0,0 +1,132 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, Iterable, Optional
+import gzip
+import hashlib
+import json
+import os
+import time
+import uuid
+
+from utils.json_sanitize import json_sanitize
+
+BLOB_REF_KEY = "$blob"
+
+
+@dataclass
+class TraceBlobStore:
+    """
+    Content-addressed store for large trace payloads.
+
+    Each payload is serialized to canonical JSON, gzip-compressed and written once to:
+      <root>/<sha[:2]>/<sha>.json.gz
+
+    Identical payloads (across nodes or runs) map to the same file. Traces keep only
+    a small reference dict: {"$blob": sha, "bytes": <uncompressed size>, "preview": ...}.
+    """
+
+    root: Path
+
+    def __post_init__(self) -> None:
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def path_for(self, digest: str) -> Path:
+        return self.root / digest[:2] / f"{digest}.json.gz"
+
+    def put(self, data: bytes) -> str:
+        digest = hashlib.sha256(data).hexdigest()
+        path = self.path_for(digest)
+        if path.exists():
+            return digest
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f".{digest}.{uuid.uuid4().hex[:8]}.tmp")
+        try:
+            with gzip.open(tmp, "wb", compresslevel=6) as f:
+                f.write(data)
+            os.replace(tmp, path)
+        finally:
+            if tmp.exists():
+                tmp.unlink()
+        return digest
+
+    def get(self, digest: str) -> Any:
+        with gzip.open(self.path_for(digest), "rb") as f:
+            return json.loads(f.read().decode("utf-8"))
+
+    def offload(self, payload: Any, threshold_bytes: int) -> Any:
+        """
+        Returns a blob reference when the serialized payload exceeds threshold_bytes,
+        otherwise the payload unchanged. threshold_bytes <= 0 disables offloading.
+        """
+        if threshold_bytes <= 0 or payload is None or is_blob_ref(payload):
+            return payload
+        data = json.dumps(payload, default=json_sanitize, sort_keys=True, ensure_ascii=False).encode("utf-8")
+        if len(data) <= threshold_bytes:
+            return payload
+        digest = self.put(data)
+        return {BLOB_REF_KEY: digest, "bytes": len(data), "preview": _preview(payload)}
+
+    def resolve(self, payload: Any) -> Any:
+        """
+        Loads the payload behind a blob reference (non-references pass through).
+        A missing blob resolves to a small marker instead of raising.
+        """
+        if not is_blob_ref(payload):
+            return payload
+        try:
+            return self.get(payload[BLOB_REF_KEY])
+        except FileNotFoundError:
+            return {"blob_missing": payload[BLOB_REF_KEY], "preview": payload.get("preview")}
+
+    def sweep(self, referenced: Iterable[str], min_age_seconds: float = 0) -> int:
+        """
+        Deletes blobs not present in `referenced`. Returns bytes reclaimed.
+        Blobs younger than min_age_seconds are kept (they may belong to a node
+        that is written but not yet flushed).
+        """
+        keep = set(referenced)
+        cutoff = time.time() - float(min_age_seconds or 0)
+        reclaimed = 0
+        for p in self.root.glob("*/*.json.gz"):
+            digest = p.name.split(".", 1)[0]
+            if digest in keep:
+                continue
+            try:
+                st = p.stat()
+                if st.st_mtime > cutoff:
+                    continue
+                reclaimed += st.st_size
+                p.unlink()
+            except OSError:
+                continue
+        return reclaimed
+
+    def delete(self, digest: str) -> int:
+        """
+        Removes one blob. Returns bytes reclaimed (0 if it was already gone).
+        """
+        path = self.path_for(digest)
+        try:
+            size = path.stat().st_size
+            path.unlink()
+        except OSError:
+            return 0
+        return size
+
+    def total_bytes(self) -> int:
+        return sum(p.stat().st_size for p in self.root.glob("*/*.json.gz"))
+
+
+def is_blob_ref(payload: Any) -> bool:
+    return isinstance(payload, dict) and isinstance(payload.get(BLOB_REF_KEY), str)
+
+
+def _preview(payload: Any) -> Optional[Dict[str, Any]]:
+    if isinstance(payload, dict):
+        return {"keys": sorted(str(k) for k in payload.keys())[:20]}
+    if isinstance(payload, list):
+        return {"items": len(payload)}
+    return None
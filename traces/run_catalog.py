@@ -0,0 +1,251 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+import sqlite3
+import time
+
+
+@dataclass
+class RunCatalog:
+    """
+    Small SQLite index over trace runs (lives next to the trace files).
+    Lets list_runs() page/filter without opening every run file.
+
+    Table runs:
+      - run_id       (text, primary key)
+      - created_at   (epoch seconds)
+      - status       (text)
+      - finalized_at (epoch seconds, nullable)
+      - path         (trace file path)
+      - updated_at   (epoch seconds)
+      - model        (LLM model used by the run)
+      - cache_hit    (1/0 once G_execute ran)
+
+    Table stage_timings (one row per executed pipeline stage):
+      - run_id, stage, started_at, ended_at (epoch seconds, float), duration_ms, ok
+    """
+
+    db_path: Path
+
+    def __post_init__(self) -> None:
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._init_db()
+
+    def _conn(self) -> sqlite3.Connection:
+        con = sqlite3.connect(str(self.db_path), timeout=30)
+        con.row_factory = sqlite3.Row
+        return con
+
+    def _init_db(self) -> None:
+        con = self._conn()
+        try:
+            con.execute("PRAGMA journal_mode=WAL;")
+            con.execute(
+                """
+                CREATE TABLE IF NOT EXISTS runs (
+                    run_id       TEXT PRIMARY KEY,
+                    created_at   INTEGER,
+                    status       TEXT,
+                    finalized_at INTEGER,
+                    path         TEXT,
+                    updated_at   INTEGER
+                );
+                """
+            )
+            # Migration-safe: add columns introduced after the first catalog version
+            for ddl in ("ALTER TABLE runs ADD COLUMN model TEXT;", "ALTER TABLE runs ADD COLUMN cache_hit INTEGER;"):
+                try:
+                    con.execute(ddl)
+                except sqlite3.OperationalError:
+                    pass
+            con.execute(
+                """
+                CREATE TABLE IF NOT EXISTS stage_timings (
+                    run_id      TEXT NOT NULL,
+                    stage       TEXT NOT NULL,
+                    started_at  REAL,
+                    ended_at    REAL,
+                    duration_ms REAL,
+                    ok          INTEGER
+                );
+                """
+            )
+            con.execute("CREATE INDEX IF NOT EXISTS ix_stage_run ON stage_timings (run_id);")
+            con.execute("CREATE INDEX IF NOT EXISTS ix_stage_started ON stage_timings (started_at);")
+            con.execute("CREATE INDEX IF NOT EXISTS ix_runs_created ON runs (created_at DESC);")
+            con.execute("CREATE INDEX IF NOT EXISTS ix_runs_status ON runs (status, created_at DESC);")
+            con.execute("CREATE TABLE IF NOT EXISTS catalog_meta (key TEXT PRIMARY KEY, value TEXT);")
+            con.commit()
+        finally:
+            con.close()
+
+    def upsert(
+        self,
+        run_id: str,
+        *,
+        created_at: Optional[int] = None,
+        status: Optional[str] = None,
+        finalized_at: Optional[int] = None,
+        path: Optional[str] = None,
+        model: Optional[str] = None,
+        cache_hit: Optional[bool] = None,
+    ) -> None:
+        """
+        Inserts a run or updates only the fields that are given (None = keep).
+        """
+        con = self._conn()
+        try:
+            con.execute(
+                """
+                INSERT INTO runs (run_id, created_at, status, finalized_at, path, updated_at, model, cache_hit)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (run_id) DO UPDATE SET
+                    created_at   = COALESCE(excluded.created_at, runs.created_at),
+                    status       = COALESCE(excluded.status, runs.status),
+                    finalized_at = COALESCE(excluded.finalized_at, runs.finalized_at),
+                    path         = COALESCE(excluded.path, runs.path),
+                    updated_at   = excluded.updated_at,
+                    model        = COALESCE(excluded.model, runs.model),
+                    cache_hit    = COALESCE(excluded.cache_hit, runs.cache_hit);
+                """,
+                [
+                    run_id, created_at, status, finalized_at, path, int(time.time()),
+                    model, None if cache_hit is None else int(bool(cache_hit)),
+                ],
+            )
+            con.commit()
+        finally:
+            con.close()
+
+    def list_runs(
+        self,
+        *,
+        limit: Optional[int] = None,
+        offset: int = 0,
+        status: Optional[str] = None,
+        created_after: Optional[int] = None,
+        created_before: Optional[int] = None,
+    ) -> List[Dict[str, Any]]:
+        where: List[str] = []
+        params: List[Any] = []
+        if status:
+            where.append("status = ?")
+            params.append(status)
+        if created_after is not None:
+            where.append("created_at >= ?")
+            params.append(int(created_after))
+        if created_before is not None:
+            where.append("created_at < ?")
+            params.append(int(created_before))
+
+        sql = "SELECT run_id, created_at, status, finalized_at, path FROM runs"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY created_at DESC, run_id DESC LIMIT ? OFFSET ?"
+        params.extend([int(limit) if limit is not None else -1, max(0, int(offset or 0))])
+
+        con = self._conn()
+        try:
+            return [dict(r) for r in con.execute(sql, params).fetchall()]
+        finally:
+            con.close()
+
+    def count(self, status: Optional[str] = None) -> int:
+        con = self._conn()
+        try:
+            if status:
+                row = con.execute("SELECT COUNT(1) FROM runs WHERE status = ?", [status]).fetchone()
+            else:
+                row = con.execute("SELECT COUNT(1) FROM runs").fetchone()
+            return int(row[0] or 0)
+        finally:
+            con.close()
+
+    def add_stage_timings(self, run_id: str, timings: List[Dict[str, Any]], replace: bool = False) -> None:
+        """
+        Appends stage timing rows for a run (replace=True rewrites the run's rows).
+        """
+        rows = [
+            [
+                run_id,
+                t.get("stage"),
+                t.get("started_at"),
+                t.get("ended_at"),
+                t.get("duration_ms"),
+                int(bool(t.get("ok", True))),
+            ]
+            for t in timings
+        ]
+        con = self._conn()
+        try:
+            if replace:
+                con.execute("DELETE FROM stage_timings WHERE run_id = ?", [run_id])
+            if rows:
+                con.executemany(
+                    "INSERT INTO stage_timings (run_id, stage, started_at, ended_at, duration_ms, ok) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    rows,
+                )
+            con.commit()
+        finally:
+            con.close()
+
+    def stage_timings(self, started_after: Optional[float] = None) -> List[Dict[str, Any]]:
+        """
+        Stage rows joined with run-level attributes (model, cache_hit, status).
+        """
+        sql = (
+            "SELECT s.run_id, s.stage, s.started_at, s.ended_at, s.duration_ms, s.ok, "
+            "r.model, r.cache_hit, r.status "
+            "FROM stage_timings s LEFT JOIN runs r ON r.run_id = s.run_id"
+        )
+        params: List[Any] = []
+        if started_after is not None:
+            sql += " WHERE s.started_at >= ?"
+            params.append(float(started_after))
+        con = self._conn()
+        try:
+            return [dict(r) for r in con.execute(sql, params).fetchall()]
+        finally:
+            con.close()
+
+    def delete(self, run_ids: Iterable[str]) -> None:
+        ids = [[r] for r in run_ids]
+        if not ids:
+            return
+        con = self._conn()
+        try:
+            con.executemany("DELETE FROM stage_timings WHERE run_id = ?", ids)
+            con.executemany("DELETE FROM runs WHERE run_id = ?", ids)
+            con.commit()
+        finally:
+            con.close()
+
+    def run_ids(self) -> List[str]:
+        con = self._conn()
+        try:
+            return [r[0] for r in con.execute("SELECT run_id FROM runs").fetchall()]
+        finally:
+            con.close()
+
+    def get_meta(self, key: str) -> Optional[str]:
+        con = self._conn()
+        try:
+            row = con.execute("SELECT value FROM catalog_meta WHERE key = ?", [key]).fetchone()
+            return row[0] if row else None
+        finally:
+            con.close()
+
+    def set_meta(self, key: str, value: str) -> None:
+        con = self._conn()
+        try:
+            con.execute(
+                "INSERT INTO catalog_meta (key, value) VALUES (?, ?) "
+                "ON CONFLICT (key) DO UPDATE SET value = excluded.value",
+                [key, value],
+            )
+            con.commit()
+        finally:
+            con.close()
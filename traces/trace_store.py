@@ -1,22 +1,77 @@
 from __future__ import annotations
 
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
 from pathlib import Path
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+import copy
+import gzip
 import json
+import os
+import threading
 import time
 import uuid
 import difflib
 from utils.json_sanitize import json_sanitize
+from traces.run_catalog import RunCatalog
+from traces.blob_store import TraceBlobStore, is_blob_ref
+
+TRACE_MODES = ("json", "append")
+
+
+@dataclass
+class _TraceSession:
+    """
+    In-memory write-behind buffer for one run (see TraceStore.session).
+    """
+
+    doc: Dict[str, Any]
+    flush_interval_seconds: float
+    flush_on_error: bool
+    pending: List[Dict[str, Any]] = field(default_factory=list)
+    last_flush: float = field(default_factory=time.monotonic)
+
 
 class TraceStore:
     """
     Persists traces to /traces as JSON. Survives restarts.
     Provides list/load/diff APIs.
+
+    Storage modes:
+    - "json":   one pretty-printed run_<id>.json, rewritten on every write (legacy)
+    - "append": one run_<id>.jsonl segment per run; every write appends a single
+                record and load() replays the records into the same document shape.
+                Write cost per run is O(nodes) instead of O(nodes²).
+
+    Both layouts are always readable, whatever the configured mode.
+
+    Run metadata (id/created_at/status) is mirrored into a SQLite catalog
+    (trace_catalog.sqlite) so list_runs() can page and filter cheaply.
+
+    Node payloads larger than blob_threshold_bytes are offloaded to a
+    content-addressed blob store (<traces_dir>/blobs); the trace keeps only a
+    reference. load() returns references as-is, get_node()/resolve_payload()
+    load the blob on demand.
+
+    compact() gzips old finalized runs into run_<id>.json.gz, prunes critique
+    nodes of old successful runs and enforces a disk budget. Compacted runs are
+    read transparently and re-expanded if they are written to again.
     """
 
-    def __init__(self, traces_dir: str):
+    def __init__(self, traces_dir: str, mode: str = "json", blob_threshold_bytes: int = 0):
         self.base = Path(traces_dir)
         self.base.mkdir(parents=True, exist_ok=True)
+        if mode not in TRACE_MODES:
+            raise ValueError(f"Unknown trace store mode: {mode!r} (expected one of {TRACE_MODES})")
+        self.mode = mode
+
+        # run_id -> (bytes consumed from the segment file, replayed doc)
+        self._segment_cache: Dict[str, Tuple[int, Dict[str, Any]]] = {}
+        self._lock = threading.RLock()
+        self._sessions: Dict[str, _TraceSession] = {}
+        self.catalog = RunCatalog(self.base / "trace_catalog.sqlite")
+        self.blobs = TraceBlobStore(self.base / "blobs")
+        self.blob_threshold_bytes = int(blob_threshold_bytes or 0)
 
     def new_run(self) -> str:
         run_id = uuid.uuid4().hex[:12]
@@ -27,71 +82,566 @@ class TraceStore:
             "nodes": {},
             "errors": [],
         }
-        self._save(run_id, doc)
+        self._write(run_id, {"op": "new_run", "doc": doc})
         return run_id
 
     def add_node(self, run_id: str, node: str, payload: Any) -> None:
-        doc = self.load(run_id)
-        nodes = doc.setdefault("nodes", {})
-        nodes[node] = {
-            "timestamp": int(time.time()),
-            "payload": payload,
-        }
-        self._save(run_id, doc)
+        # offload + write under the lock, so compact() cannot delete a blob
+        # between it being (re)used here and its reference being recorded
+        with self._lock:
+            self._write(run_id, {
+                "op": "node",
+                "node": node,
+                "timestamp": int(time.time()),
+                "payload": self.blobs.offload(payload, self.blob_threshold_bytes),
+            })
 
     def add_error(self, run_id: str, node: str, message: str, stack: str) -> None:
-        doc = self.load(run_id)
-        doc.setdefault("errors", []).append({
+        self._write(run_id, {
+            "op": "error",
             "timestamp": int(time.time()),
             "node": node,
             "message": message,
             "stack": stack,
         })
-        doc["status"] = "failed"
-        self._save(run_id, doc)
+
+    @contextmanager
+    def stage(self, run_id: str, stage: str) -> Iterator[None]:
+        """
+        Records high-resolution wall-clock start/end and duration for a pipeline stage.
+        The timing is written even if the stage raises (ok=False).
+        """
+        started_at = time.time()
+        t0 = time.perf_counter()
+        ok = False
+        try:
+            yield
+            ok = True
+        finally:
+            elapsed = time.perf_counter() - t0
+            self._write(run_id, {
+                "op": "stage",
+                "stage": stage,
+                "started_at": started_at,
+                "ended_at": started_at + elapsed,
+                "duration_ms": round(elapsed * 1000.0, 3),
+                "ok": ok,
+            })
+
+    def set_attrs(self, run_id: str, **attrs: Any) -> None:
+        """
+        Run-level attributes used for analytics (e.g. model, cache_hit).
+        """
+        self._write(run_id, {"op": "attrs", "attrs": attrs})
 
     def finalize(self, run_id: str, status: str) -> None:
-        doc = self.load(run_id)
-        doc["status"] = status
-        doc["finalized_at"] = int(time.time())
-        self._save(run_id, doc)
+        self._write(run_id, {"op": "finalize", "status": status, "finalized_at": int(time.time())})
+
+    @contextmanager
+    def session(
+        self,
+        run_id: str,
+        flush_interval_seconds: float = 0.0,
+        flush_on_error: bool = True,
+    ) -> Iterator["TraceStore"]:
+        """
+        Holds the run document in memory for the duration of the block.
+        Writes are buffered and load/get_node are served from memory; the
+        buffer is flushed to disk:
+          - on finalize()
+          - on add_error() when flush_on_error is True
+          - when flush_interval_seconds (> 0) have elapsed since the last flush
+          - when the block exits (including on exceptions)
+        Re-entering a session for a run that already has one is a no-op.
+        """
+        with self._lock:
+            if run_id in self._sessions:
+                owner = False
+            else:
+                owner = True
+                self._sessions[run_id] = _TraceSession(
+                    doc=copy.deepcopy(self._load_shared(run_id)),
+                    flush_interval_seconds=float(flush_interval_seconds or 0.0),
+                    flush_on_error=bool(flush_on_error),
+                )
+        try:
+            yield self
+        finally:
+            if owner:
+                with self._lock:
+                    sess = self._sessions.pop(run_id)
+                    self._flush(run_id, sess)
+
+    def flush(self, run_id: str) -> None:
+        with self._lock:
+            sess = self._sessions.get(run_id)
+            if sess is not None:
+                self._flush(run_id, sess)
 
-    def list_runs(self) -> List[Dict[str, Any]]:
-        runs = []
-        for p in sorted(self.base.glob("run_*.json"), reverse=True):
+    def list_runs(
+        self,
+        limit: Optional[int] = None,
+        offset: int = 0,
+        status: Optional[str] = None,
+        created_after: Optional[int] = None,
+        created_before: Optional[int] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Newest-first run listing served from the catalog (no trace files are parsed).
+        created_after/created_before are epoch seconds (after inclusive, before exclusive).
+        """
+        if self.catalog.get_meta("backfilled") is None:
+            self.rebuild_index()
+        rows = self.catalog.list_runs(
+            limit=limit,
+            offset=offset,
+            status=status,
+            created_after=created_after,
+            created_before=created_before,
+        )
+        return [
+            {
+                "run_id": r["run_id"],
+                "created_at": r["created_at"],
+                "status": r["status"],
+                "path": r["path"],
+            }
+            for r in rows
+        ]
+
+    def count_runs(self, status: Optional[str] = None) -> int:
+        if self.catalog.get_meta("backfilled") is None:
+            self.rebuild_index()
+        return self.catalog.count(status=status)
+
+    def rebuild_index(self) -> int:
+        """
+        Backfills the run catalog from the trace files on disk and drops
+        catalog rows whose files no longer exist. Returns the number of runs indexed.
+        """
+        seen: List[str] = []
+        for p in self._run_files():
             try:
-                doc = json.loads(p.read_text(encoding="utf-8"))
-                runs.append({
-                    "run_id": doc.get("run_id"),
-                    "created_at": doc.get("created_at"),
-                    "status": doc.get("status"),
-                    "path": p.as_posix(),
-                })
+                doc = self._read_path(p)
             except Exception:
                 continue
-        return runs
+            run_id = doc.get("run_id") or self._run_id_from_path(p)
+            self.catalog.upsert(
+                run_id,
+                created_at=doc.get("created_at"),
+                status=doc.get("status"),
+                finalized_at=doc.get("finalized_at"),
+                path=p.as_posix(),
+                model=(doc.get("attrs") or {}).get("model"),
+                cache_hit=(doc.get("attrs") or {}).get("cache_hit"),
+            )
+            self.catalog.add_stage_timings(run_id, doc.get("stage_timings") or [], replace=True)
+            seen.append(run_id)
+
+        stale = set(self.catalog.run_ids()) - set(seen)
+        self.catalog.delete(stale)
+        self.catalog.set_meta("backfilled", str(int(time.time())))
+        return len(seen)
 
     def load(self, run_id: str) -> Dict[str, Any]:
-        p = self._path(run_id)
-        if not p.exists():
-            return {"run_id": run_id, "status": "missing", "nodes": {}, "errors": []}
-        return json.loads(p.read_text(encoding="utf-8"))
+        return copy.deepcopy(self._load_shared(run_id))
 
     def get_node(self, run_id: str, node: str) -> Any:
-        doc = self.load(run_id)
-        return doc.get("nodes", {}).get(node)
+        doc = self._load_shared(run_id)
+        n = copy.deepcopy(doc.get("nodes", {}).get(node))
+        if isinstance(n, dict) and "payload" in n:
+            n["payload"] = self.resolve_payload(n["payload"])
+        return n
+
+    def resolve_payload(self, payload: Any) -> Any:
+        return self.blobs.resolve(payload)
 
     def diff_runs(self, run_a: str, run_b: str, keys: Optional[List[str]] = None) -> str:
-        a = self.load(run_a)
-        b = self.load(run_b)
         keys = keys or ["C_plan", "E_sql_generation", "I_insights", "J_dashboard"]
-        sa = json.dumps({k: a.get("nodes", {}).get(k, {}) for k in keys}, indent=2, default = json_sanitize, sort_keys=True)
-        sb = json.dumps({k: b.get("nodes", {}).get(k, {}) for k in keys}, indent=2, default = json_sanitize, sort_keys=True)
+        a = {k: self.get_node(run_a, k) or {} for k in keys}
+        b = {k: self.get_node(run_b, k) or {} for k in keys}
+        sa = json.dumps(a, indent=2, default = json_sanitize, sort_keys=True)
+        sb = json.dumps(b, indent=2, default = json_sanitize, sort_keys=True)
         diff = difflib.unified_diff(sa.splitlines(), sb.splitlines(), fromfile=run_a, tofile=run_b, lineterm="")
         return "\n".join(diff)
 
+    # -----------------------------
+    # retention / compaction
+    # -----------------------------
+    def compact(
+        self,
+        compress_after_days: float = 7,
+        critique_retention_days: float = 30,
+        max_total_bytes: int = 0,
+        now: Optional[float] = None,
+    ) -> Dict[str, Any]:
+        """
+        Maintenance job for traces_data/:
+        - finalized runs older than compress_after_days are rewritten as gzip JSON
+        - successful runs older than critique_retention_days lose their *__critique nodes
+        - if max_total_bytes > 0, the oldest finalized runs are deleted until the
+          trace files + blobs fit the budget; a deleted run's blobs are removed
+          as soon as no remaining run references them
+        Runs that are still "started" or have a live session are never touched.
+        Returns a report including bytes reclaimed.
+        """
+        now = float(now if now is not None else time.time())
+        bytes_before = self.disk_usage()
+        report: Dict[str, Any] = {
+            "runs_scanned": 0,
+            "compressed": 0,
+            "critique_pruned": 0,
+            "deleted": 0,
+            "blob_bytes_swept": 0,
+        }
+
+        candidates: List[Dict[str, Any]] = []
+        for r in self.list_runs():
+            report["runs_scanned"] += 1
+            if r.get("status") in (None, "started", "missing") or r["run_id"] in self._sessions:
+                continue
+            candidates.append(r)
+
+        for r in candidates:
+            run_id = r["run_id"]
+            age_days = (now - float(r.get("created_at") or now)) / 86400.0
+            prune = r.get("status") == "success" and age_days > float(critique_retention_days)
+            compress = age_days > float(compress_after_days)
+            if not (prune or compress):
+                continue
+
+            with self._lock:
+                if run_id in self._sessions:
+                    continue
+                doc = copy.deepcopy(self._load_shared(run_id))
+                pruned = False
+                if prune:
+                    nodes = doc.get("nodes", {})
+                    noisy = [k for k in nodes if k.endswith("__critique")]
+                    for k in noisy:
+                        nodes.pop(k, None)
+                    pruned = bool(noisy)
+
+                already_compressed = self._gz_path(run_id).exists()
+                if (compress and not already_compressed) or pruned:
+                    self._write_compacted(run_id, doc)
+                    report["compressed"] += int(not already_compressed)
+                    report["critique_pruned"] += int(pruned)
+
+        deleted_any = False
+        if max_total_bytes and max_total_bytes > 0:
+            oldest_first = sorted(candidates, key=lambda x: (x.get("created_at") or 0, x["run_id"]))
+            with self._lock:
+                # usage is walked once and reduced per deletion
+                usage = self.disk_usage()
+                run_blobs = self._blob_refs()
+                refcount: Dict[str, int] = {}
+                for digests in run_blobs.values():
+                    for digest in digests:
+                        refcount[digest] = refcount.get(digest, 0) + 1
+                for r in oldest_first:
+                    if usage <= max_total_bytes:
+                        break
+                    run_id = r["run_id"]
+                    if run_id in self._sessions:
+                        continue
+                    usage -= self._run_bytes(run_id)
+                    self._delete_run(run_id)
+                    for digest in run_blobs.get(run_id, ()):
+                        refcount[digest] -= 1
+                        if refcount[digest] == 0:
+                            freed = self.blobs.delete(digest)
+                            usage -= freed
+                            report["blob_bytes_swept"] += freed
+                    report["deleted"] += 1
+                    deleted_any = True
+
+        if deleted_any or report["critique_pruned"]:
+            report["blob_bytes_swept"] += self.blobs.sweep(self._referenced_blobs(), min_age_seconds=3600)
+
+        bytes_after = self.disk_usage()
+        report.update({
+            "bytes_before": bytes_before,
+            "bytes_after": bytes_after,
+            "bytes_reclaimed": max(0, bytes_before - bytes_after),
+        })
+        return report
+
+    def disk_usage(self) -> int:
+        total = 0
+        for p in self._run_files():
+            try:
+                total += p.stat().st_size
+            except OSError:
+                continue
+        return total + self.blobs.total_bytes()
+
+    def _write_compacted(self, run_id: str, doc: Dict[str, Any]) -> None:
+        gz = self._gz_path(run_id)
+        tmp = gz.with_name(gz.name + ".tmp")
+        with gzip.open(tmp, "wt", encoding="utf-8", compresslevel=9) as f:
+            f.write(json.dumps(doc, default=json_sanitize, ensure_ascii=False))
+        os.replace(tmp, gz)
+        for p in (self._segment_path(run_id), self._path(run_id)):
+            if p.exists():
+                p.unlink()
+        self._segment_cache.pop(run_id, None)
+        self.catalog.upsert(run_id, path=gz.as_posix())
+
+    def _delete_run(self, run_id: str) -> None:
+        for p in (self._segment_path(run_id), self._path(run_id), self._gz_path(run_id)):
+            if p.exists():
+                p.unlink()
+        self._segment_cache.pop(run_id, None)
+        self.catalog.delete([run_id])
+
+    def _run_bytes(self, run_id: str) -> int:
+        total = 0
+        for p in (self._segment_path(run_id), self._path(run_id), self._gz_path(run_id)):
+            try:
+                total += p.stat().st_size
+            except OSError:
+                continue
+        return total
+
+    def _blob_refs(self) -> Dict[str, Set[str]]:
+        """
+        run_id -> blob digests its nodes reference (live sessions included).
+        """
+        docs: List[Tuple[str, Dict[str, Any]]] = [(rid, sess.doc) for rid, sess in list(self._sessions.items())]
+        for p in self._run_files():
+            try:
+                docs.append((self._run_id_from_path(p), self._read_path(p)))
+            except Exception:
+                continue
+        refs: Dict[str, Set[str]] = {}
+        for run_id, doc in docs:
+            digests = refs.setdefault(run_id, set())
+            for n in (doc.get("nodes") or {}).values():
+                payload = n.get("payload") if isinstance(n, dict) else None
+                if is_blob_ref(payload):
+                    digests.add(payload["$blob"])
+        return refs
+
+    def _referenced_blobs(self) -> List[str]:
+        return sorted(set().union(*self._blob_refs().values()))
+
+    # -----------------------------
+    # storage internals
+    # -----------------------------
     def _path(self, run_id: str) -> Path:
         return self.base / f"run_{run_id}.json"
 
+    def _segment_path(self, run_id: str) -> Path:
+        return self.base / f"run_{run_id}.jsonl"
+
+    def _gz_path(self, run_id: str) -> Path:
+        return self.base / f"run_{run_id}.json.gz"
+
     def _save(self, run_id: str, doc: Dict[str, Any]) -> None:
         self._path(run_id).write_text(json.dumps(doc, indent=2,default = json_sanitize), encoding="utf-8")
+
+    def _write(self, run_id: str, record: Dict[str, Any]) -> None:
+        with self._lock:
+            sess = self._sessions.get(run_id)
+            if sess is None:
+                self._commit(run_id, [record])
+                return
+
+            # snapshot now (as it would be persisted): callers keep mutating their
+            # payloads (e.g. the plan) after recording them, and the buffer must not follow
+            record = json.loads(json.dumps(record, default=json_sanitize, ensure_ascii=False))
+            _apply_record(sess.doc, record)
+            sess.pending.append(record)
+            op = record.get("op")
+            due = sess.flush_interval_seconds > 0 and (
+                time.monotonic() - sess.last_flush >= sess.flush_interval_seconds
+            )
+            if op == "finalize" or (op == "error" and sess.flush_on_error) or due:
+                self._flush(run_id, sess)
+
+    def _flush(self, run_id: str, sess: _TraceSession) -> None:
+        records, sess.pending = sess.pending, []
+        sess.last_flush = time.monotonic()
+        self._commit(run_id, records)
+
+    def _commit(self, run_id: str, records: List[Dict[str, Any]]) -> None:
+        """
+        Persists records for one run using the file layout the run already has.
+        A run started under one mode keeps its layout if the mode changes later.
+        """
+        if not records:
+            return
+        self._thaw(run_id)
+        seg = self._segment_path(run_id)
+        legacy = self._path(run_id)
+        use_segment = seg.exists() or (self.mode == "append" and not legacy.exists())
+
+        if use_segment:
+            lines = "".join(
+                json.dumps(r, default=json_sanitize, ensure_ascii=False) + "\n" for r in records
+            )
+            with seg.open("a", encoding="utf-8") as f:
+                f.write(lines)
+            self._index(run_id, records, seg)
+            return
+
+        # always start from the file: a live session's doc already has these records applied
+        doc = json.loads(legacy.read_text(encoding="utf-8")) if legacy.exists() else _empty_doc(run_id)
+        for r in records:
+            _apply_record(doc, r)
+        self._save(run_id, doc)
+        self._index(run_id, records, legacy)
+
+    def _thaw(self, run_id: str) -> None:
+        """
+        Re-expands a compacted run before it is written to again
+        (e.g. a needs_human_review run that is resumed later).
+        """
+        gz = self._gz_path(run_id)
+        if not gz.exists():
+            return
+        doc = self._read_path(gz)
+        if self.mode == "append":
+            seg = self._segment_path(run_id)
+            seg.write_text(
+                json.dumps({"op": "new_run", "doc": doc}, default=json_sanitize, ensure_ascii=False) + "\n",
+                encoding="utf-8",
+            )
+            path = seg
+        else:
+            self._save(run_id, doc)
+            path = self._path(run_id)
+        gz.unlink()
+        self._segment_cache.pop(run_id, None)
+        self.catalog.upsert(run_id, path=path.as_posix())
+
+    def _index(self, run_id: str, records: List[Dict[str, Any]], path: Path) -> None:
+        """
+        Mirrors run-level changes into the catalog. Node records don't touch it,
+        so the per-node write path stays a plain file append.
+        """
+        fields: Dict[str, Any] = {}
+        timings: List[Dict[str, Any]] = []
+        for r in records:
+            op = r.get("op")
+            if op == "new_run":
+                doc = r.get("doc") or {}
+                fields.update(created_at=doc.get("created_at"), status=doc.get("status"), path=path.as_posix())
+            elif op == "error":
+                fields["status"] = "failed"
+            elif op == "finalize":
+                fields.update(status=r.get("status"), finalized_at=r.get("finalized_at"))
+            elif op == "attrs":
+                attrs = r.get("attrs") or {}
+                for k in ("model", "cache_hit"):
+                    if attrs.get(k) is not None:
+                        fields[k] = attrs[k]
+            elif op == "stage":
+                timings.append(r)
+        if fields:
+            self.catalog.upsert(run_id, **fields)
+        if timings:
+            self.catalog.add_stage_timings(run_id, timings)
+
+    def _load_shared(self, run_id: str) -> Dict[str, Any]:
+        """
+        Returns the cached document for a run. Callers must not mutate it.
+        """
+        with self._lock:
+            sess = self._sessions.get(run_id)
+            if sess is not None:
+                return sess.doc
+            seg = self._segment_path(run_id)
+            if seg.exists():
+                return self._replay_segment(run_id, seg)
+            p = self._path(run_id)
+            if p.exists():
+                return json.loads(p.read_text(encoding="utf-8"))
+            gz = self._gz_path(run_id)
+            if gz.exists():
+                return self._read_path(gz)
+            return {"run_id": run_id, "status": "missing", "nodes": {}, "errors": []}
+
+    def _replay_segment(self, run_id: str, seg: Path) -> Dict[str, Any]:
+        """
+        Incrementally replays a segment file: only bytes appended since the last
+        read are parsed, so repeated get_node() calls on a live run stay cheap.
+        """
+        size = seg.stat().st_size
+        offset, doc = self._segment_cache.get(run_id, (0, None))
+        if doc is None or size < offset:
+            offset, doc = 0, _empty_doc(run_id)
+
+        if size > offset:
+            with seg.open("rb") as f:
+                f.seek(offset)
+                chunk = f.read(size - offset)
+            # ignore a trailing partial line (writer mid-append); it is picked up next time
+            end = chunk.rfind(b"\n") + 1
+            for line in chunk[:end].splitlines():
+                if not line.strip():
+                    continue
+                try:
+                    _apply_record(doc, json.loads(line))
+                except Exception:
+                    continue
+            offset += end
+
+        self._segment_cache[run_id] = (offset, doc)
+        return doc
+
+    def _run_files(self) -> List[Path]:
+        return (
+            list(self.base.glob("run_*.json"))
+            + list(self.base.glob("run_*.jsonl"))
+            + list(self.base.glob("run_*.json.gz"))
+        )
+
+    def _run_id_from_path(self, p: Path) -> str:
+        return p.name[len("run_"):].split(".", 1)[0]
+
+    def _read_path(self, p: Path) -> Dict[str, Any]:
+        if p.suffix == ".jsonl":
+            run_id = self._run_id_from_path(p)
+            with self._lock:
+                return self._replay_segment(run_id, p)
+        if p.suffix == ".gz":
+            with gzip.open(p, "rt", encoding="utf-8") as f:
+                return json.loads(f.read())
+        return json.loads(p.read_text(encoding="utf-8"))
+
+
+def _empty_doc(run_id: str) -> Dict[str, Any]:
+    return {"run_id": run_id, "created_at": None, "status": "started", "nodes": {}, "errors": []}
+
+
+def _apply_record(doc: Dict[str, Any], record: Dict[str, Any]) -> None:
+    """
+    Folds one trace record into a run document (shared by both storage modes).
+    """
+    op = record.get("op")
+    if op == "new_run":
+        doc.update(record.get("doc") or {})
+    elif op == "node":
+        doc.setdefault("nodes", {})[record["node"]] = {
+            "timestamp": record.get("timestamp"),
+            "payload": record.get("payload"),
+        }
+    elif op == "error":
+        doc.setdefault("errors", []).append({
+            "timestamp": record.get("timestamp"),
+            "node": record.get("node"),
+            "message": record.get("message"),
+            "stack": record.get("stack"),
+        })
+        doc["status"] = "failed"
+    elif op == "finalize":
+        doc["status"] = record.get("status")
+        doc["finalized_at"] = record.get("finalized_at")
+    elif op == "stage":
+        doc.setdefault("stage_timings", []).append({
+            k: record.get(k) for k in ("stage", "started_at", "ended_at", "duration_ms", "ok")
+        })
+    elif op == "attrs":
+        doc.setdefault("attrs", {}).update(record.get("attrs") or {})
@@ -83,8 +83,8 @@ def _run_pipeline(
 def render_ask_analytics(settings: Settings, trace_store: TraceStore, developer_mode: bool) -> None:
     st.header("Ask Analytics")
 
-    kg = KnowledgeGraphStore(settings.KNOWLEDGE_GRAPH_DIR)
-    registry = SchemaRegistry(settings.KNOWLEDGE_GRAPH_DIR)
+    kg = KnowledgeGraphStore(settings.KNOWLEDGE_GRAPH_DIR, backend=settings.KG_STORAGE_BACKEND)
+    registry = SchemaRegistry(settings.KNOWLEDGE_GRAPH_DIR, backend=settings.KG_STORAGE_BACKEND)
 
     # ✅ IMPORTANT: UI uses registry tables (same as SQLAgent validation)
     all_tables = _get_registry_tables(registry)
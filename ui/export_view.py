@@ -13,7 +13,7 @@ from traces.trace_store import TraceStore
 def render_export(settings: Settings, trace_store: TraceStore) -> None:
     st.header("Export")
 
-    runs = trace_store.list_runs()
+    runs = trace_store.list_runs(limit=200)
     if not runs:
         st.info [st.info]("No runs found.")
         return
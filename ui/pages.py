@@ -14,6 +14,7 @@ from ui.trace_viewer import render_trace_viewer
 from ui.query_logs_view import render_query_logs
 from ui.cache_manager_view import render_cache_manager
 from ui.export_view import render_export
+from ui.stage_latency_view import render_stage_latency
 
 
 def _bootstrap_schema_if_missing(settings: Settings) -> None:
@@ -21,12 +22,11 @@ def _bootstrap_schema_if_missing(settings: Settings) -> None:
     Auto-introspect schema ONCE if no schema cache exists.
     This makes the platform actually "do it" by default.
     """
-    kg = KnowledgeGraphStore(settings.KNOWLEDGE_GRAPH_DIR)
-    schema = kg.load_schema()
-    if schema.get("tables"):
+    kg = KnowledgeGraphStore(settings.KNOWLEDGE_GRAPH_DIR, backend=settings.KG_STORAGE_BACKEND)
+    if kg.has_schema():
         return
 
-    registry = SchemaRegistry(settings.KNOWLEDGE_GRAPH_DIR)
+    registry = SchemaRegistry(settings.KNOWLEDGE_GRAPH_DIR, backend=settings.KG_STORAGE_BACKEND)
     agent = SchemaAgent(settings=settings, kg=kg, registry=registry)
 
     with st.spinner("Bootstrapping: introspecting database schema (first run)..."):
@@ -37,11 +37,15 @@ def _bootstrap_schema_if_missing(settings: Settings) -> None:
 def render_app(settings: Settings) -> None:
     st.sidebar.title("Agentic Analytics Platform")
 
-    trace_store = TraceStore(settings.TRACES_DIR)
+    trace_store = TraceStore(
+        settings.TRACES_DIR,
+        mode=settings.TRACE_STORE_MODE,
+        blob_threshold_bytes=settings.TRACE_BLOB_THRESHOLD_BYTES,
+    )
 
     page = st.sidebar.radio(
         "Views",
-        ["Schema Explorer", "Ask Analytics", "Run Traces", "Query Logs", "Cache Manager", "Export"],
+        ["Schema Explorer", "Ask Analytics", "Run Traces", "Stage Latency", "Query Logs", "Cache Manager", "Export"],
         index=1,
     )
 
@@ -58,6 +62,8 @@ def render_app(settings: Settings) -> None:
         render_ask_analytics(settings, trace_store=trace_store, developer_mode=developer_mode)
     elif page == "Run Traces":
         render_trace_viewer(settings, trace_store=trace_store, developer_mode=developer_mode)
+    elif page == "Stage Latency":
+        render_stage_latency(settings, trace_store=trace_store)
     elif page == "Query Logs":
         render_query_logs(settings)
     elif page == "Cache Manager":
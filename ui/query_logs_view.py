@@ -3,10 +3,31 @@ from __future__ import annotations
 import streamlit as st
 from config import Settings
 from observability.query_log import QueryLogStore
+from db.engine import pool_telemetry
+from db.query_control import cancel_query, list_inflight_queries
 
 
 def render_query_logs(settings: Settings) -> None:
     st.header("Query Logs (Audit)")
+
+    running = list_inflight_queries()
+    st.subheader("Running queries")
+    if not running:
+        st.caption("No queries in flight.")
+    else:
+        st.dataframe(running, use_container_width=True)
+        qid = st.selectbox("Query", [r["query_id"] for r in running], key="cancel_query_id")
+        if st.button("Cancel query", type="primary"):
+            if cancel_query(qid):
+                st.success(f"Cancel sent for {qid}.")
+            else:
+                st.info(f"{qid} already finished.")
+
+    pools = pool_telemetry()
+    if pools:
+        st.subheader("Connection pools")
+        st.dataframe(pools, use_container_width=True)
+
     store = QueryLogStore(settings.LOG_DIR)
     rows = store.read_recent(200)
     if not rows:
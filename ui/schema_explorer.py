@@ -11,19 +11,54 @@ from agents.schema_agent import SchemaAgent
 def render_schema_explorer(settings: Settings) -> None:
     st.header("Schema Explorer")
 
-    kg = KnowledgeGraphStore(settings.KNOWLEDGE_GRAPH_DIR)
-    registry = SchemaRegistry(settings.KNOWLEDGE_GRAPH_DIR)
+    kg = KnowledgeGraphStore(settings.KNOWLEDGE_GRAPH_DIR, backend=settings.KG_STORAGE_BACKEND)
+    registry = SchemaRegistry(settings.KNOWLEDGE_GRAPH_DIR, backend=settings.KG_STORAGE_BACKEND)
     agent = SchemaAgent(settings=settings, kg=kg, registry=registry)
 
+    status = agent.refresh_status()
+    resumable = status.get("status") in ("running", "incomplete")
+
     colA, colB = st.columns([1, 1])
+    with colB:
+        incremental = st.checkbox(
+            "Only changed tables",
+            value=kg.has_schema(),
+            help="Re-introspect only tables whose modify_date or row count changed; drop vanished tables.",
+        )
+        if resumable:
+            st.caption(
+                f"Last refresh {status['status']}: {status['completed']}/{status['total']} done, "
+                f"{status['failed']} failed, {status['pending']} pending."
+            )
+            resume = st.button("Resume last refresh")
+        else:
+            resume = False
     with colA:
-        if st.button("Refresh Schema (introspect DB)", type="primary"):
-            with st.spinner("Refreshing schema..."):
-                res = agent.refresh(sample_rows=50)
+        start = st.button("Refresh Schema (introspect DB)", type="primary")
+
+    if start or resume:
+        with st.spinner("Refreshing schema..."):
+            bar = st.progress(0.0, text="Introspecting catalog...")
+
+            def on_progress(done: int, total: int, table_key: str) -> None:
+                bar.progress(done / max(total, 1), text=f"Table {done} of {total}: {table_key}")
+
+            res = agent.refresh(
+                sample_rows=50, progress_callback=on_progress, incremental=incremental, resume=bool(resume)
+            )
+            bar.empty()
+        if res.get("ok"):
             st.success(res.get("note", "Done."))
+        else:
+            st.warning(res.get("note", "Refresh finished with failures."))
+            st.json(res.get("failed_tables", {}))
+        if incremental or resume:
+            st.caption(
+                f"Refreshed {res.get('refreshed_tables', 0)}, unchanged {res.get('unchanged_tables', 0)}, "
+                f"resumed {res.get('resumed_tables', 0)}, dropped {len(res.get('dropped_tables', []))}."
+            )
 
-    schema = kg.load_schema()
-    tables = list(schema.get("tables", {}).keys())
+    tables = kg.list_tables()
 
     if not tables:
         st.info("No schema cached yet. Click **Refresh Schema**.")
@@ -44,7 +79,7 @@ def render_schema_explorer(settings: Settings) -> None:
     st.subheader("Tables")
 
     selected = st.selectbox("Pick a table", options=tables)
-    t = schema["tables"][selected]
+    t = kg.get_table(selected) or {}
 
     st.markdown(f"**{selected}**  \nRows (approx): `{t.get('row_count')}`")
 
@@ -55,4 +90,4 @@ def render_schema_explorer(settings: Settings) -> None:
     st.json(t.get("pk_fk_hints", {}))
 
     st.markdown("### Sample (explicit columns)")
-    st.dataframe(t.get("sample", []), use_container_width=True)
+    st.dataframe(kg.load_sample(selected), use_container_width=True)
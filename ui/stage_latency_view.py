@@ -0,0 +1,33 @@
+from __future__ import annotations
+
+import streamlit as st
+
+from config import Settings
+from traces.trace_store import TraceStore
+from traces.analytics import stage_latency_percentiles, GROUP_DIMENSIONS
+
+
+def render_stage_latency(settings: Settings, trace_store: TraceStore) -> None:
+    st.header("Stage Latency (A→L across runs)")
+
+    col1, col2, col3 = st.columns([2, 1, 1])
+    with col1:
+        group_by = st.multiselect("Group by", options=list(GROUP_DIMENSIONS), default=["stage"])
+    with col2:
+        since_days = st.number_input("Last N days (0 = all)", min_value=0, value=7, step=1)
+    with col3:
+        only_ok = st.toggle("Successful stages only", value=True)
+
+    df = stage_latency_percentiles(
+        trace_store,
+        group_by=group_by or ["stage"],
+        since_days=float(since_days) or None,
+        only_ok=only_ok,
+    )
+    if df.empty:
+        st.info("No stage timings recorded yet. Run the pipeline to collect them.")
+        return
+
+    st.dataframe(df, use_container_width=True)
+    if list(group_by or ["stage"]) == ["stage"]:
+        st.bar_chart(df.set_index("stage")[["p50_ms", "p95_ms", "p99_ms"]])
@@ -4,6 +4,7 @@ import streamlit as st
 
 from config import Settings
 from traces.trace_store import TraceStore
+from traces.blob_store import is_blob_ref
 
 
 TIMELINE = [
@@ -34,18 +35,37 @@ TIMELINE = [
     "L_critique_rollup",
 ]
 
+RUN_STATUSES = ["started", "success", "failed", "rejected", "failed_data_quality", "needs_human_review"]
+
 
 def render_trace_viewer(settings: Settings, trace_store: TraceStore, developer_mode: bool) -> None:
     st.header("Run Trace Viewer / Node Outputs")
 
-    runs = trace_store.list_runs()
-    if not runs:
-        st.info("No runs found yet.")
-        return
-
     # Left sidebar list (mandatory requirement)
     with st.sidebar:
         st.subheader("Runs")
+        status_filter = st.selectbox(
+            "Status",
+            options=["(any)"] + RUN_STATUSES,
+            index=0,
+            key="trace_status_filter",
+        )
+        status = None if status_filter == "(any)" else status_filter
+        page_size = int(st.number_input("Runs per page", min_value=10, max_value=1000, value=100, step=10))
+        total = trace_store.count_runs(status=status)
+        pages = max(1, (total + page_size - 1) // page_size)
+        page = int(st.number_input("Page", min_value=1, max_value=pages, value=1, step=1))
+
+        runs = trace_store.list_runs(
+            limit=page_size,
+            offset=(page - 1) * page_size,
+            status=status,
+        )
+        if not runs:
+            st.info("No runs found yet.")
+            return
+        st.caption(f"{total} runs • page {page}/{pages}")
+
         options = [r["run_id"] for r in runs if r.get("run_id")]
         run_id = st.selectbox("Select run", options=options, index=0)
         st.divider()
@@ -56,6 +76,18 @@ def render_trace_viewer(settings: Settings, trace_store: TraceStore, developer_m
             diff = trace_store.diff_runs(run_a, run_b)
             st.session_state["run_diff"] = diff
 
+        if developer_mode:
+            st.divider()
+            st.subheader("Retention")
+            if st.button("Compact traces"):
+                report = trace_store.compact(
+                    compress_after_days=settings.TRACE_COMPRESS_AFTER_DAYS,
+                    critique_retention_days=settings.TRACE_CRITIQUE_RETENTION_DAYS,
+                    max_total_bytes=settings.TRACE_MAX_TOTAL_BYTES,
+                )
+                st.success(f"Reclaimed {report['bytes_reclaimed']:,} bytes")
+                st.json(report)
+
     doc = trace_store.load(run_id)
     st.markdown(f"**Run:** `{run_id}` • **Status:** `{doc.get('status')}`")
 
@@ -77,7 +109,14 @@ def render_trace_viewer(settings: Settings, trace_store: TraceStore, developer_m
         with st.expander(step, expanded=False):
             if step in nodes:
                 st.caption(f"timestamp: {nodes[step].get('timestamp')}")
-                st.json(nodes[step].get("payload"))
+                payload = nodes[step].get("payload")
+                if is_blob_ref(payload):
+                    # large payloads live in the blob store; only fetch them on request
+                    st.caption(f"stored as blob • {payload.get('bytes', 0):,} bytes")
+                    if st.toggle("Load payload", key=f"blob_{run_id}_{step}"):
+                        st.json(trace_store.resolve_payload(payload))
+                else:
+                    st.json(payload)
             else:
                 st.info("No output for this step.")
 